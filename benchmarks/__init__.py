@@ -0,0 +1 @@
+"""Benchmarks for the Photo Info application."""
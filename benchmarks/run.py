@@ -0,0 +1,236 @@
+"""Benchmark runner for the Photo Info application.
+
+Generates a synthetic corpus, times each stage of processing on it and prints
+files/sec and latency percentiles. Results can be saved as JSON and compared
+against an earlier run to catch regressions:
+
+    python -m benchmarks.run --images 500 --size medium --output new.json
+    python -m benchmarks.run --images 500 --size medium --compare old.json
+"""
+
+# benchmarks/run.py
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from benchmarks import corpus
+from photo_info import __version__
+from photo_info.exif_reader import read_exif_bytes
+from photo_info.photo_info import (
+    ENGINES,
+    MY_TAG_SET,
+    get_exif_data,
+    get_labeled_exif,
+    identify_new_images,
+    write_to_markdown,
+)
+from photo_info.scanner import scan_images
+from photo_info.scheduler import locality_order, read_header
+
+# A stage whose files/sec drops by more than this fraction is flagged
+REGRESSION_THRESHOLD = 0.10
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of a list of samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """Return the peak resident set size in megabytes."""
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def time_each(func: Callable, inputs: Iterable) -> Dict[str, float]:
+    """Time `func` on every input and summarize the latencies."""
+    latencies = []
+    start = time.perf_counter()
+    for value in inputs:
+        began = time.perf_counter()
+        func(value)
+        latencies.append(time.perf_counter() - began)
+    return summarize(time.perf_counter() - start, len(latencies), latencies)
+
+
+def summarize(elapsed: float, files: int, latencies: Optional[List[float]] = None) -> Dict[str, float]:
+    """Build the result record of a benchmarked stage."""
+    result = {
+        "files": files,
+        "seconds": elapsed,
+        "files_per_sec": files / elapsed if elapsed else 0.0,
+    }
+    if latencies:
+        result["p50_ms"] = percentile(latencies, 0.50) * 1000
+        result["p99_ms"] = percentile(latencies, 0.99) * 1000
+    return result
+
+
+def read_scheduled(path: str) -> Optional[dict]:
+    """Read EXIF data the way the locality I/O schedule does."""
+    header, complete = read_header(path)
+    try:
+        # The same tags as get_exif_data[fast], so the rows compare
+        return read_exif_bytes(header, MY_TAG_SET.ids, complete)
+    except ValueError:
+        return get_exif_data(path)
+
+
+def run_cli(image_dir: Path, md_dir: Path, extra: List[str]) -> float:
+    """Run `photo-info process` in a fresh interpreter and return its wall time."""
+    command = [
+        sys.executable, "-c", "from photo_info.cli import app; app()",
+        "process", str(image_dir), str(md_dir), *extra,
+    ]
+    start = time.perf_counter()
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL, cwd=str(md_dir.parent))
+    return time.perf_counter() - start
+
+
+def benchmark(work_dir: Path, args: argparse.Namespace) -> Dict[str, dict]:
+    """Run every benchmark against a corpus in `work_dir`."""
+    image_dir = work_dir / "images"
+    start = time.perf_counter()
+    paths = corpus.generate(image_dir, args.images, args.size, args.profiles, args.seed, args.subdirs)
+    print(f"Generated {len(paths)} images in {time.perf_counter() - start:.1f}s")
+    files = [str(path) for path in paths]
+    flat = [path for path in files if os.path.dirname(path) == str(image_dir)]
+
+    md_dir = work_dir / "markdown"
+    md_dir.mkdir()
+    results = {}
+
+    start = time.perf_counter()
+    found = identify_new_images(str(image_dir) + "/", str(md_dir) + "/")
+    results["identify_new_images"] = summarize(time.perf_counter() - start, len(found))
+
+    start = time.perf_counter()
+    scanned = sum(1 for _ in scan_images(str(image_dir), str(md_dir)))
+    results["scan_images"] = summarize(time.perf_counter() - start, scanned)
+
+    jpegs = [path for path in files if path.endswith(".jpg")]
+    for engine in ENGINES:
+        # Pillow's legacy _getexif() only exists for JPEGs
+        results[f"get_exif_data[{engine}]"] = time_each(
+            lambda path: get_exif_data(path, engine=engine), files if engine == "fast" else jpegs
+        )
+
+    # Header reads as done by the locality I/O schedule, in disk order
+    ordered = [item.image_file for item in locality_order(scan_images(str(image_dir), str(md_dir)))]
+    results["get_exif_data[locality]"] = time_each(read_scheduled, ordered)
+
+    exif = [get_exif_data(path) for path in files]
+    results["get_labeled_exif"] = time_each(get_labeled_exif, exif)
+
+    labeled = [get_labeled_exif(data) for data in exif]
+    out_dir = str(work_dir / "write") + "/"
+    os.makedirs(out_dir)
+    results["write_to_markdown"] = time_each(
+        lambda pair: write_to_markdown(pair[0], pair[1], out_dir), zip(flat, labeled)
+    )
+    results["write_to_markdown[unchanged]"] = time_each(
+        lambda pair: write_to_markdown(pair[0], pair[1], out_dir), zip(flat, labeled)
+    )
+
+    runs = (
+        ("process", []),
+        ("process[pipeline]", ["--pipeline"]),
+        ("process[locality]", ["--io-schedule", "locality"]),
+    )
+    for name, extra in runs:
+        run_dir = work_dir / name
+        run_dir.mkdir()
+        elapsed = run_cli(image_dir, run_dir, extra)
+        results[name] = summarize(elapsed, len(files))
+        results[name + "[rerun]"] = summarize(run_cli(image_dir, run_dir, extra), len(files))
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict]) -> List[str]:
+    """Return the stages that got slower than the baseline."""
+    regressions = []
+    for stage, result in results.items():
+        before = baseline.get(stage, {}).get("files_per_sec")
+        if not before:
+            continue
+        change = result["files_per_sec"] / before - 1
+        marker = "  REGRESSION" if change < -REGRESSION_THRESHOLD else ""
+        print(f"{stage:32} {before:10.1f} -> {result['files_per_sec']:10.1f} files/s ({change:+.1%}){marker}")
+        if marker:
+            regressions.append(stage)
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark Photo Info on a synthetic corpus.")
+    parser.add_argument("--images", type=int, default=200, help="Number of images to generate.")
+    parser.add_argument("--size", choices=sorted(corpus.SIZES), default="small", help="Image dimensions.")
+    parser.add_argument(
+        "--profiles", nargs="+", choices=sorted(corpus.PROFILES), default=["nikon", "canon", "phone"],
+        help="Camera profiles to cycle through.",
+    )
+    parser.add_argument("--subdirs", type=int, default=0, help="Spread images over this many subdirectories.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the corpus generator.")
+    parser.add_argument("--work-dir", type=Path, help="Keep the corpus and output here.")
+    parser.add_argument("--output", type=Path, help="Save results as JSON.")
+    parser.add_argument("--compare", type=Path, help="Compare against results saved earlier.")
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or Path(tempfile.mkdtemp(prefix="photo-info-bench-"))
+    if args.work_dir and work_dir.exists():
+        shutil.rmtree(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        results = benchmark(work_dir, args)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir)
+
+    for stage, result in results.items():
+        latency = ""
+        if "p50_ms" in result:
+            latency = f"  p50 {result['p50_ms']:8.3f} ms  p99 {result['p99_ms']:8.3f} ms"
+        print(f"{stage:32} {result['files_per_sec']:10.1f} files/s{latency}")
+    memory = {"self_mb": peak_rss_mb(), "children_mb": peak_rss_mb(resource.RUSAGE_CHILDREN)}
+    print(f"Peak RSS: {memory['self_mb']:.1f} MB (benchmark), {memory['children_mb']:.1f} MB (process runs)")
+
+    report = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": {
+            "images": args.images, "size": args.size, "profiles": args.profiles,
+            "subdirs": args.subdirs, "seed": args.seed,
+        },
+        "peak_rss": memory,
+        "results": results,
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Saved results to {args.output}")
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if baseline.get("corpus") != report["corpus"]:
+            print("Warning: baseline was measured on a different corpus")
+        if compare(results, baseline["results"]):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
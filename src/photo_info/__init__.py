@@ -2,13 +2,33 @@
 
 # photo_info/__init__.py
 
-from photo_info.photo_info import (
-    get_exif_data,
-    get_labeled_exif,
-    write_to_markdown,
-    identify_new_images,
-    MY_TAGS,
-)
+# The public helpers live in photo_info.photo_info and photo_info.records, which
+# import Pillow. They are loaded on first access so that commands and hooks
+# which never touch an image, like `photo-info --version`, start quickly.
+_LAZY_EXPORTS = {
+    "get_exif_data": "photo_info",
+    "get_labeled_exif": "photo_info",
+    "write_to_markdown": "photo_info",
+    "identify_new_images": "photo_info",
+    "MY_TAGS": "photo_info",
+    "extract_many": "records",
+    "ExifRecord": "records",
+    "to_numpy": "records",
+    "to_arrow": "records",
+    "write_parquet": "records",
+}
 
 __app_name__ = "Photo Info"
 __version__ = "0.1.0"
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        import importlib
+
+        return getattr(importlib.import_module(f"photo_info.{_LAZY_EXPORTS[name]}"), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_EXPORTS))
@@ -2,12 +2,12 @@
 
 # photo_info/__main__.py
 
-from src import cli, __app_name__
+from photo_info import cli
 
 
 def main() -> None:
     """Run the CLI."""
-    cli.app(prog_name=__app_name__)
+    cli.app(prog_name="photo-info")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,249 @@
+"""Zip and tar archive input for the Photo Info application.
+
+When the image directory is a zip or tar archive, its images are processed
+straight from the archive in a single sequential pass, without extracting it.
+For each member only the header bytes holding the EXIF data are decompressed;
+the rest of the member is only read for formats the header-only reader cannot
+handle. Compressed tar archives are streamed, so they are never decompressed
+more than once.
+
+Markdown files mirror the layout inside the archive, and their `src` is the
+member's path. The `image_file` of an archive member's work item is that same
+member path, since the member has no path on disk.
+"""
+
+# photo_info/archive.py
+
+import calendar
+import io
+import os
+import struct
+from typing import IO, TYPE_CHECKING, Callable, Iterator, NamedTuple, Optional, Sequence, Tuple
+
+from photo_info import exif_reader
+from photo_info.exif_reader import HEADER_BYTES
+from photo_info.manifest import Failure, Fingerprint, Manifest
+from photo_info.metrics import timed
+from photo_info.scanner import DEFAULT_EXTENSIONS, WorkItem, markdown_path
+from photo_info.tags import TagRules
+
+if TYPE_CHECKING:
+    from photo_info.photo_info import ProcessResult
+    from photo_info.shard import Shard
+
+ZIP_SUFFIXES = (".zip",)
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+ARCHIVE_SUFFIXES = ZIP_SUFFIXES + TAR_SUFFIXES
+
+
+class Member(NamedTuple):
+    """An image inside an archive, identified the way the manifest needs it."""
+
+    rel_path: str
+    size: int
+    mtime_ns: int
+    # CRC-32 of zip members; tar members carry no checksum
+    checksum: str
+
+    def fingerprint(self) -> Fingerprint:
+        return Fingerprint(self.size, self.mtime_ns, self.checksum)
+
+
+def is_archive(path) -> bool:
+    """Return True if `path` is a zip or tar archive file."""
+    return str(path).lower().endswith(ARCHIVE_SUFFIXES) and os.path.isfile(path)
+
+
+def _image_name(name: str, extensions: Sequence[str]) -> Optional[str]:
+    """Normalize a member name, or return None if it is not an image to process."""
+    name = name.replace("\\", "/").lstrip("/")
+    while name.startswith("./"):
+        name = name[2:]
+    parts = name.split("/")
+    if not name or any(part.startswith(".") or part == ".." for part in parts):
+        return None
+    if os.path.splitext(name)[1].lower() not in extensions:
+        return None
+    return name
+
+
+def iter_members(
+    archive_path: str, extensions: Sequence[str] = DEFAULT_EXTENSIONS
+) -> Iterator[Tuple[Member, Callable[[], IO[bytes]]]]:
+    """Walk an archive in storage order, yielding its images.
+
+    Hidden files and directories are skipped, as in the image directory.
+
+    Args:
+        archive_path (str): Path to the zip or tar archive.
+        extensions (Sequence[str]): Image extensions, matched case-insensitively.
+    Returns:
+        (Iterator[tuple]) Each image and a function opening it for reading.
+        A tar member can only be opened before the next one is yielded.
+    """
+    extensions = [ext.lower() for ext in extensions]
+    if str(archive_path).lower().endswith(ZIP_SUFFIXES):
+        import zipfile
+
+        with zipfile.ZipFile(archive_path) as zf:
+            for info in zf.infolist():
+                name = _image_name(info.filename, extensions)
+                if info.is_dir() or name is None:
+                    continue
+                # Zip times carry no time zone; read them as UTC, so they do
+                # not change with the local time zone or daylight saving time
+                mtime_ns = calendar.timegm(info.date_time) * 1_000_000_000
+                member = Member(name, info.file_size, mtime_ns, f"{info.CRC:08x}")
+                yield member, (lambda info=info: zf.open(info))
+    else:
+        import tarfile
+
+        # Stream mode reads the archive strictly front to back
+        with tarfile.open(archive_path, mode="r|*") as tar:
+            for info in tar:
+                name = _image_name(info.name, extensions)
+                if not info.isfile() or name is None:
+                    continue
+                member = Member(name, info.size, int(info.mtime) * 1_000_000_000, "")
+                yield member, (lambda info=info: tar.extractfile(info))
+
+
+def _read_exif(f: IO[bytes], engine: str, verify: bool, tags, timings) -> dict:
+    """Extract EXIF data from an open archive member, reading as little as possible."""
+    from photo_info.photo_info import get_exif_data
+
+    exif_data = None
+    with timed(timings, "read"):
+        header = f.read(HEADER_BYTES + 1)
+    if engine == "fast":
+        with timed(timings, "extract"):
+            try:
+                exif_data = exif_reader.read_exif_bytes(
+                    header[:HEADER_BYTES], tags.ids, complete=len(header) <= HEADER_BYTES
+                )
+            except (ValueError, struct.error):
+                exif_data = None
+    if exif_data is None:
+        # Metadata beyond the header, or a format only Pillow understands
+        with timed(timings, "read"):
+            data = header + f.read()
+        with timed(timings, "extract"):
+            exif_data = get_exif_data(io.BytesIO(data), engine=engine, verify=verify, tags=tags)
+    return exif_data
+
+
+def process_archive(
+    archive_path: str,
+    md_dir: str,
+    manifest: Optional[Manifest] = None,
+    extensions: Sequence[str] = DEFAULT_EXTENSIONS,
+    engine: str = "fast",
+    verify: bool = True,
+    fsync: bool = False,
+    tags: Optional[TagRules] = None,
+    shard: Optional["Shard"] = None,
+    retry_failed: bool = False,
+    on_skip: Optional[Callable[[WorkItem, Failure], None]] = None,
+) -> Iterator["ProcessResult"]:
+    """Process the images inside an archive in one sequential pass.
+
+    With a manifest, members whose size, mtime and checksum are unchanged since
+    they were recorded are skipped, as are unchanged members quarantined after
+    failing on a previous run, and recorded members that are no longer in the
+    archive are dropped from it once the pass completes. When members
+    share a name (e.g. RAW+JPEG pairs) the extension listed first wins: in a
+    zip the others are not read, while in a tar one that comes first is
+    processed, then overwritten and dropped from the manifest, and skipped by
+    later runs while the preferred member is recorded.
+
+    Args:
+        archive_path (str): Path to the zip or tar archive.
+        md_dir (str): Path to the markdown directory.
+        manifest (Manifest): Optional manifest of previously processed members.
+        extensions (Sequence[str]): Image extensions, in order of preference.
+        engine (str): Either "fast" or "pillow".
+        verify (bool): Whether Pillow should verify members before reading them.
+        fsync (bool): Whether to flush markdown files to disk before renaming them.
+        tags (TagRules): Tags to extract, per directory inside the archive.
+        shard (Shard): If given, only members of this shard are processed.
+        retry_failed (bool): Process quarantined members even if unchanged.
+        on_skip (Callable): Called with each quarantined member that is skipped.
+    Returns:
+        (Iterator[ProcessResult]) The outcome of each new or modified member.
+        Failed results carry the member's fingerprint, so they can be quarantined.
+    """
+    from photo_info import photo_info
+
+    tags = tags or photo_info.MY_TAG_RULES
+    preference = {ext.lower(): rank for rank, ext in reversed(list(enumerate(extensions)))}
+    recorded = manifest.entries() if manifest is not None else {}
+    failures = manifest.failures() if manifest is not None else {}
+
+    def rank_of(rel_path: str) -> Tuple[str, Optional[int]]:
+        stem, ext = os.path.splitext(rel_path)
+        return stem, preference.get(ext.lower())
+
+    def in_shard(member: Member) -> bool:
+        return shard is None or shard.contains(member.rel_path)
+
+    best_rank = {}
+    if str(archive_path).lower().endswith(ZIP_SUFFIXES):
+        # A zip lists its members up front, so only the preferred one of each name is read
+        for member, _ in iter_members(archive_path, extensions):
+            if in_shard(member):
+                stem, rank = rank_of(member.rel_path)
+                best_rank[stem] = min(rank, best_rank.get(stem, rank))
+    else:
+        # A tar cannot be listed without reading it, so a member is passed over
+        # for a preferred one only known from the manifest, which a previous
+        # run processed. Otherwise the member superseded on that run would be
+        # processed again and overwrite the preferred member's markdown
+        for rel_path in recorded:
+            stem, rank = rank_of(rel_path)
+            if rank is not None:
+                best_rank[stem] = min(rank, best_rank.get(stem, rank))
+    # Path and rank of the member processed for each name. A tar is read once,
+    # front to back, so a preferred member can follow one it supersedes
+    chosen = {}
+    superseded = []
+
+    for member, open_member in iter_members(archive_path, extensions):
+        if not in_shard(member):
+            continue
+        stem, rank = rank_of(member.rel_path)
+        if rank > best_rank.get(stem, rank):
+            continue
+        best_rank[stem] = rank
+        if stem in chosen and chosen[stem][1] > rank:
+            superseded.append(chosen[stem][0])
+        chosen[stem] = (member.rel_path, rank)
+
+        previous = recorded.pop(member.rel_path, None)
+        if previous is not None and tuple(previous) == tuple(member.fingerprint()):
+            continue
+
+        item = WorkItem(member.rel_path, member.rel_path, markdown_path(md_dir, member.rel_path))
+        failure = failures.pop(member.rel_path, None)
+        if failure is not None and not retry_failed and failure[:2] == (member.size, member.mtime_ns):
+            if on_skip is not None:
+                on_skip(item, failure)
+            continue
+        timings = {}
+        try:
+            tag_set = tags.for_path(member.rel_path)
+            with open_member() as f:
+                exif_data = _read_exif(f, engine, verify, tag_set, timings)
+            with timed(timings, "label"):
+                labeled_exif = photo_info.get_labeled_exif(exif_data, tag_set)
+            with timed(timings, "write"):
+                photo_info.write_item_markdown(item, labeled_exif, fsync=fsync)
+            yield photo_info.ProcessResult(item, labeled_exif, fingerprint=member.fingerprint(), timings=timings)
+        except Exception as e:
+            yield photo_info.ProcessResult(
+                item, {}, f"{type(e).__name__}: {e}", fingerprint=member.fingerprint(), timings=timings
+            )
+
+    if manifest is not None:
+        manifest.remove([*recorded, *superseded])
+        manifest.clear_failures([*failures, *superseded])
+        manifest.commit()
@@ -0,0 +1,205 @@
+"""Aggregated image catalog for the Photo Info application.
+
+The catalog is a single NDJSON file holding the `src` and labeled EXIF data of
+every image, so a site build or search indexer can load the whole gallery with
+one sequential read instead of parsing every markdown file.
+
+It is updated by appending: a new or changed image appends its record, and a
+removed image appends a removal marker. Readers keep the last line for each
+path. Once superseded lines make up more than half of the file it is compacted
+by rewriting only the current records. Lines look like:
+
+    {"path":"2024/DSC_0001.jpg","src":"2024/DSC_0001.jpg","details":{"Make":"NIKON"}}
+    {"path":"2024/DSC_0002.jpg","removed":true}
+"""
+
+# photo_info/catalog.py
+
+import json
+import os
+import threading
+from typing import Container, Dict, Iterable, Iterator, List
+
+from photo_info.manifest import Manifest
+from photo_info.scanner import site_path
+
+# Compact when more than this fraction of lines are superseded
+COMPACT_RATIO = 0.5
+
+# Files with fewer lines than this are never compacted
+COMPACT_MIN_LINES = 64
+
+
+def read_catalog(path: str) -> Dict[str, dict]:
+    """Load the current record of every image in a catalog.
+
+    Args:
+        path (str): Path of the catalog file.
+    Returns:
+        (dict) Image paths mapped to their records, in the order they were last written.
+    """
+    records: Dict[str, dict] = {}
+    for record in _read_lines(path):
+        records.pop(record["path"], None)
+        if not record.get("removed"):
+            records[record["path"]] = record
+    return records
+
+
+def _read_lines(path: str) -> Iterator[dict]:
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            # A line cut short by a crash is ignored until it is truncated
+            if line.endswith(b"\n"):
+                yield json.loads(line)
+
+
+class Catalog:
+    """An NDJSON catalog kept up to date with the processed images.
+
+    Changes are buffered and written when the catalog is flushed or closed.
+
+    Args:
+        path (str): Path of the catalog file. Missing parent directories are created.
+        fsync (bool): Whether to flush the file to disk after each write.
+    """
+
+    def __init__(self, path: str, fsync: bool = False):
+        self.path = str(path)
+        self.fsync = fsync
+        self.lock = threading.Lock()
+        self.lines: Dict[str, str] = {}
+        self.pending: List[str] = []
+        self.total = 0
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        for record in _read_lines(self.path):
+            self.total += 1
+            if record.get("removed"):
+                self.lines.pop(record["path"], None)
+            else:
+                self.lines[record["path"]] = _dumps(record)
+        self._truncate_partial_line()
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _truncate_partial_line(self) -> None:
+        """Drop a trailing line left incomplete by a crash, so appends stay valid."""
+        try:
+            with open(self.path, "rb+") as f:
+                size = f.seek(0, os.SEEK_END)
+                if not size:
+                    return
+                f.seek(size - 1)
+                if f.read(1) == b"\n":
+                    return
+                f.seek(max(0, size - 64 * 1024))
+                tail = f.read()
+                f.truncate(size - len(tail) + tail.rfind(b"\n") + 1)
+        except FileNotFoundError:
+            pass
+
+    def update(self, path: str, src: str, labeled_exif: dict) -> bool:
+        """Record the current data of an image.
+
+        Args:
+            path (str): Image path relative to the image directory.
+            src (str): Site path of the image, as written to the front-matter.
+            labeled_exif (dict): Labeled EXIF data.
+        Returns:
+            (bool) True if the record changed.
+        """
+        details = {label: str(value).rstrip("\x00") for label, value in labeled_exif.items()}
+        line = _dumps({"path": path, "src": src, "details": details})
+        with self.lock:
+            if self.lines.get(path) == line:
+                return False
+            self.lines[path] = line
+            self.pending.append(line)
+        return True
+
+    def remove(self, paths: Iterable[str]) -> None:
+        """Record that images no longer exist."""
+        with self.lock:
+            for path in paths:
+                if self.lines.pop(path, None) is not None:
+                    self.pending.append(_dumps({"path": path, "removed": True}))
+
+    def retain(self, paths: Container[str]) -> None:
+        """Remove every image that is not in `paths`."""
+        self.remove([path for path in list(self.lines) if path not in paths])
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.lines
+
+    def flush(self) -> None:
+        """Append pending changes, or compact the file if it is mostly superseded lines."""
+        with self.lock:
+            if not self.pending:
+                return
+            total = self.total + len(self.pending)
+            if total >= COMPACT_MIN_LINES and total - len(self.lines) > COMPACT_RATIO * total:
+                self._rewrite()
+            else:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(line + "\n" for line in self.pending))
+                    if self.fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+                self.total = total
+            self.pending.clear()
+
+    def _rewrite(self) -> None:
+        directory, name = os.path.split(self.path)
+        temp_file = os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(temp_file, "w", encoding="utf-8") as f:
+                f.write("".join(self.lines[path] + "\n" for path in sorted(self.lines)))
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(temp_file, self.path)
+        except BaseException:
+            try:
+                os.unlink(temp_file)
+            except FileNotFoundError:
+                pass
+            raise
+        self.total = len(self.lines)
+
+    def close(self) -> None:
+        """Write pending changes."""
+        self.flush()
+
+
+def _dumps(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+
+def sync_with_manifest(catalog: Catalog, manifest: Manifest, image_dir: str) -> None:
+    """Bring the catalog in line with the images recorded in the manifest.
+
+    Removes images the manifest no longer lists and adds the ones missing from
+    the catalog, such as every image when the catalog is first enabled, from
+    the EXIF data recorded in the manifest. Then writes the changes.
+
+    Args:
+        catalog (Catalog): Catalog to update.
+        manifest (Manifest): Manifest of processed images.
+        image_dir (str): Path to the directory containing images, ending with
+            "/", or "" for images read from an archive.
+    """
+    recorded = manifest.entries()
+    catalog.retain(recorded)
+    for path in recorded:
+        if path not in catalog:
+            catalog.update(path, site_path(image_dir + path, path), manifest.exif(path) or {})
+    catalog.flush()
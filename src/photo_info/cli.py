@@ -1,26 +1,51 @@
 """Command-line interface for the Photo Info application."""
 
+import os
 import sys
+import time
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Iterable, List, Optional, Tuple
 
 import typer
-from rich.console import Console
-from rich.panel import Panel
 
-from photo_info import __version__, photo_info
+from photo_info import __version__, scanner
+from photo_info.archive import is_archive
 from photo_info.config import Config
+from photo_info.console import console
+from photo_info.manifest import MANIFEST_NAME, Failure, Manifest
+from photo_info.metrics import Metrics
+from photo_info.progress import LOG_FORMATS, Reporter, make_reporter
+from photo_info.scanner import WorkItem
+from photo_info.tags import TagRules
+from photo_info.watch import BACKENDS, watch_batches
+
+# Pillow, asyncio and the rest of rich are imported by the commands that use
+# them, keeping startup fast for hooks that run the CLI many times a day
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+    from photo_info.catalog import Catalog
+    from photo_info.journal import Journal
+    from photo_info.photo_info import ProcessResult
+    from photo_info.shard import Shard
 
 app = typer.Typer(
     name="photo-info",
     help="Extract EXIF metadata from photos and generate markdown files",
     add_completion=False,
 )
-console = Console()
+
+# Commit the manifest after this many processed images
+MANIFEST_COMMIT_INTERVAL = 256
+
+# Image directories of collections scanned at once
+SCAN_THREADS = 8
 
 def version_callback(value: bool):
     """Print the version of the application."""
     if value:
+        from rich.panel import Panel
+
         console.print(Panel.fit(f"Photo Info v{__version__}"))
         raise typer.Exit()
 
@@ -44,6 +69,639 @@ def main(
     """Photo Info - Extract EXIF metadata from photos and generate markdown files."""
     pass
 
+def _process_items(
+    config: Config,
+    manifest: Manifest,
+    items: Iterable[WorkItem],
+    metrics: Optional[Metrics] = None,
+    tags: Optional[TagRules] = None,
+    catalog: Optional["Catalog"] = None,
+    journal: Optional["Journal"] = None,
+    pool: Optional["Executor"] = None,
+    reporter: Optional[Reporter] = None,
+) -> Tuple[int, List["ProcessResult"]]:
+    """Process work items, record them in the manifest and report progress.
+
+    Images that fail are retried up to `config.retries` times, waiting twice
+    as long before each retry, and quarantined if they fail every attempt.
+
+    Args:
+        config (Config): Validated configuration.
+        manifest (Manifest): Manifest to record processed images in.
+        items (Iterable[WorkItem]): Images to process.
+        metrics (Metrics): If given, scan and per-stage timings are collected in it.
+        tags (TagRules): Compiled tag selection. Defaults to the configured tags.
+        catalog (Catalog): If given, processed images are also recorded in it.
+        journal (Journal): If given, finished images are journaled as they finish.
+        pool (Executor): Worker pool shared with other runs, see `photo_info.open_pool`.
+        reporter (Reporter): Reports the outcome of each image. Defaults to a
+            line of text per image.
+    Returns:
+        (tuple) The number of images processed and the results that failed
+        every attempt.
+    """
+    if reporter is None:
+        reporter = Reporter()
+    items = _prepare_items(config, manifest, items, metrics, reporter)
+    if tags is None:
+        tags = config.tag_rules()
+
+    processed, failures = _record_results(
+        config, manifest, _run(config, items, tags, pool), metrics, catalog, journal, reporter
+    )
+    for attempt in range(1, config.retries + 1):
+        if not failures:
+            break
+        delay = config.retry_delay * 2 ** (attempt - 1)
+        console.print(
+            f"[yellow]Retrying {len(failures)} failed images in {delay:g}s "
+            f"(retry {attempt} of {config.retries})[/yellow]"
+        )
+        if metrics is not None:
+            metrics.count("retried", len(failures))
+        time.sleep(delay)
+        retry_items = [result.item for result in failures]
+        reporter.add(len(retry_items))
+        retried, failures = _record_results(
+            config, manifest, _run(config, retry_items, tags, pool), metrics, catalog, journal, reporter
+        )
+        processed += retried
+    _quarantine(manifest, failures, config.retries + 1, metrics, journal)
+    return processed, failures
+
+
+def _prepare_items(
+    config: Config,
+    manifest: Manifest,
+    items: Iterable[WorkItem],
+    metrics: Optional[Metrics],
+    reporter: Reporter,
+) -> Iterable[WorkItem]:
+    """Order pending images for the configured I/O schedule and drop duplicates if asked."""
+    if config.io_schedule == "locality":
+        from photo_info.scheduler import locality_order
+
+        items = locality_order(items, config.io_window)
+    if config.skip_duplicates:
+        from photo_info.dedupe import HashIndex, skip_duplicates
+
+        def skipped(item: WorkItem, original) -> None:
+            if metrics is not None:
+                metrics.count("duplicates")
+            reporter.skipped(item.rel_path, f"duplicate of {original.path}")
+
+        items = skip_duplicates(
+            items,
+            str(config.image_dir),
+            HashIndex(manifest),
+            kind=config.duplicate_hash,
+            threshold=config.duplicate_threshold,
+            on_skip=skipped,
+        )
+    if metrics is not None:
+        items = metrics.scanned(items)
+    return items
+
+
+def _image_options(config: Config, tags: TagRules) -> dict:
+    """Keyword arguments of `photo_info.process_image` for the configuration."""
+    return dict(
+        engine=config.exif_engine,
+        verify=config.verify,
+        fsync=config.fsync,
+        tags=tags,
+        derivatives=config.derivative_settings(),
+        io_settings=config.io_settings(),
+    )
+
+
+def _run(
+    config: Config, items: Iterable[WorkItem], tags: TagRules, pool: Optional["Executor"] = None
+) -> Iterable["ProcessResult"]:
+    """Process work items with the configured pool or pipeline, or the given pool."""
+    from photo_info import photo_info
+
+    if config.pipeline:
+        from photo_info.pipeline import PipelineLimits, process_pipeline
+
+        return process_pipeline(
+            items,
+            limits=PipelineLimits(**config.pipeline_limits),
+            hash_mode=config.hash_mode,
+            **_image_options(config, tags),
+        )
+    return photo_info.process_images(
+        items,
+        jobs=config.jobs or os.cpu_count(),
+        executor=config.executor,
+        hash_mode=config.hash_mode,
+        pool=pool,
+        **_image_options(config, tags),
+    )
+
+
+def _process_interleaved(
+    config: Config,
+    runs: List[tuple],
+    pending: List[List[WorkItem]],
+    metrics: Optional[Metrics],
+    pool: Optional["Executor"],
+    reporter: Reporter,
+) -> Tuple[int, List["ProcessResult"]]:
+    """Process the pending images of several collections as one stream on a shared pool.
+
+    The images are fed to the pool a collection at a time, so the workers
+    start on the next collection while the last images of the previous one
+    are still in flight. Results come back in input order and are recorded in
+    the manifest, journal and catalog of their own collection. Failed images
+    of every collection are retried together the same way.
+
+    Args:
+        config (Config): Validated top-level configuration, whose jobs,
+            executor and retries apply to every collection.
+        runs (List[tuple]): Configuration, manifest, catalog, journal and image
+            prefix of each collection, in the order to process them.
+        pending (List[List[WorkItem]]): Pending images of each of `runs`.
+        metrics (Metrics): If given, scan and per-stage timings are collected in it.
+        pool (Executor): The shared worker pool, or None to run inline.
+        reporter (Reporter): Reports the outcome of each image.
+    Returns:
+        (tuple) The number of images processed and the results that failed
+        every attempt.
+    """
+    from itertools import groupby
+
+    from photo_info import photo_info
+
+    options = [(run[0].hash_mode, _image_options(run[0], run[0].tag_rules())) for run in runs]
+    items = [
+        _prepare_items(collection, manifest, collection_items, metrics, reporter)
+        for (collection, manifest, _, _, _), collection_items in zip(runs, pending)
+    ]
+    processed = 0
+    failures: List[List["ProcessResult"]] = [[] for _ in runs]
+    for attempt in range(config.retries + 1):
+        if attempt:
+            retry_count = sum(len(failed) for failed in failures)
+            if not retry_count:
+                break
+            delay = config.retry_delay * 2 ** (attempt - 1)
+            console.print(
+                f"[yellow]Retrying {retry_count} failed images in {delay:g}s "
+                f"(retry {attempt} of {config.retries})[/yellow]"
+            )
+            if metrics is not None:
+                metrics.count("retried", retry_count)
+            time.sleep(delay)
+            items = [[result.item for result in failed] for failed in failures]
+            failures = [[] for _ in runs]
+            reporter.add(retry_count)
+
+        groups = [(group_items, *group_options) for group_items, group_options in zip(items, options)]
+        results = photo_info.process_image_groups(
+            groups, jobs=config.jobs or os.cpu_count(), executor=config.executor, pool=pool
+        )
+        for i, group in groupby(results, key=lambda pair: pair[0]):
+            collection, manifest, catalog, journal, _ = runs[i]
+            if not attempt:
+                reporter.collection(collection.name, len(pending[i]))
+            done, failed = _record_results(
+                collection, manifest, (result for _, result in group), metrics, catalog, journal, reporter
+            )
+            processed += done
+            failures[i] = failed
+
+    for (_, manifest, _, journal, _), failed in zip(runs, failures):
+        _quarantine(manifest, failed, config.retries + 1, metrics, journal)
+    return processed, [result for failed in failures for result in failed]
+
+
+def _record_results(
+    config: Config,
+    manifest: Manifest,
+    results: Iterable["ProcessResult"],
+    metrics: Optional[Metrics] = None,
+    catalog: Optional["Catalog"] = None,
+    journal: Optional["Journal"] = None,
+    reporter: Optional[Reporter] = None,
+) -> Tuple[int, List["ProcessResult"]]:
+    """Record processing results in the manifest and report progress.
+
+    Args:
+        config (Config): Validated configuration.
+        manifest (Manifest): Manifest to record processed images in.
+        results (Iterable[ProcessResult]): Outcome of each image.
+        metrics (Metrics): If given, per-stage timings are collected in it.
+        catalog (Catalog): If given, processed images are also recorded in it.
+        journal (Journal): If given, processed images are journaled until the
+            manifest is committed.
+        reporter (Reporter): Reports the outcome of each image. Defaults to a
+            line of text per image.
+    Returns:
+        (tuple) The number of images processed and the failed results.
+    """
+    from photo_info import photo_info
+
+    if reporter is None:
+        reporter = Reporter()
+
+    processed = 0
+    failures = []
+    written_dirs = set()
+
+    def commit() -> None:
+        # Make the markdown renames durable before the manifest claims them
+        if config.fsync:
+            photo_info.sync_directories(written_dirs)
+            written_dirs.clear()
+        manifest.commit()
+        if catalog is not None:
+            catalog.flush()
+        if journal is not None:
+            journal.checkpoint()
+
+    for result in results:
+        image_name = result.item.rel_path
+        if metrics is not None:
+            metrics.record(image_name, result.timings, failed=bool(result.error))
+        if result.error:
+            failures.append(result)
+            reporter.failed(result)
+        else:
+            processed += 1
+            written_dirs.add(os.path.dirname(result.item.markdown_file))
+            manifest.record(result.item.rel_path, result.fingerprint, result.labeled_exif)
+            if journal is not None:
+                journal.done(result.item.rel_path, result.fingerprint, result.labeled_exif)
+            if catalog is not None:
+                catalog.update(
+                    result.item.rel_path,
+                    scanner.site_path(result.item.image_file, result.item.rel_path),
+                    result.labeled_exif,
+                )
+            if not result.labeled_exif:
+                reporter.no_exif(result.item.rel_path)
+            reporter.processed(result)
+        if (processed + len(failures)) % MANIFEST_COMMIT_INTERVAL == 0:
+            commit()
+    commit()
+    return processed, failures
+
+
+def _quarantine(
+    manifest: Manifest,
+    failures: List["ProcessResult"],
+    attempts: int,
+    metrics: Optional[Metrics] = None,
+    journal: Optional["Journal"] = None,
+) -> None:
+    """Quarantine images that failed every attempt, so later runs skip them until they change.
+
+    Args:
+        manifest (Manifest): Manifest to record the failures in.
+        failures (List[ProcessResult]): Results that failed every attempt.
+        attempts (int): Number of times each image was tried.
+        metrics (Metrics): If given, quarantined images are counted in it.
+        journal (Journal): If given, failures are journaled until the manifest
+            is committed.
+    """
+    for result in failures:
+        if result.fingerprint is not None:
+            size, mtime_ns = result.fingerprint.size, result.fingerprint.mtime_ns
+        else:
+            try:
+                st = os.stat(result.item.image_file)
+            except OSError:
+                # Gone, so there is nothing to skip on the next run
+                continue
+            size, mtime_ns = st.st_size, st.st_mtime_ns
+        failure = Failure(size, mtime_ns, attempts, result.error)
+        manifest.record_failure(result.item.rel_path, failure)
+        if journal is not None:
+            journal.failed(result.item.rel_path, failure)
+    if failures:
+        if metrics is not None:
+            metrics.count("quarantined", len(failures))
+        manifest.commit()
+        if journal is not None:
+            journal.checkpoint()
+
+
+def _open_journal(
+    config: Config,
+    manifest: Manifest,
+    manifest_name: str = MANIFEST_NAME,
+    catalog: Optional["Catalog"] = None,
+    image_dir: str = "",
+) -> "Journal":
+    """Open the journal kept next to the manifest, replaying what an interrupted run left in it.
+
+    Args:
+        config (Config): Validated configuration.
+        manifest (Manifest): Manifest the journal belongs to.
+        manifest_name (str): File name of the manifest.
+        catalog (Catalog): If given, replayed images are also recorded in it.
+        image_dir (str): Path to the image directory ending with "/", or ""
+            for images read from an archive.
+    Returns:
+        (Journal) The open journal.
+    """
+    from photo_info.journal import Journal, journal_path
+
+    journal = Journal(journal_path(Path(config.markdown_dir) / manifest_name), manifest, fsync=config.fsync)
+    replayed = journal.replay()
+    if replayed:
+        if catalog is not None:
+            for path, labeled_exif in replayed.items():
+                catalog.update(path, scanner.site_path(image_dir + path, path), labeled_exif)
+            catalog.flush()
+        console.print(f"[yellow]Resumed an interrupted run: {len(replayed)} images were already done.[/yellow]")
+    return journal
+
+
+def _open_catalog(config: Config) -> Optional["Catalog"]:
+    """Open the configured catalog, or return None if there is none."""
+    if not config.catalog_path:
+        return None
+    from photo_info.catalog import Catalog
+
+    return Catalog(str(config.catalog_path), fsync=config.fsync)
+
+
+def _print_stats(metrics: Metrics) -> None:
+    """Print a summary of where the time of a run went."""
+    from rich.table import Table
+
+    data = metrics.to_dict()
+    counters = data["counters"]
+    done = counters.get("processed", 0) + counters.get("failed", 0)
+    rate = done / data["elapsed"] if data["elapsed"] else 0.0
+
+    table = Table(title="Stage timings")
+    table.add_column("Stage")
+    for column in ("Files", "Total (s)", "Mean (ms)", "p50 (ms)", "p90 (ms)", "p99 (ms)", "Max (ms)"):
+        table.add_column(column, justify="right")
+    for stage, summary in data["stages"].items():
+        table.add_row(
+            stage,
+            str(summary["count"]),
+            f"{summary['total']:.3f}",
+            *(f"{summary[key] * 1000:.2f}" for key in ("mean", "p50", "p90", "p99", "max")),
+        )
+    console.print(table)
+
+    if data["slowest"]:
+        slowest = Table(title="Slowest files")
+        slowest.add_column("Image")
+        slowest.add_column("Total (ms)", justify="right")
+        slowest.add_column("Breakdown")
+        for entry in data["slowest"]:
+            breakdown = ", ".join(
+                f"{stage} {seconds * 1000:.2f}" for stage, seconds in entry["stages"].items()
+            )
+            slowest.add_row(entry["path"], f"{entry['seconds'] * 1000:.2f}", breakdown)
+        console.print(slowest)
+
+    if data["settings"]:
+        console.print("Settings: " + ", ".join(f"{name} {value}" for name, value in data["settings"].items()))
+    console.print(
+        f"Scanned {counters.get('scanned', 0)}, processed {counters.get('processed', 0)}, "
+        f"failed {counters.get('failed', 0)} in {data['elapsed']:.2f}s ({rate:.1f} images/s)"
+    )
+
+
+def _process_directory(
+    config: Config,
+    manifest_name: str,
+    shard: Optional["Shard"],
+    full: bool,
+    retry_quarantined: bool,
+    metrics: Optional[Metrics],
+    reporter: Reporter,
+) -> Tuple[int, List["ProcessResult"], int]:
+    """Process the new or changed images of the configured image directory or archive.
+
+    Args:
+        config (Config): Validated configuration.
+        manifest_name (str): File name of the manifest, e.g. that of a shard.
+        shard (Shard): If given, only the images of this shard are processed.
+        full (bool): Whether to forget the manifest and process every image.
+        retry_quarantined (bool): Whether to process quarantined images again.
+        metrics (Metrics): If given, scan and per-stage timings are collected in it.
+        reporter (Reporter): Reports the outcome of each image.
+    Returns:
+        (tuple) The number of images processed, the results that failed every
+        attempt and the number of quarantined images skipped.
+    """
+    # Ensure directories end with a slash for compatibility with existing code
+    image_dir_str = str(config.image_dir) + "/"
+    md_dir_str = str(config.markdown_dir) + "/"
+
+    with Manifest(config.markdown_dir, hash_mode=config.hash_mode, name=manifest_name) as manifest:
+        if full:
+            manifest.clear()
+
+        # Shards share the catalog, so it is only updated by merge
+        catalog = _open_catalog(config) if shard is None else None
+        image_prefix = "" if is_archive(config.image_dir) else image_dir_str
+        journal = _open_journal(config, manifest, manifest_name, catalog, image_prefix)
+
+        skipped = 0
+
+        def quarantined(item: WorkItem, failure: Failure) -> None:
+            nonlocal skipped
+            skipped += 1
+
+        if is_archive(config.image_dir):
+            processed, failures = _process_archive(
+                config, manifest, shard, retry_quarantined, quarantined, metrics, catalog, journal, reporter
+            )
+        else:
+            items = scanner.scan_images(
+                image_dir_str,
+                md_dir_str,
+                manifest=manifest,
+                extensions=config.extensions,
+                recursive=config.recursive,
+                shard=shard,
+                retry_failed=retry_quarantined,
+                on_skip=quarantined,
+                on_error=_print_unreadable,
+            )
+            processed, failures = _process_items(
+                config, manifest, reporter.track(items), metrics, catalog=catalog, journal=journal, reporter=reporter
+            )
+        journal.close()
+        if catalog is not None:
+            from photo_info.catalog import sync_with_manifest
+
+            sync_with_manifest(catalog, manifest, image_prefix)
+    return processed, failures, skipped
+
+
+def _process_archive(
+    config: Config,
+    manifest: Manifest,
+    shard: Optional["Shard"],
+    retry_quarantined: bool,
+    on_skip,
+    metrics: Optional[Metrics],
+    catalog: Optional["Catalog"],
+    journal: "Journal",
+    reporter: Reporter,
+) -> Tuple[int, List["ProcessResult"]]:
+    """Process the new or changed members of the configured archive."""
+    from photo_info.archive import process_archive
+
+    results = process_archive(
+        str(config.image_dir),
+        str(config.markdown_dir) + "/",
+        manifest=manifest,
+        extensions=config.extensions,
+        engine=config.exif_engine,
+        verify=config.verify,
+        fsync=config.fsync,
+        tags=config.tag_rules(),
+        shard=shard,
+        retry_failed=retry_quarantined,
+        on_skip=on_skip,
+    )
+    # Streamed archives cannot be reread cheaply, so members are not retried
+    processed, failures = _record_results(
+        config, manifest, reporter.track(results), metrics, catalog, journal, reporter
+    )
+    _quarantine(manifest, failures, 1, metrics, journal)
+    return processed, failures
+
+
+def _process_collections(
+    config: Config,
+    collections: List[Config],
+    manifest_name: str,
+    shard: Optional["Shard"],
+    full: bool,
+    retry_quarantined: bool,
+    metrics: Optional[Metrics],
+    reporter: Reporter,
+) -> Tuple[int, List["ProcessResult"], int]:
+    """Process the new or changed images of several collections in one run.
+
+    The image directories of all collections are scanned at once, then their
+    pending images are fed to one shared worker pool as a single stream, the
+    collections with the most pending images first: the workers go on to the
+    next collection while the last images of the previous one finish, rather
+    than the pool draining at the end of every collection. With the pipeline,
+    collections take turns. Collections read from archives are streamed
+    last, since their size is not known before they are read.
+
+    Args:
+        config (Config): Validated top-level configuration, whose jobs and
+            executor size the shared pool.
+        collections (List[Config]): Validated configurations of the collections.
+        manifest_name (str): File name of each collection's manifest.
+        shard (Shard): If given, only the images of this shard are processed.
+        full (bool): Whether to forget the manifests and process every image.
+        retry_quarantined (bool): Whether to process quarantined images again.
+        metrics (Metrics): If given, scan and per-stage timings of all
+            collections are collected in it.
+        reporter (Reporter): Reports the outcome of each image.
+    Returns:
+        (tuple) The number of images processed, the results that failed every
+        attempt and the number of quarantined images skipped.
+    """
+    import contextlib
+    from concurrent.futures import ThreadPoolExecutor
+
+    from photo_info import photo_info
+
+    skipped = 0
+
+    def quarantined(item: WorkItem, failure: Failure) -> None:
+        nonlocal skipped
+        skipped += 1
+
+    with contextlib.ExitStack() as stack:
+        runs = []
+        for collection in collections:
+            manifest = stack.enter_context(
+                Manifest(collection.markdown_dir, hash_mode=collection.hash_mode, name=manifest_name)
+            )
+            if full:
+                manifest.clear()
+            catalog = _open_catalog(collection) if shard is None else None
+            image_prefix = "" if is_archive(collection.image_dir) else str(collection.image_dir) + "/"
+            journal = _open_journal(collection, manifest, manifest_name, catalog, image_prefix)
+            runs.append((collection, manifest, catalog, journal, image_prefix))
+
+        def scan(run) -> Optional[List[WorkItem]]:
+            collection, manifest, _, _, image_prefix = run
+            if not image_prefix:
+                return None
+            return list(scanner.scan_images(
+                image_prefix,
+                str(collection.markdown_dir) + "/",
+                manifest=manifest,
+                extensions=collection.extensions,
+                recursive=collection.recursive,
+                shard=shard,
+                retry_failed=retry_quarantined,
+                on_skip=quarantined,
+                on_error=_print_unreadable,
+            ))
+
+        with ThreadPoolExecutor(max_workers=min(SCAN_THREADS, len(runs))) as scan_pool:
+            pending = list(scan_pool.map(scan, runs))
+        # Most pending images first, archives last
+        order = sorted(range(len(runs)), key=lambda i: -1 if pending[i] is None else len(pending[i]), reverse=True)
+        reporter.add(sum(len(items) for items in pending if items))
+
+        processed = 0
+        failures: List["ProcessResult"] = []
+        directories = [i for i in order if pending[i]]
+        archives = [i for i in order if pending[i] is None]
+        if config.pipeline:
+            # Each pipeline runs its own stages, so collections take turns
+            for i in directories:
+                collection, manifest, catalog, journal, _ = runs[i]
+                reporter.collection(collection.name, len(pending[i]))
+                done, failed = _process_items(
+                    collection, manifest, pending[i], metrics, catalog=catalog, journal=journal, reporter=reporter
+                )
+                processed += done
+                failures.extend(failed)
+        elif directories:
+            pool = photo_info.open_pool(config.jobs, config.executor)
+            try:
+                processed, failures = _process_interleaved(
+                    config, [runs[i] for i in directories], [pending[i] for i in directories], metrics, pool,
+                    reporter,
+                )
+            finally:
+                if pool is not None:
+                    pool.shutdown()
+        for i in archives:
+            collection, manifest, catalog, journal, _ = runs[i]
+            reporter.collection(collection.name, None)
+            done, failed = _process_archive(
+                collection, manifest, shard, retry_quarantined, quarantined, metrics, catalog, journal, reporter
+            )
+            processed += done
+            failures.extend(failed)
+
+        for _, manifest, catalog, journal, image_prefix in runs:
+            journal.close()
+            if catalog is not None:
+                from photo_info.catalog import sync_with_manifest
+
+                sync_with_manifest(catalog, manifest, image_prefix)
+    return processed, failures, skipped
+
+
+def _print_unreadable(rel_dir: str, error: OSError) -> None:
+    """Report a directory that could not be scanned."""
+    console.print(f"[red]Skipped {rel_dir}: {error}[/red]")
+
+
 @app.command()
 def process(
     image_dir: Optional[Path] = typer.Argument(
@@ -56,48 +714,826 @@ def process(
         help="Directory where markdown files will be saved. If not provided, uses config file.",
         exists=False,
     ),
+    jobs: Optional[int] = typer.Option(
+        None,
+        "--jobs",
+        "-j",
+        help="Number of images to process in parallel. Defaults to performance.jobs or the number of CPUs.",
+        min=1,
+    ),
+    no_verify: bool = typer.Option(
+        False,
+        "--no-verify",
+        help="Skip Pillow's file verification when the header-only reader falls back to it.",
+    ),
+    full: bool = typer.Option(
+        False,
+        "--full",
+        help="Ignore the manifest and reprocess every image.",
+    ),
+    pipeline: bool = typer.Option(
+        False,
+        "--pipeline",
+        help="Stream images through concurrent read, parse and write stages instead of a worker pool.",
+    ),
+    derivatives: bool = typer.Option(
+        False,
+        "--derivatives",
+        help="Write resized variants and a blur placeholder of each image to derivatives.directory.",
+    ),
+    stats: bool = typer.Option(
+        False,
+        "--stats",
+        help="Print per-stage timings and the slowest files when done.",
+    ),
+    metrics_json: Optional[Path] = typer.Option(
+        None,
+        "--metrics-json",
+        help="Write counters, per-stage latency histograms and the slowest files to this JSON file.",
+    ),
+    profile: Optional[Path] = typer.Option(
+        None,
+        "--profile",
+        help="Run under cProfile and dump the profile to this file. Use --jobs 1 to include worker time.",
+    ),
+    skip_duplicates: bool = typer.Option(
+        False,
+        "--skip-duplicates",
+        help="Do not write markdown for images that duplicate an image already indexed or processed.",
+    ),
+    catalog_path: Optional[Path] = typer.Option(
+        None,
+        "--catalog",
+        help="Also keep the src and EXIF data of every image in this NDJSON catalog file.",
+    ),
+    shard_spec: Optional[str] = typer.Option(
+        None,
+        "--shard",
+        help="Only process shard I of N (e.g. 2/8), chosen by a hash of each image's path. Combine shards with merge.",
+    ),
+    retries: Optional[int] = typer.Option(
+        None,
+        "--retries",
+        help="Retry failed images this many times before quarantining them. Defaults to errors.retries.",
+        min=0,
+    ),
+    retry_quarantined: bool = typer.Option(
+        False,
+        "--retry-quarantined",
+        help="Process quarantined images again even if they have not changed.",
+    ),
+    collection_names: Optional[List[str]] = typer.Option(
+        None,
+        "--collection",
+        help="Only process this collection of the config file. Can be given several times.",
+    ),
+    quiet: bool = typer.Option(
+        False,
+        "--quiet",
+        "-q",
+        help="Only report failures and the summary, not each image.",
+    ),
+    log_format: str = typer.Option(
+        "auto",
+        "--log-format",
+        help="How each image is reported: auto (a progress bar on a terminal, a line per image otherwise), "
+        "text, or json (one event per line on stdout, other messages on stderr).",
+    ),
+    io_schedule: Optional[str] = typer.Option(
+        None,
+        "--io-schedule",
+        help="How image headers are read: off, or locality (in disk order, with readahead hints and a cap "
+        "on reads per device). Defaults to io.schedule.",
+    ),
 ):
-    """Process images in the specified directory and generate markdown files with EXIF data."""
+    """Process images in the specified directory and generate markdown files with EXIF data.
+
+    With [\\[collections]] in the config file and no directories given, every
+    collection is processed in one run.
+    """
     try:
+        if log_format not in LOG_FORMATS:
+            console.print(
+                f"[red]Error: --log-format must be one of {', '.join(LOG_FORMATS)}, got {log_format!r}[/red]"
+            )
+            raise typer.Exit(code=1)
+        if log_format == "json":
+            # Keep stdout for the events
+            console.get().stderr = True
+
         # Load configuration
         config = Config()
+
+        # Directories given on the command line replace the configured collections
+        collections = [] if image_dir or md_dir else config.collections
+        if collection_names:
+            unknown = sorted(set(collection_names) - {collection.name for collection in collections})
+            if unknown:
+                console.print(f"[red]Error: Unknown collection: {', '.join(unknown)}[/red]")
+                raise typer.Exit(code=1)
+            collections = [collection for collection in collections if collection.name in collection_names]
+        if collections and catalog_path:
+            console.print("[red]Error: Set the catalog of each collection in its [\\[collections]] entry[/red]")
+            raise typer.Exit(code=1)
         
         # Override config with command line arguments if provided
         if image_dir:
             config.image_dir = image_dir
         if md_dir:
             config.markdown_dir = md_dir
+        if catalog_path:
+            config.catalog_path = catalog_path
+        for target in [config] + collections:
+            if jobs:
+                target.jobs = jobs
+            if no_verify:
+                target.verify = False
+            if pipeline:
+                target.pipeline = True
+            if derivatives:
+                target.derivatives = True
+            if skip_duplicates:
+                target.skip_duplicates = True
+            if retries is not None:
+                target.retries = retries
+            if io_schedule:
+                target.io_schedule = io_schedule
             
         # Validate configuration
-        if not config.validate():
+        config.collections = collections
+        if not (config.validate_collections() if collections else config.validate()):
             raise typer.Exit(code=1)
+
+        shard = None
+        manifest_name = MANIFEST_NAME
+        if shard_spec:
+            from photo_info.shard import Shard
+
+            try:
+                shard = Shard.parse(shard_spec)
+            except ValueError as e:
+                console.print(f"[red]Error: {e}[/red]")
+                raise typer.Exit(code=1)
+            manifest_name = shard.manifest_name
             
-        # Ensure directories end with a slash for compatibility with existing code
-        image_dir_str = str(config.image_dir) + "/"
-        md_dir_str = str(config.markdown_dir) + "/"
-        
-        new_images = photo_info.identify_new_images(image_dir_str, md_dir_str)
-        
-        if not new_images:
+        metrics = Metrics() if stats or metrics_json else None
+        if metrics is not None:
+            metrics.settings["io_schedule"] = config.io_schedule
+            if config.io_schedule == "locality":
+                metrics.settings["reads_per_device"] = config.io_reads_per_device
+        profiler = None
+        if profile:
+            import cProfile
+
+            profiler = cProfile.Profile()
+        reporter = make_reporter(log_format, quiet)
+        if profiler:
+            profiler.enable()
+        try:
+            if collections:
+                processed, failures, skipped = _process_collections(
+                    config, collections, manifest_name, shard, full, retry_quarantined, metrics, reporter
+                )
+            else:
+                processed, failures, skipped = _process_directory(
+                    config, manifest_name, shard, full, retry_quarantined, metrics, reporter
+                )
+            reporter.summary(processed, len(failures), skipped)
+        finally:
+            reporter.close()
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(str(profile))
+                console.print(f"Profile written to {profile}")
+
+        if metrics is not None:
+            metrics.stop()
+            if stats:
+                _print_stats(metrics)
+            if metrics_json:
+                metrics.write_json(str(metrics_json))
+                console.print(f"Metrics written to {metrics_json}")
+
+        if skipped:
+            console.print(
+                f"[yellow]Skipped {skipped} quarantined images that failed before; "
+                "see photo-info quarantine.[/yellow]"
+            )
+
+        if not processed and not failures:
             console.print("[yellow]No new images found to process.[/yellow]")
             return
-            
-        console.print(f"[green]Found {len(new_images)} new images to process[/green]")
-        
-        for image_name in new_images:
-            image_file = image_dir_str + image_name + ".jpg"
-            console.print(f"Processing {image_name}...")
-            
-            exif_data = photo_info.get_exif_data(image_file)
-            labeled_exif = photo_info.get_labeled_exif(exif_data)
-            photo_info.write_to_markdown(image_file, labeled_exif, md_dir_str)
-            
-        console.print("[green]Successfully processed all images![/green]")
+
+        if failures:
+            console.print(
+                f"[red]{len(failures)} of {processed + len(failures)} images failed to process and were "
+                "quarantined. They are skipped until they change, or use --retry-quarantined.[/red]"
+            )
+            raise typer.Exit(code=1)
+
+        console.print(f"[green]Successfully processed {processed} new or changed images![/green]")
+
+    except typer.Exit:
+        raise
         
     except Exception as e:
         console.print(f"[red]Error: {str(e)}[/red]")
         raise typer.Exit(code=1)
 
+    finally:
+        if log_format == "json":
+            console.get().stderr = False
+
+@app.command()
+def watch(
+    image_dir: Optional[Path] = typer.Argument(
+        None,
+        help="Directory containing the images to watch. If not provided, uses config file.",
+        exists=False,
+    ),
+    md_dir: Optional[Path] = typer.Argument(
+        None,
+        help="Directory where markdown files will be saved. If not provided, uses config file.",
+        exists=False,
+    ),
+    jobs: Optional[int] = typer.Option(
+        None,
+        "--jobs",
+        "-j",
+        help="Number of images to process in parallel. Defaults to performance.jobs or the number of CPUs.",
+        min=1,
+    ),
+    backend: Optional[str] = typer.Option(
+        None,
+        "--backend",
+        help=f"How to detect new files: {', '.join(BACKENDS)}. Defaults to watch.backend.",
+    ),
+    initial_scan: bool = typer.Option(
+        True,
+        "--initial-scan/--no-initial-scan",
+        help="Process images that arrived while nothing was watching before waiting for new ones.",
+    ),
+):
+    """Watch the image directory and process new or modified images as they arrive."""
+    try:
+        config = Config()
+
+        if image_dir:
+            config.image_dir = image_dir
+        if md_dir:
+            config.markdown_dir = md_dir
+        if jobs:
+            config.jobs = jobs
+        if backend:
+            config.watch_backend = backend
+
+        if not config.validate():
+            raise typer.Exit(code=1)
+        if is_archive(config.image_dir):
+            console.print("[red]Error: watch needs an image directory, not an archive[/red]")
+            raise typer.Exit(code=1)
+
+        image_dir_str = str(config.image_dir) + "/"
+        md_dir_str = str(config.markdown_dir) + "/"
+        tags = config.tag_rules()
+
+        with Manifest(config.markdown_dir, hash_mode=config.hash_mode) as manifest:
+            catalog = _open_catalog(config)
+            journal = _open_journal(config, manifest, catalog=catalog, image_dir=image_dir_str)
+            if initial_scan:
+                items = scanner.scan_images(
+                    image_dir_str,
+                    md_dir_str,
+                    manifest=manifest,
+                    extensions=config.extensions,
+                    recursive=config.recursive,
+                    on_error=lambda rel_dir, error: console.print(f"[red]Skipped {rel_dir}: {error}[/red]"),
+                )
+                _process_items(config, manifest, items, tags=tags, catalog=catalog, journal=journal)
+            if catalog is not None:
+                from photo_info.catalog import sync_with_manifest
+
+                sync_with_manifest(catalog, manifest, image_dir_str)
+
+            console.print(f"[green]Watching {config.image_dir} for new images. Press Ctrl+C to stop.[/green]")
+            batches = watch_batches(
+                image_dir_str,
+                md_dir_str,
+                manifest,
+                extensions=config.extensions,
+                recursive=config.recursive,
+                backend=config.watch_backend,
+                settle=config.watch_settle,
+                batch_window=config.watch_batch_window,
+                poll_interval=config.watch_poll_interval,
+            )
+            try:
+                for batch in batches:
+                    _process_items(config, manifest, batch, tags=tags, catalog=catalog, journal=journal)
+            except KeyboardInterrupt:
+                console.print("[yellow]Stopped watching.[/yellow]")
+            finally:
+                journal.close()
+
+    except typer.Exit:
+        raise
+
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+        raise typer.Exit(code=1)
+
+@app.command()
+def dedupe(
+    image_dir: Optional[Path] = typer.Argument(
+        None,
+        help="Directory containing the images to check. If not provided, uses config file.",
+        exists=False,
+    ),
+    md_dir: Optional[Path] = typer.Argument(
+        None,
+        help="Directory holding the markdown files and hash index. If not provided, uses config file.",
+        exists=False,
+    ),
+    hash_kind: Optional[str] = typer.Option(
+        None,
+        "--hash",
+        help="Perceptual hash to compare: phash or dhash. Defaults to dedupe.hash.",
+    ),
+    threshold: Optional[int] = typer.Option(
+        None,
+        "--threshold",
+        "-t",
+        help="Maximum number of differing hash bits between near-duplicates. Defaults to dedupe.threshold.",
+    ),
+    link: bool = typer.Option(
+        False,
+        "--link",
+        help="Record duplicate_of in the front-matter of each duplicate's markdown file.",
+    ),
+):
+    """Find images that are copies or near-copies of each other."""
+    try:
+        from photo_info.dedupe import HashIndex, find_duplicate_groups
+        from photo_info.photo_info import set_front_matter
+
+        config = Config()
+
+        if image_dir:
+            config.image_dir = image_dir
+        if md_dir:
+            config.markdown_dir = md_dir
+        if hash_kind:
+            config.duplicate_hash = hash_kind
+        if threshold is not None:
+            config.duplicate_threshold = threshold
+
+        if not config.validate():
+            raise typer.Exit(code=1)
+        if is_archive(config.image_dir):
+            console.print("[red]Error: dedupe needs an image directory, not an archive[/red]")
+            raise typer.Exit(code=1)
+
+        image_dir_str = str(config.image_dir) + "/"
+        md_dir_str = str(config.markdown_dir) + "/"
+
+        with Manifest(config.markdown_dir, hash_mode=config.hash_mode) as manifest:
+            index = HashIndex(manifest)
+            recorded = index.entries()
+            entries = {}
+            files = scanner.iter_image_files(image_dir_str, config.extensions, config.recursive)
+            for rel_path, entry in files:
+                entries[rel_path] = index.update(rel_path, entry.path, recorded.get(rel_path))
+            index.remove(path for path in recorded if path not in entries)
+            manifest.commit()
+
+        groups = find_duplicate_groups(entries, config.duplicate_hash, config.duplicate_threshold)
+        duplicates = sum(len(group) - 1 for group in groups)
+
+        if groups:
+            from rich.table import Table
+
+            table = Table(title="Duplicate images")
+            table.add_column("Original")
+            table.add_column("Duplicate")
+            table.add_column("Distance", justify="right")
+            for original, *copies in groups:
+                for copy in copies:
+                    table.add_row(original.path, copy.path, "identical" if not copy.distance else str(copy.distance))
+            console.print(table)
+
+        if link:
+            originals = {}
+            for original, *copies in groups:
+                for copy in copies:
+                    originals[copy.path] = original.path
+            linked = 0
+            for rel_path in entries:
+                md_file = scanner.markdown_path(md_dir_str, rel_path)
+                if not os.path.exists(md_file):
+                    continue
+                original = originals.get(rel_path)
+                value = scanner.site_path(image_dir_str + original, original) if original else None
+                linked += set_front_matter(md_file, "duplicate_of", value)
+            console.print(f"Updated {linked} markdown files.")
+
+        if not groups:
+            console.print("[green]No duplicate images found.[/green]")
+        else:
+            console.print(f"[yellow]Found {duplicates} duplicate images in {len(groups)} groups.[/yellow]")
+
+    except typer.Exit:
+        raise
+
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+        raise typer.Exit(code=1)
+
+@app.command()
+def merge(
+    image_dir: Optional[Path] = typer.Argument(
+        None,
+        help="Directory containing the processed images. If not provided, uses config file.",
+        exists=False,
+    ),
+    md_dir: Optional[Path] = typer.Argument(
+        None,
+        help="Directory holding the markdown files and shard manifests. If not provided, uses config file.",
+        exists=False,
+    ),
+    partial: bool = typer.Option(
+        False,
+        "--partial",
+        help="Merge the shards that have run even if others have not.",
+    ),
+):
+    """Combine the manifests written by process --shard into the main manifest."""
+    try:
+        from photo_info.shard import merge_shards
+
+        config = Config()
+
+        if image_dir:
+            config.image_dir = image_dir
+        if md_dir:
+            config.markdown_dir = md_dir
+
+        if not config.validate():
+            raise typer.Exit(code=1)
+
+        with Manifest(config.markdown_dir, hash_mode=config.hash_mode) as manifest:
+            try:
+                result = merge_shards(manifest, config.markdown_dir, partial=partial)
+            except ValueError as e:
+                console.print(f"[red]Error: {e}[/red]")
+                raise typer.Exit(code=1)
+
+            catalog = _open_catalog(config)
+            if catalog is not None:
+                from photo_info.catalog import sync_with_manifest
+
+                image_dir_str = "" if is_archive(config.image_dir) else str(config.image_dir) + "/"
+                sync_with_manifest(catalog, manifest, image_dir_str)
+
+        if result.missing:
+            console.print(
+                f"[yellow]Shards {', '.join(map(str, result.missing))} of {result.shards[0].count} "
+                "have not run yet.[/yellow]"
+            )
+        console.print(
+            f"[green]Merged {len(result.shards)} shards; the manifest now lists {result.images} images.[/green]"
+        )
+
+    except typer.Exit:
+        raise
+
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+        raise typer.Exit(code=1)
+
+@app.command()
+def quarantine(
+    image_dir: Optional[Path] = typer.Argument(
+        None,
+        help="Directory containing the processed images. If not provided, uses config file.",
+        exists=False,
+    ),
+    md_dir: Optional[Path] = typer.Argument(
+        None,
+        help="Directory holding the markdown files and manifest. If not provided, uses config file.",
+        exists=False,
+    ),
+    clear: bool = typer.Option(
+        False,
+        "--clear",
+        help="Release every quarantined image, so the next process run tries it again.",
+    ),
+):
+    """List the images that failed every attempt and are skipped until they change."""
+    try:
+        config = Config()
+
+        if image_dir:
+            config.image_dir = image_dir
+        if md_dir:
+            config.markdown_dir = md_dir
+
+        if not config.validate():
+            raise typer.Exit(code=1)
+
+        with Manifest(config.markdown_dir, hash_mode=config.hash_mode) as manifest:
+            failures = manifest.failures()
+            if clear:
+                manifest.clear_failures()
+
+        if not failures:
+            console.print("[green]No quarantined images.[/green]")
+            return
+
+        from rich.table import Table
+
+        table = Table(title="Quarantined images")
+        table.add_column("Image")
+        table.add_column("Attempts", justify="right")
+        table.add_column("Error")
+        for path in sorted(failures):
+            table.add_row(path, str(failures[path].attempts), failures[path].error)
+        console.print(table)
+
+        if clear:
+            console.print(f"[green]Released {len(failures)} quarantined images.[/green]")
+        else:
+            console.print(f"[yellow]{len(failures)} images are quarantined.[/yellow]")
+
+    except typer.Exit:
+        raise
+
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+        raise typer.Exit(code=1)
+
+@app.command()
+def export(
+    output: Path = typer.Argument(
+        ...,
+        help="File to write: .parquet for a Parquet table (needs pyarrow), .npy for a NumPy structured array.",
+    ),
+    image_dir: Optional[Path] = typer.Argument(
+        None,
+        help="Directory containing the images to export. If not provided, uses config file.",
+        exists=False,
+    ),
+    jobs: Optional[int] = typer.Option(
+        None,
+        "--jobs",
+        "-j",
+        help="Number of images to read in parallel. Defaults to performance.jobs or the number of CPUs.",
+        min=1,
+    ),
+):
+    """Export the EXIF data of every image as one column per tag, for analysis."""
+    try:
+        config = Config()
+
+        if image_dir:
+            config.image_dir = image_dir
+        if jobs:
+            config.jobs = jobs
+        # Nothing is written to the markdown directory
+        if not config.markdown_dir:
+            config.markdown_dir = output.parent
+
+        if not config.validate():
+            raise typer.Exit(code=1)
+        if is_archive(config.image_dir):
+            console.print("[red]Error: export needs an image directory, not an archive[/red]")
+            raise typer.Exit(code=1)
+
+        suffix = output.suffix.lower()
+        if suffix not in (".parquet", ".npy"):
+            console.print(f"[red]Error: Cannot export to {output.name}; use a .parquet or .npy file[/red]")
+            raise typer.Exit(code=1)
+
+        from photo_info.records import extract_many, to_numpy, write_parquet
+
+        files = scanner.iter_image_files(str(config.image_dir) + "/", config.extensions, config.recursive)
+        records = extract_many(
+            (entry.path for _, entry in files),
+            jobs=config.jobs,
+            executor=config.executor,
+            engine=config.exif_engine,
+            verify=config.verify,
+        )
+        try:
+            if suffix == ".parquet":
+                count = write_parquet(records, str(output))
+            else:
+                table = to_numpy(records)
+                import numpy
+
+                numpy.save(str(output), table)
+                count = len(table)
+        except ImportError as e:
+            console.print(f"[red]Error: {e}[/red]")
+            raise typer.Exit(code=1)
+
+        console.print(f"[green]Exported {count} images to {output}[/green]")
+
+    except typer.Exit:
+        raise
+
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+        raise typer.Exit(code=1)
+
+
+def _manifest_dir(md_dir: Optional[Path], hint: str = "") -> Path:
+    """Return the markdown directory whose manifest queries read."""
+    config = Config()
+    if md_dir:
+        config.markdown_dir = md_dir
+    if not config.markdown_dir or not (Path(config.markdown_dir) / MANIFEST_NAME).exists():
+        console.print(f"[red]Error: No manifest found. Run photo-info process first{hint}.[/red]")
+        raise typer.Exit(code=1)
+    return Path(config.markdown_dir)
+
+
+def _location_dir(md_dir: Optional[Path]) -> Path:
+    """Return the markdown directory whose manifest location queries read."""
+    return _manifest_dir(md_dir, ", with GPSInfo among the tags")
+
+
+def _print_matches(matches: list, limit: int, area: str) -> None:
+    """Print the images found by a location query."""
+    if not matches:
+        console.print(f"[yellow]No images found {area}.[/yellow]")
+        return
+
+    from rich.table import Table
+
+    table = Table(title=f"Images {area}")
+    table.add_column("Image")
+    table.add_column("Latitude", justify="right")
+    table.add_column("Longitude", justify="right")
+    if matches[0].distance is not None:
+        table.add_column("Distance (km)", justify="right")
+    for match in matches[:limit]:
+        row = [match.path, f"{match.latitude:.6f}", f"{match.longitude:.6f}"]
+        if match.distance is not None:
+            row.append(f"{match.distance:.3f}")
+        table.add_row(*row)
+    console.print(table)
+
+    if len(matches) > limit:
+        console.print(f"Showing {limit} of {len(matches)} images; use --limit to see more.")
+    else:
+        console.print(f"{len(matches)} images found.")
+
+
+LIMIT_OPTION = typer.Option(50, "--limit", "-n", help="Maximum number of images to list.", min=1)
+MD_DIR_OPTION = typer.Option(
+    None,
+    "--markdown-dir",
+    "-m",
+    help="Directory holding the markdown files and manifest. If not provided, uses config file.",
+)
+
+
+# Negative coordinates must not be taken for options
+@app.command(context_settings={"ignore_unknown_options": True})
+def near(
+    latitude: float = typer.Argument(
+        ..., help="Latitude in decimal degrees, negative south of the equator.", min=-90, max=90
+    ),
+    longitude: float = typer.Argument(
+        ..., help="Longitude in decimal degrees, negative west of Greenwich.", min=-180, max=180
+    ),
+    radius: float = typer.Option(1.0, "--radius", "-r", help="Search radius in kilometres.", min=0),
+    limit: int = LIMIT_OPTION,
+    md_dir: Optional[Path] = MD_DIR_OPTION,
+):
+    """List the images taken within a radius of a position, nearest first."""
+    try:
+        markdown_dir = _location_dir(md_dir)
+
+        from photo_info import geo
+
+        with Manifest(markdown_dir) as manifest:
+            matches = geo.near(manifest, latitude, longitude, radius)
+        _print_matches(matches, limit, f"within {radius:g} km of {latitude:g}, {longitude:g}")
+
+    except typer.Exit:
+        raise
+
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+        raise typer.Exit(code=1)
+
+
+@app.command(context_settings={"ignore_unknown_options": True})
+def within(
+    south: float = typer.Argument(..., help="Southern edge in decimal degrees.", min=-90, max=90),
+    west: float = typer.Argument(..., help="Western edge in decimal degrees.", min=-180, max=180),
+    north: float = typer.Argument(..., help="Northern edge in decimal degrees.", min=-90, max=90),
+    east: float = typer.Argument(
+        ...,
+        help="Eastern edge in decimal degrees; west of WEST for boxes crossing the antimeridian.",
+        min=-180,
+        max=180,
+    ),
+    limit: int = LIMIT_OPTION,
+    md_dir: Optional[Path] = MD_DIR_OPTION,
+):
+    """List the images taken inside a bounding box."""
+    try:
+        if south > north:
+            console.print("[red]Error: SOUTH must not be north of NORTH[/red]")
+            raise typer.Exit(code=1)
+        markdown_dir = _location_dir(md_dir)
+
+        from photo_info import geo
+
+        with Manifest(markdown_dir) as manifest:
+            matches = geo.within(manifest, south, west, north, east)
+        _print_matches(matches, limit, f"within {south:g}, {west:g} to {north:g}, {east:g}")
+
+    except typer.Exit:
+        raise
+
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+        raise typer.Exit(code=1)
+
+
+# Tags shown for every image found by a query, before those queried on
+QUERY_COLUMNS = ("DateTimeOriginal", "Make", "Model")
+
+
+@app.command()
+def query(
+    where: Optional[List[str]] = typer.Option(
+        None,
+        "--where",
+        "-w",
+        help='Condition such as "ISOSpeedRatings > 3200", "LensModel ~ 24-70" or "DateTimeOriginal = 2024". '
+        "May be repeated; images must meet every condition.",
+    ),
+    sort: Optional[str] = typer.Option(
+        None, "--sort", "-s", help='Tag to sort by, e.g. "DateTimeOriginal"; prefix with "-" for descending.'
+    ),
+    paths: bool = typer.Option(False, "--paths", help="Print only the image paths, one per line."),
+    limit: int = LIMIT_OPTION,
+    md_dir: Optional[Path] = MD_DIR_OPTION,
+):
+    """Find processed images by their EXIF data."""
+    try:
+        from photo_info.query import find, parse_condition, parse_order
+
+        try:
+            conditions = [parse_condition(condition) for condition in where or []]
+            order = parse_order(sort) if sort else None
+        except ValueError as e:
+            console.print(f"[red]Error: {e}[/red]")
+            raise typer.Exit(code=1)
+        markdown_dir = _manifest_dir(md_dir)
+
+        with Manifest(markdown_dir) as manifest:
+            # One more than shown tells whether there are more
+            results = find(manifest, conditions, order, limit + 1)
+
+        if paths:
+            for result in results[:limit]:
+                console.print(result.path, highlight=False, soft_wrap=True)
+            return
+        if not results:
+            console.print("[yellow]No images found.[/yellow]")
+            return
+
+        from rich.table import Table
+
+        tags = list(QUERY_COLUMNS)
+        for tag in [condition.tag for condition in conditions] + ([order.tag] if order else []):
+            if tag not in tags:
+                tags.append(tag)
+        table = Table(title="Images found")
+        table.add_column("Image")
+        for tag in tags:
+            table.add_column(tag)
+        for result in results[:limit]:
+            table.add_row(result.path, *(str(result.exif.get(tag, "")) for tag in tags))
+        console.print(table)
+
+        if len(results) > limit:
+            console.print(f"Showing the first {limit} images; use --limit to see more.")
+        else:
+            console.print(f"{len(results)} images found.")
+
+    except typer.Exit:
+        raise
+
+    except Exception as e:
+        console.print(f"[red]Error: {str(e)}[/red]")
+        raise typer.Exit(code=1)
+
 @app.command()
 def init():
     """Initialize a new configuration file in the current directory."""
@@ -110,8 +1546,113 @@ def init():
 
 [paths]
 # Paths can be absolute or relative to this config file
-images = "images"     # Directory containing images to process
+images = "images"     # Directory (or zip/tar archive) containing images to process
 markdown = "markdown" # Directory where markdown files will be saved
+
+[performance]
+# Number of images processed in parallel (defaults to the number of CPUs)
+# jobs = 8
+# Worker pool type: "thread" or "process"
+executor = "thread"
+# Content hash used to detect modified images: "full" reads every byte,
+# "sampled" reads only the start, middle and end of large (e.g. RAW) files
+hash = "full"
+
+[exif]
+# "fast" reads only the JPEG headers, "pillow" opens every file with Pillow
+engine = "fast"
+# Verify files when Pillow is used; set to false to skip verification entirely
+verify = true
+
+[scan]
+# Image extensions to process, matched case-insensitively. When files share a
+# name (e.g. RAW+JPEG pairs) the extension listed first is used.
+extensions = [".jpg", ".jpeg", ".png", ".tif", ".tiff", ".nef", ".cr2", ".arw", ".dng"]
+# Descend into subdirectories, mirroring them in the markdown directory
+recursive = true
+
+[pipeline]
+# Stream images through concurrent read, parse and write stages joined by
+# bounded queues instead of a worker pool (same as --pipeline)
+enabled = false
+readers = 8     # Concurrent header reads
+parsers = 2     # Concurrent EXIF parsers
+writers = 4     # Concurrent markdown writes
+queue_size = 64 # Images buffered between stages
+
+[watch]
+# How `photo-info watch` detects new files: "auto", "inotify" or "polling"
+backend = "auto"
+settle = 0.5         # Seconds a file must be quiet before a partial write is read
+batch_window = 0.1   # Seconds used to group bursts of arrivals into one batch
+poll_interval = 1.0  # Seconds between directory polls with the polling backend
+
+[output]
+# Flush markdown files to disk before they are renamed into place, and the
+# directories containing them once per batch
+fsync = false
+
+[tags]
+# EXIF tags written to the front-matter, in this order. Only these tags are
+# decoded; everything else in the file, such as MakerNote data, is skipped.
+names = ["Make", "Model", "DateTimeOriginal", "FocalLength", "FNumber",
+         "ExposureTime", "ISOSpeedRatings", "ExposureBiasValue", "LensMake", "LensModel"]
+
+# Add "GPSInfo" to write the latitude, longitude and altitude images were taken
+# at, which `photo-info near` and `photo-info within` search. Left out by
+# default, since published locations can reveal where people live.
+
+[tags.overrides]
+# Different tags for collections kept in subdirectories of the image directory
+# "scans" = ["DateTimeOriginal", "ImageDescription"]
+
+[derivatives]
+# Write resized variants of each image and record their paths, along with the
+# image's width, height and a tiny blurred placeholder, in the front-matter
+enabled = false
+directory = "derivatives"   # Relative to this config file
+widths = [480, 960, 1920]   # Widths above an image's own width are clamped to it
+formats = ["webp", "jpeg"]
+quality = 80
+placeholder_width = 16      # Set to 0 to skip the placeholder
+
+[dedupe]
+# Used by `photo-info dedupe` and the duplicate filter of `photo-info process`.
+# "phash" survives re-encoding and resizing better, "dhash" is cheaper
+hash = "phash"
+threshold = 6            # Maximum differing bits (of 64) between near-duplicates
+# Do not write markdown for images duplicating one already indexed or processed
+skip_duplicates = false
+
+[catalog]
+# Also keep the src and EXIF data of every image in one NDJSON file, updated by
+# appending changes, so the whole gallery can be loaded with one read
+# path = "markdown/catalog.ndjson"
+
+[errors]
+# Failed images are retried this many times, waiting retry_delay seconds before
+# the first retry and twice as long before each one after it. Images failing
+# every attempt are quarantined and skipped until they change; list them with
+# `photo-info quarantine`
+retries = 0
+retry_delay = 1.0
+
+[io]
+# "locality" reads image headers in their order on disk, hints the kernel not
+# to read ahead past them and caps the reads in flight per device; it helps
+# on spinning disks and network mounts. "off" reads in name order
+schedule = "off"
+# reads_per_device = 4
+# window = 1024
+
+# Process several galleries in one run, sharing one scan and worker pool, by
+# listing them as collections. Each has its own paths and, optionally, tags,
+# derivatives directory and catalog; all other settings above are shared.
+# [[collections]]
+# name = "travel"
+# images = "travel/images"
+# markdown = "travel/markdown"
+# tags = ["Make", "Model", "DateTimeOriginal", "GPSInfo"]
 """
     
     try:
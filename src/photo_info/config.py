@@ -1,13 +1,23 @@
 """Configuration handling for the Photo Info application."""
 
+import copy
 from pathlib import Path
-from typing import Optional
-import tomli
-from rich.console import Console
+from typing import Dict, List, Optional
 
-console = Console()
+from photo_info.archive import is_archive
+from photo_info.console import console
+from photo_info.dedupe import DEFAULT_THRESHOLD as DEFAULT_DUPLICATE_THRESHOLD, HASH_KINDS
+from photo_info.derivatives import FORMATS as DERIVATIVE_FORMATS, DerivativeSettings
+from photo_info.manifest import HASH_MODES
+from photo_info.scanner import DEFAULT_EXTENSIONS
+from photo_info.scheduler import DEFAULT_READS_PER_DEVICE, DEFAULT_WINDOW, IO_SCHEDULES, IOSettings
+from photo_info.tags import DEFAULT_TAGS, TagRules, compile_tags
+from photo_info.watch import BACKENDS as WATCH_BACKENDS
 
 DEFAULT_CONFIG_NAME = "photo_info.toml"
+EXECUTOR_CHOICES = ("thread", "process")
+ENGINE_CHOICES = ("fast", "pillow")
+PIPELINE_LIMITS = ("readers", "parsers", "writers", "queue_size")
 
 class Config:
     """Configuration handler for Photo Info."""
@@ -22,12 +32,49 @@ class Config:
         self.config_path = config_path or Path.cwd() / DEFAULT_CONFIG_NAME
         self.image_dir: Optional[Path] = None
         self.markdown_dir: Optional[Path] = None
+        self.jobs: Optional[int] = None
+        self.executor: str = "thread"
+        self.hash_mode: str = "full"
+        self.exif_engine: str = "fast"
+        self.verify: bool = True
+        self.extensions: List[str] = list(DEFAULT_EXTENSIONS)
+        self.recursive: bool = True
+        self.pipeline: bool = False
+        self.pipeline_limits: Dict[str, int] = {}
+        self.watch_backend: str = "auto"
+        self.watch_settle: float = 0.5
+        self.watch_batch_window: float = 0.1
+        self.watch_poll_interval: float = 1.0
+        self.fsync: bool = False
+        self.tags: List[str] = list(DEFAULT_TAGS)
+        self.tag_overrides: Dict[str, List[str]] = {}
+        self.derivatives: bool = False
+        self.derivatives_dir: Optional[Path] = None
+        self.derivative_widths: List[int] = [480, 960, 1920]
+        self.derivative_formats: List[str] = ["webp", "jpeg"]
+        self.derivative_quality: int = 80
+        self.placeholder_width: int = 16
+        self.duplicate_hash: str = "phash"
+        self.duplicate_threshold: int = DEFAULT_DUPLICATE_THRESHOLD
+        self.skip_duplicates: bool = False
+        self.catalog_path: Optional[Path] = None
+        self.retries: int = 0
+        self.retry_delay: float = 1.0
+        self.io_schedule: str = "off"
+        self.io_reads_per_device: int = DEFAULT_READS_PER_DEVICE
+        self.io_window: int = DEFAULT_WINDOW
+        # Name of the collection this configuration is for, see `collections`
+        self.name: Optional[str] = None
+        # Configurations of the [[collections]] processed together by one run
+        self.collections: List["Config"] = []
         
         if self.config_path.exists():
             self._load_config()
         
     def _load_config(self) -> None:
         """Load configuration from TOML file."""
+        import tomli
+
         try:
             with open(self.config_path, "rb") as f:
                 config_data = tomli.load(f)
@@ -48,11 +95,200 @@ class Config:
                     self.markdown_dir = (self.config_path.parent / self.markdown_dir).resolve()
                 else:
                     self.markdown_dir = self.markdown_dir.resolve()
+
+            performance = config_data.get("performance", {})
+
+            if "jobs" in performance:
+                self.jobs = int(performance["jobs"])
+
+            if "executor" in performance:
+                self.executor = str(performance["executor"])
+
+            if "hash" in performance:
+                self.hash_mode = str(performance["hash"])
+
+            exif = config_data.get("exif", {})
+
+            if "engine" in exif:
+                self.exif_engine = str(exif["engine"])
+
+            if "verify" in exif:
+                self.verify = bool(exif["verify"])
+
+            scan = config_data.get("scan", {})
+
+            if "extensions" in scan:
+                self.extensions = [
+                    ext if ext.startswith(".") else "." + ext for ext in scan["extensions"]
+                ]
+
+            if "recursive" in scan:
+                self.recursive = bool(scan["recursive"])
+
+            pipeline = dict(config_data.get("pipeline", {}))
+
+            if "enabled" in pipeline:
+                self.pipeline = bool(pipeline.pop("enabled"))
+
+            self.pipeline_limits = {key: int(value) for key, value in pipeline.items()}
+
+            watch = config_data.get("watch", {})
+
+            if "backend" in watch:
+                self.watch_backend = str(watch["backend"])
+
+            if "settle" in watch:
+                self.watch_settle = float(watch["settle"])
+
+            if "batch_window" in watch:
+                self.watch_batch_window = float(watch["batch_window"])
+
+            if "poll_interval" in watch:
+                self.watch_poll_interval = float(watch["poll_interval"])
+
+            output = config_data.get("output", {})
+
+            if "fsync" in output:
+                self.fsync = bool(output["fsync"])
+
+            tags = config_data.get("tags", {})
+
+            if "names" in tags:
+                self.tags = [str(name) for name in tags["names"]]
+
+            if "overrides" in tags:
+                self.tag_overrides = {
+                    str(directory): [str(name) for name in names]
+                    for directory, names in tags["overrides"].items()
+                }
+
+            derivatives = config_data.get("derivatives", {})
+
+            if "enabled" in derivatives:
+                self.derivatives = bool(derivatives["enabled"])
+
+            if "directory" in derivatives:
+                self.derivatives_dir = Path(derivatives["directory"]).expanduser()
+                if not self.derivatives_dir.is_absolute():
+                    self.derivatives_dir = (self.config_path.parent / self.derivatives_dir).resolve()
+                else:
+                    self.derivatives_dir = self.derivatives_dir.resolve()
+
+            if "widths" in derivatives:
+                self.derivative_widths = [int(width) for width in derivatives["widths"]]
+
+            if "formats" in derivatives:
+                self.derivative_formats = [str(name).lower() for name in derivatives["formats"]]
+
+            if "quality" in derivatives:
+                self.derivative_quality = int(derivatives["quality"])
+
+            if "placeholder_width" in derivatives:
+                self.placeholder_width = int(derivatives["placeholder_width"])
+
+            dedupe = config_data.get("dedupe", {})
+
+            if "hash" in dedupe:
+                self.duplicate_hash = str(dedupe["hash"])
+
+            if "threshold" in dedupe:
+                self.duplicate_threshold = int(dedupe["threshold"])
+
+            if "skip_duplicates" in dedupe:
+                self.skip_duplicates = bool(dedupe["skip_duplicates"])
+
+            catalog = config_data.get("catalog", {})
+
+            if "path" in catalog:
+                self.catalog_path = Path(catalog["path"]).expanduser()
+                if not self.catalog_path.is_absolute():
+                    self.catalog_path = (self.config_path.parent / self.catalog_path).resolve()
+                else:
+                    self.catalog_path = self.catalog_path.resolve()
+
+            errors = config_data.get("errors", {})
+
+            if "retries" in errors:
+                self.retries = int(errors["retries"])
+
+            if "retry_delay" in errors:
+                self.retry_delay = float(errors["retry_delay"])
+
+            io = config_data.get("io", {})
+
+            if "schedule" in io:
+                self.io_schedule = str(io["schedule"])
+
+            if "reads_per_device" in io:
+                self.io_reads_per_device = int(io["reads_per_device"])
+
+            if "window" in io:
+                self.io_window = int(io["window"])
+
+            self.collections = [self._collection(entry) for entry in config_data.get("collections", [])]
             
         except Exception as e:
             console.print(f"[red]Error loading config file: {e}[/red]")
             raise
 
+    def _resolve(self, path: str) -> Path:
+        """Resolve a configured path relative to the config file location."""
+        resolved = Path(path).expanduser()
+        if not resolved.is_absolute():
+            resolved = self.config_path.parent / resolved
+        return resolved.resolve()
+
+    def _collection(self, entry: dict) -> "Config":
+        """Build the configuration of one [[collections]] entry.
+
+        A collection has its own paths, tags, derivatives directory and
+        catalog; every other setting is shared with the top-level configuration.
+        """
+        collection = copy.copy(self)
+        collection.collections = []
+        collection.image_dir = self._resolve(entry["images"]) if "images" in entry else None
+        collection.markdown_dir = self._resolve(entry["markdown"]) if "markdown" in entry else None
+        collection.name = str(entry.get("name") or (collection.image_dir.name if collection.image_dir else ""))
+
+        if "tags" in entry:
+            collection.tags = [str(name) for name in entry["tags"]]
+        if "tag_overrides" in entry:
+            collection.tag_overrides = {
+                str(directory): [str(name) for name in names]
+                for directory, names in entry["tag_overrides"].items()
+            }
+        if "derivatives" in entry:
+            collection.derivatives_dir = self._resolve(entry["derivatives"])
+        # A catalog lists one site's images, so it is not shared
+        collection.catalog_path = self._resolve(entry["catalog"]) if "catalog" in entry else None
+        return collection
+
+    def validate_collections(self) -> bool:
+        """Validate every collection, and that they do not share a markdown directory.
+
+        Returns:
+            bool: True if all collections are valid, False otherwise.
+        """
+        names = set()
+        markdown_dirs = set()
+        for collection in self.collections:
+            if not collection.validate():
+                console.print(f"[red]Error: in collection {collection.name!r}[/red]")
+                return False
+            if collection.name in names:
+                console.print(f"[red]Error: Collection name {collection.name!r} is used twice[/red]")
+                return False
+            # The manifest and journal of a collection live in its markdown directory
+            if collection.markdown_dir in markdown_dirs:
+                console.print(
+                    f"[red]Error: Collections must not share a markdown directory, "
+                    f"but {collection.markdown_dir} is used twice[/red]"
+                )
+                return False
+            names.add(collection.name)
+            markdown_dirs.add(collection.markdown_dir)
+        return True
+
     def validate(self) -> bool:
         """Validate the configuration.
         
@@ -70,5 +306,150 @@ class Config:
         if not self.markdown_dir.exists():
             console.print(f"[red]Error: Markdown directory {self.markdown_dir} does not exist[/red]")
             return False
+
+        if self.image_dir.is_file():
+            if not self.is_archive():
+                console.print(
+                    f"[red]Error: {self.image_dir} is neither a directory nor a zip or tar archive[/red]"
+                )
+                return False
+            if self.derivatives or self.skip_duplicates:
+                console.print("[red]Error: Derivatives and duplicate filtering need an image directory, not an archive[/red]")
+                return False
+
+        if self.jobs is not None and self.jobs < 1:
+            console.print(f"[red]Error: performance.jobs must be at least 1, got {self.jobs}[/red]")
+            return False
+
+        if self.executor not in EXECUTOR_CHOICES:
+            console.print(
+                f"[red]Error: performance.executor must be one of {', '.join(EXECUTOR_CHOICES)}, "
+                f"got {self.executor!r}[/red]"
+            )
+            return False
+
+        if self.hash_mode not in HASH_MODES:
+            console.print(
+                f"[red]Error: performance.hash must be one of {', '.join(HASH_MODES)}, "
+                f"got {self.hash_mode!r}[/red]"
+            )
+            return False
+
+        if self.exif_engine not in ENGINE_CHOICES:
+            console.print(
+                f"[red]Error: exif.engine must be one of {', '.join(ENGINE_CHOICES)}, "
+                f"got {self.exif_engine!r}[/red]"
+            )
+            return False
+
+        for key, value in self.pipeline_limits.items():
+            if key not in PIPELINE_LIMITS:
+                console.print(
+                    f"[red]Error: Unknown pipeline setting {key!r}, expected one of "
+                    f"{', '.join(PIPELINE_LIMITS)}[/red]"
+                )
+                return False
+            if value < 1:
+                console.print(f"[red]Error: pipeline.{key} must be at least 1, got {value}[/red]")
+                return False
+
+        if self.watch_backend not in WATCH_BACKENDS:
+            console.print(
+                f"[red]Error: watch.backend must be one of {', '.join(WATCH_BACKENDS)}, "
+                f"got {self.watch_backend!r}[/red]"
+            )
+            return False
+
+        if not self.extensions:
+            console.print("[red]Error: scan.extensions must list at least one extension[/red]")
+            return False
+
+        try:
+            self.tag_rules()
+        except ValueError as e:
+            console.print(f"[red]Error: tags: {e}[/red]")
+            return False
+
+        if self.derivatives:
+            if not self.derivatives_dir:
+                console.print("[red]Error: derivatives.directory must be set to write derivatives[/red]")
+                return False
+            if any(width < 1 for width in self.derivative_widths) or self.placeholder_width < 0:
+                console.print("[red]Error: derivative widths must be positive[/red]")
+                return False
+            unknown = [name for name in self.derivative_formats if name not in DERIVATIVE_FORMATS]
+            if unknown:
+                console.print(
+                    f"[red]Error: derivatives.formats must be among {', '.join(DERIVATIVE_FORMATS)}, "
+                    f"got {', '.join(unknown)}[/red]"
+                )
+                return False
+            if not 1 <= self.derivative_quality <= 100:
+                console.print(
+                    f"[red]Error: derivatives.quality must be between 1 and 100, got {self.derivative_quality}[/red]"
+                )
+                return False
+
+        if self.duplicate_hash not in HASH_KINDS:
+            console.print(
+                f"[red]Error: dedupe.hash must be one of {', '.join(HASH_KINDS)}, "
+                f"got {self.duplicate_hash!r}[/red]"
+            )
+            return False
+
+        if not 0 <= self.duplicate_threshold <= 64:
+            console.print(
+                f"[red]Error: dedupe.threshold must be between 0 and 64, got {self.duplicate_threshold}[/red]"
+            )
+            return False
+
+        if self.retries < 0 or self.retry_delay < 0:
+            console.print("[red]Error: errors.retries and errors.retry_delay must not be negative[/red]")
+            return False
+
+        if self.io_schedule not in IO_SCHEDULES:
+            console.print(
+                f"[red]Error: io.schedule must be one of {', '.join(IO_SCHEDULES)}, "
+                f"got {self.io_schedule!r}[/red]"
+            )
+            return False
+
+        if self.io_reads_per_device < 0 or self.io_window < 1:
+            console.print(
+                "[red]Error: io.reads_per_device must not be negative and io.window must be at least 1[/red]"
+            )
+            return False
             
-        return True 
\ No newline at end of file
+        return True
+
+    def is_archive(self) -> bool:
+        """Return True if the images are read from a zip or tar archive rather than a directory."""
+        return self.image_dir is not None and is_archive(self.image_dir)
+
+    def tag_rules(self) -> TagRules:
+        """Compile the configured tags into the rules used during extraction.
+
+        Returns:
+            (TagRules) Tag IDs to extract, per image directory.
+        Raises:
+            ValueError: If a configured tag name is not a known EXIF tag.
+        """
+        return compile_tags(self.tags, self.tag_overrides)
+
+    def io_settings(self) -> Optional[IOSettings]:
+        """Return the settings of the I/O schedule, or None if it is off."""
+        if self.io_schedule == "off":
+            return None
+        return IOSettings(self.io_reads_per_device, self.io_window)
+
+    def derivative_settings(self) -> Optional[DerivativeSettings]:
+        """Return the derivatives to write, or None if they are disabled."""
+        if not self.derivatives:
+            return None
+        return DerivativeSettings(
+            str(self.derivatives_dir),
+            tuple(self.derivative_widths),
+            tuple(self.derivative_formats),
+            self.derivative_quality,
+            self.placeholder_width,
+        ) 
\ No newline at end of file
@@ -0,0 +1,28 @@
+"""Shared console for the Photo Info application."""
+
+# photo_info/console.py
+
+
+class LazyConsole:
+    """A rich console that is only created when something is printed.
+
+    Importing rich costs more than the rest of the CLI put together, so
+    commands that print nothing, or exit early, skip it entirely.
+    """
+
+    def __init__(self):
+        self._console = None
+
+    def get(self):
+        """Return the rich console, creating it if needed."""
+        if self._console is None:
+            from rich.console import Console
+
+            self._console = Console()
+        return self._console
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+console = LazyConsole()
@@ -0,0 +1,374 @@
+"""Duplicate detection for the Photo Info application.
+
+Every image gets a content hash, which finds byte-identical copies, and a
+perceptual hash, which also finds copies that were re-encoded, resized or
+re-exported under another name. Hashes are kept in a table of the manifest
+database keyed by path, size and mtime, so unchanged images are never decoded
+again. Near-duplicates are found with a BK-tree over the Hamming distance of
+the perceptual hashes instead of comparing every pair of images.
+
+NumPy is used for the pHash transform when it is installed; otherwise an
+equivalent pure-Python transform is used.
+"""
+
+# photo_info/dedupe.py
+
+import math
+import os
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from photo_info.manifest import Manifest, hash_file
+from photo_info.scanner import WorkItem
+
+# Perceptual hashes: "dhash" compares neighbouring pixels, "phash" the low
+# frequencies of a cosine transform and is more robust to re-encoding
+HASH_KINDS = ("phash", "dhash")
+
+# Maximum Hamming distance between the 64-bit hashes of near-duplicates
+DEFAULT_THRESHOLD = 6
+
+PHASH_SIZE = 32
+PHASH_LOW_FREQUENCIES = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS image_hashes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    dhash TEXT NOT NULL,
+    phash TEXT NOT NULL
+)
+"""
+
+# Cosine basis of the low pHash frequencies, one row per frequency
+_DCT_BASIS = [
+    [math.cos(math.pi * (2 * n + 1) * k / (2 * PHASH_SIZE)) for n in range(PHASH_SIZE)]
+    for k in range(PHASH_LOW_FREQUENCIES)
+]
+
+
+class ImageHashes(NamedTuple):
+    """Hashes of an image file at a point in time."""
+
+    size: int
+    mtime_ns: int
+    content: str
+    dhash: int
+    phash: int
+
+
+class Duplicate(NamedTuple):
+    """An image found to duplicate the first image of its group."""
+
+    path: str
+    distance: int
+
+
+def hamming(a: int, b: int) -> int:
+    """Return the number of differing bits of two hashes."""
+    return bin(a ^ b).count("1")
+
+
+@lru_cache(maxsize=None)
+def _numpy():
+    """Return the numpy module, or None if it is not installed."""
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover - depends on the environment
+        return None
+    return numpy
+
+
+def _bits(values: Iterable[bool]) -> int:
+    result = 0
+    for value in values:
+        result = (result << 1) | bool(value)
+    return result
+
+
+def dhash(image) -> int:
+    """Compute the 64-bit difference hash of a greyscale image."""
+    from PIL import Image
+
+    pixels = image.resize((9, 8), Image.BILINEAR).tobytes()
+    return _bits(pixels[row * 9 + x] < pixels[row * 9 + x + 1] for row in range(8) for x in range(8))
+
+
+def phash(image) -> int:
+    """Compute the 64-bit perceptual hash of a greyscale image.
+
+    The image is scaled to 32x32 and only the 8x8 lowest frequencies of its
+    cosine transform are computed; each bit says whether a frequency is above
+    the median.
+    """
+    from PIL import Image
+
+    small = image.resize((PHASH_SIZE, PHASH_SIZE), Image.LANCZOS)
+    numpy = _numpy()
+    if numpy is not None:
+        basis = numpy.array(_DCT_BASIS)
+        pixels = numpy.asarray(small, dtype=float)
+        low = (basis @ pixels @ basis.T).flatten().tolist()
+    else:
+        pixels = small.tobytes()
+        rows = [pixels[y * PHASH_SIZE:(y + 1) * PHASH_SIZE] for y in range(PHASH_SIZE)]
+        # Transform along the rows, then along the columns
+        partial = [[sum(b * p for b, p in zip(basis, row)) for basis in _DCT_BASIS] for row in rows]
+        low = [
+            sum(basis[y] * partial[y][u] for y in range(PHASH_SIZE))
+            for basis in _DCT_BASIS
+            for u in range(PHASH_LOW_FREQUENCIES)
+        ]
+    median = sorted(low)[len(low) // 2]
+    return _bits(value > median for value in low)
+
+
+def compute_hashes(image_file: str) -> ImageHashes:
+    """Hash the contents and the picture of an image file.
+
+    Args:
+        image_file (str): Path to the image file.
+    Returns:
+        (ImageHashes) The hashes along with the file's size and mtime.
+    """
+    from PIL import Image, ImageOps
+
+    st = os.stat(image_file)
+    with Image.open(image_file) as image:
+        # JPEGs are decoded straight at a small scale
+        image.draft("L", (4 * PHASH_SIZE, 4 * PHASH_SIZE))
+        grey = ImageOps.exif_transpose(image).convert("L")
+    return ImageHashes(st.st_size, st.st_mtime_ns, hash_file(image_file), dhash(grey), phash(grey))
+
+
+class HashIndex:
+    """Persistent hashes of images, stored alongside the manifest.
+
+    Args:
+        manifest (Manifest): Manifest whose database holds the index.
+    """
+
+    def __init__(self, manifest: Manifest):
+        self.manifest = manifest
+        with manifest.lock:
+            manifest.conn.execute(SCHEMA)
+
+    def entries(self) -> Dict[str, ImageHashes]:
+        """Load the hashes of every indexed image."""
+        with self.manifest.lock:
+            rows = self.manifest.conn.execute(
+                "SELECT path, size, mtime_ns, content, dhash, phash FROM image_hashes"
+            ).fetchall()
+        return {
+            path: ImageHashes(size, mtime_ns, content, int(d, 16), int(p, 16))
+            for path, size, mtime_ns, content, d, p in rows
+        }
+
+    def update(self, path: str, image_file: str, recorded: Optional[ImageHashes] = None) -> ImageHashes:
+        """Return the hashes of an image, computing them only if it changed.
+
+        Args:
+            path (str): Image path relative to the image directory.
+            image_file (str): Path to the image file.
+            recorded (ImageHashes): Hashes already loaded from the index, if any.
+        Returns:
+            (ImageHashes) The current hashes of the image.
+        """
+        if recorded is None:
+            with self.manifest.lock:
+                row = self.manifest.conn.execute(
+                    "SELECT size, mtime_ns, content, dhash, phash FROM image_hashes WHERE path = ?", (path,)
+                ).fetchone()
+            if row:
+                recorded = ImageHashes(row[0], row[1], row[2], int(row[3], 16), int(row[4], 16))
+
+        st = os.stat(image_file)
+        if recorded is not None and (st.st_size, st.st_mtime_ns) == (recorded.size, recorded.mtime_ns):
+            return recorded
+
+        hashes = compute_hashes(image_file)
+        with self.manifest.lock:
+            self.manifest.conn.execute(
+                "INSERT OR REPLACE INTO image_hashes (path, size, mtime_ns, content, dhash, phash) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, hashes.size, hashes.mtime_ns, hashes.content, f"{hashes.dhash:016x}", f"{hashes.phash:016x}"),
+            )
+        return hashes
+
+    def remove(self, paths: Iterable[str]) -> None:
+        """Forget images that no longer exist."""
+        with self.manifest.lock:
+            self.manifest.conn.executemany(
+                "DELETE FROM image_hashes WHERE path = ?", [(path,) for path in paths]
+            )
+
+
+class BKTree:
+    """Burkhard-Keller tree over the Hamming distance of 64-bit hashes.
+
+    A search only visits subtrees whose distance to the query could fall within
+    the radius, so looking up near-duplicates among n images takes far fewer
+    than n comparisons.
+    """
+
+    def __init__(self):
+        self.root: Optional[list] = None
+
+    def add(self, value: int, key: str) -> None:
+        # Nodes are [value, keys, {distance: child}]
+        if self.root is None:
+            self.root = [value, [key], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(key)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [key], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> Iterator[Tuple[int, str]]:
+        """Yield the keys of values within `radius` of `value`, with their distances."""
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                for key in node[1]:
+                    yield distance, key
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+
+
+class DuplicateFinder:
+    """Look up duplicates of images among the images added so far.
+
+    Args:
+        kind (str): Perceptual hash to compare, see HASH_KINDS.
+        threshold (int): Maximum Hamming distance of near-duplicates.
+    """
+
+    def __init__(self, kind: str = "phash", threshold: int = DEFAULT_THRESHOLD):
+        if kind not in HASH_KINDS:
+            raise ValueError(f"Unknown hash {kind!r}, expected one of {HASH_KINDS}")
+        self.kind = kind
+        self.threshold = threshold
+        self.contents: Dict[str, List[str]] = {}
+        self.tree = BKTree()
+
+    def add(self, path: str, hashes: ImageHashes) -> None:
+        self.contents.setdefault(hashes.content, []).append(path)
+        self.tree.add(getattr(hashes, self.kind), path)
+
+    def matches(self, path: str, hashes: ImageHashes) -> List[Duplicate]:
+        """Return the other images duplicating an image, closest first.
+
+        Byte-identical copies are reported with distance 0.
+        """
+        found = {other: 0 for other in self.contents.get(hashes.content, ()) if other != path}
+        for distance, other in self.tree.search(getattr(hashes, self.kind), self.threshold):
+            if other != path and other not in found:
+                found[other] = distance
+        return sorted((Duplicate(other, distance) for other, distance in found.items()),
+                      key=lambda d: (d.distance, d.path))
+
+
+def find_duplicate_groups(
+    entries: Dict[str, ImageHashes], kind: str = "phash", threshold: int = DEFAULT_THRESHOLD
+) -> List[List[Duplicate]]:
+    """Group images that duplicate each other.
+
+    Images are grouped transitively. The first image of each group, the one
+    kept as the original, is the largest file, and its distance is 0; the
+    others are listed with their distance to it.
+
+    Args:
+        entries (dict): Image paths mapped to their hashes.
+        kind (str): Perceptual hash to compare, see HASH_KINDS.
+        threshold (int): Maximum Hamming distance of near-duplicates.
+    Returns:
+        (list) Groups of at least two images, ordered by their original's path.
+    """
+    finder = DuplicateFinder(kind, threshold)
+    parent = {path: path for path in entries}
+
+    def root(path: str) -> str:
+        while parent[path] != path:
+            parent[path] = parent[parent[path]]
+            path = parent[path]
+        return path
+
+    for path in sorted(entries):
+        for duplicate in finder.matches(path, entries[path]):
+            parent[root(duplicate.path)] = root(path)
+        finder.add(path, entries[path])
+
+    members: Dict[str, List[str]] = {}
+    for path in entries:
+        members.setdefault(root(path), []).append(path)
+
+    groups = []
+    for paths in members.values():
+        if len(paths) < 2:
+            continue
+        paths.sort(key=lambda p: (-entries[p].size, p))
+        original = entries[paths[0]]
+        groups.append([
+            Duplicate(p, 0 if entries[p].content == original.content
+                      else hamming(getattr(entries[p], kind), getattr(original, kind)))
+            for p in paths
+        ])
+    groups.sort(key=lambda group: group[0].path)
+    return groups
+
+
+def skip_duplicates(
+    items: Iterable[WorkItem],
+    image_dir: str,
+    index: HashIndex,
+    kind: str = "phash",
+    threshold: int = DEFAULT_THRESHOLD,
+    on_skip: Optional[Callable[[WorkItem, Duplicate], None]] = None,
+) -> Iterator[WorkItem]:
+    """Drop work items that duplicate an image processed or passed on before them.
+
+    Only indexed images recorded in the manifest count as originals, so images
+    that `photo-info dedupe` indexed but were never processed, e.g. both
+    copies of a pair, are not all skipped.
+
+    Args:
+        items (Iterable[WorkItem]): Images to process.
+        image_dir (str): Path to the directory containing images.
+        index (HashIndex): Index of image hashes, updated with every item.
+        kind (str): Perceptual hash to compare, see HASH_KINDS.
+        threshold (int): Maximum Hamming distance of near-duplicates.
+        on_skip (Callable): Called with each dropped item and what it duplicates.
+    Returns:
+        (Iterator[WorkItem]) The items that are not duplicates.
+    """
+    finder = DuplicateFinder(kind, threshold)
+    processed = index.manifest.entries()
+    for path, hashes in index.entries().items():
+        if path in processed:
+            finder.add(path, hashes)
+
+    for item in items:
+        hashes = index.update(item.rel_path, item.image_file)
+        # The index may still list images deleted since it was last pruned
+        original = next(
+            (d for d in finder.matches(item.rel_path, hashes) if os.path.exists(os.path.join(image_dir, d.path))),
+            None,
+        )
+        if original is not None:
+            if on_skip is not None:
+                on_skip(item, original)
+            continue
+        finder.add(item.rel_path, hashes)
+        yield item
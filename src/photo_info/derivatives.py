@@ -0,0 +1,206 @@
+"""Resized image derivatives for the Photo Info application.
+
+Writes each image at a set of widths, in WebP and/or JPEG, plus a tiny blurred
+placeholder that is embedded in the front-matter. Every image is decoded once,
+and JPEGs are decoded straight at the smallest scale that still covers the
+largest width using Pillow's draft mode. Derivatives newer than their source
+image are not written again.
+"""
+
+# photo_info/derivatives.py
+
+import base64
+import math
+import os
+import threading
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from photo_info.scanner import site_path
+
+FORMATS = {
+    "webp": ("WEBP", ".webp"),
+    "jpeg": ("JPEG", ".jpg"),
+}
+
+PLACEHOLDER_SUFFIX = "-placeholder.jpg"
+PLACEHOLDER_QUALITY = 50
+
+# EXIF orientations that rotate the image by 90 degrees
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+ORIENTATION_TAG = 0x0112
+
+
+class DerivativeSettings(NamedTuple):
+    """What derivatives to write and where.
+
+    Args:
+        directory (str): Directory derivatives are written to, mirroring the
+            layout of the image directory.
+        widths (Sequence[int]): Widths to write. Widths above the width of the
+            image are written at the image's own width instead.
+        formats (Sequence[str]): Formats to write each width in, see FORMATS.
+        quality (int): Encoder quality, 1-100.
+        placeholder_width (int): Width of the blurred placeholder; 0 disables it.
+    """
+
+    directory: str
+    widths: Sequence[int] = (480, 960, 1920)
+    formats: Sequence[str] = ("webp", "jpeg")
+    quality: int = 80
+    placeholder_width: int = 16
+
+
+class Variant(NamedTuple):
+    """A derivative written for an image."""
+
+    path: str
+    rel_path: str
+    width: int
+    height: int
+    format: str
+
+
+class Derivatives(NamedTuple):
+    """Dimensions, variants and placeholder of an image, for the front-matter."""
+
+    width: int
+    height: int
+    variants: List[Variant]
+    placeholder: Optional[str] = None
+
+    def front_matter(self) -> List[str]:
+        """Render the front-matter lines describing the derivatives.
+
+        Variant paths follow the same rule as `src`: the part after `public`
+        when the derivatives directory is under one, otherwise the path
+        within the derivatives directory.
+
+        Returns:
+            (list) YAML lines.
+        """
+        lines = [f"width: {self.width}", f"height: {self.height}"]
+        if self.placeholder:
+            lines.append(f"placeholder: {self.placeholder}")
+        if self.variants:
+            lines.append("variants:")
+            for variant in self.variants:
+                lines.extend([
+                    f"  - src: {site_path(variant.path, variant.rel_path)}",
+                    f"    width: {variant.width}",
+                    f"    height: {variant.height}",
+                    f"    format: {variant.format}",
+                ])
+        return lines
+
+
+def display_size(image) -> Tuple[int, int]:
+    """Return the size of an image once its EXIF orientation is applied."""
+    width, height = image.size
+    if image.getexif().get(ORIENTATION_TAG) in TRANSPOSED_ORIENTATIONS:
+        return height, width
+    return width, height
+
+
+def plan_variants(
+    rel_path: str, size: Tuple[int, int], settings: DerivativeSettings
+) -> List[Variant]:
+    """Work out the derivatives of an image without decoding it.
+
+    Args:
+        rel_path (str): Image path relative to the image directory.
+        size (tuple): Width and height of the image, after orientation.
+        settings (DerivativeSettings): Derivatives to write.
+    Returns:
+        (list) The variants, largest first.
+    """
+    width, height = size
+    stem = os.path.splitext(rel_path)[0]
+    variants = []
+    for target in sorted({min(w, width) for w in settings.widths}, reverse=True):
+        target_height = max(1, round(height * target / width))
+        for name in settings.formats:
+            variant_path = f"{stem}-{target}{FORMATS[name][1]}"
+            variants.append(Variant(
+                os.path.join(settings.directory, variant_path), variant_path, target, target_height, name
+            ))
+    return variants
+
+
+def _up_to_date(paths: Sequence[str], source_mtime_ns: int) -> bool:
+    for path in paths:
+        try:
+            if os.stat(path).st_mtime_ns < source_mtime_ns:
+                return False
+        except FileNotFoundError:
+            return False
+    return True
+
+
+def _save(image, path: str, fmt: str, **params) -> None:
+    """Save an image atomically through a temporary file in the same directory."""
+    directory, name = os.path.split(path)
+    os.makedirs(directory, exist_ok=True)
+    temp_file = os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        image.save(temp_file, fmt, **params)
+        os.replace(temp_file, path)
+    except BaseException:
+        try:
+            os.unlink(temp_file)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def _placeholder_uri(path: str) -> str:
+    with open(path, "rb") as f:
+        return "data:image/jpeg;base64," + base64.b64encode(f.read()).decode("ascii")
+
+
+def make_derivatives(image_file: str, rel_path: str, settings: DerivativeSettings) -> Derivatives:
+    """Write the derivatives of an image that are missing or out of date.
+
+    Args:
+        image_file (str): Path to the image file.
+        rel_path (str): Image path relative to the image directory.
+        settings (DerivativeSettings): Derivatives to write.
+    Returns:
+        (Derivatives) The image's dimensions, variants and placeholder.
+    """
+    from PIL import Image, ImageFilter, ImageOps
+
+    source_mtime_ns = os.stat(image_file).st_mtime_ns
+    with Image.open(image_file) as image:
+        # Only the header has been read so far
+        size = display_size(image)
+        variants = plan_variants(rel_path, size, settings)
+        placeholder = None
+        outputs = [variant.path for variant in variants]
+        if settings.placeholder_width:
+            placeholder = os.path.join(settings.directory, os.path.splitext(rel_path)[0] + PLACEHOLDER_SUFFIX)
+            outputs.append(placeholder)
+
+        if not _up_to_date(outputs, source_mtime_ns):
+            largest = max([variant.width for variant in variants] + [settings.placeholder_width])
+            scale = min(1.0, largest / size[0])
+            image.draft(image.mode, (math.ceil(image.size[0] * scale), math.ceil(image.size[1] * scale)))
+            decoded = ImageOps.exif_transpose(image)
+            if decoded.mode not in ("RGB", "RGBA"):
+                decoded = decoded.convert("RGBA" if "A" in decoded.getbands() else "RGB")
+
+            # Resize from the largest variant down, each step from the previous one
+            current = decoded
+            for variant in variants:
+                if current.size != (variant.width, variant.height):
+                    current = current.resize((variant.width, variant.height), Image.LANCZOS)
+                fmt = FORMATS[variant.format][0]
+                frame = current.convert("RGB") if fmt == "JPEG" and current.mode != "RGB" else current
+                _save(frame, variant.path, fmt, quality=settings.quality)
+
+            if placeholder:
+                tiny_height = max(1, round(size[1] * settings.placeholder_width / size[0]))
+                tiny = current.convert("RGB").resize((settings.placeholder_width, tiny_height), Image.BILINEAR)
+                tiny = tiny.filter(ImageFilter.GaussianBlur(1))
+                _save(tiny, placeholder, "JPEG", quality=PLACEHOLDER_QUALITY)
+
+    return Derivatives(size[0], size[1], variants, _placeholder_uri(placeholder) if placeholder else None)
@@ -0,0 +1,324 @@
+"""Header-only EXIF extraction for the Photo Info application.
+
+Reads just the leading JPEG markers up to the APP1/Exif segment and walks the
+TIFF IFDs inside it, decoding only the entries that were asked for. TIFF-based
+RAW files (NEF, CR2, ARW, DNG) are read the same way by seeking straight to
+their IFDs. Pixel and sensor data is never touched, so this is much cheaper
+than a full Pillow open/verify.
+"""
+
+# photo_info/exif_reader.py
+
+import io
+import math
+import struct
+from typing import BinaryIO, Collection, Dict, Optional
+
+# TIFF tags that point at sub-IFDs rather than holding values themselves
+EXIF_IFD_POINTER = 34665
+GPS_IFD_POINTER = 34853
+
+# TIFF-based RAW formats readable by seeking to their IFDs
+RAW_EXTENSIONS = (".nef", ".cr2", ".arw", ".dng")
+
+# JPEG markers
+SOI = b"\xff\xd8"
+SOS = 0xDA
+EOI = 0xD9
+APP1 = 0xE1
+EXIF_HEADER = b"Exif\x00\x00"
+
+# Bytes read from the start of each file when headers are read ahead; enough
+# for the Exif segment of almost every JPEG. Files whose metadata lies further
+# in are re-read.
+HEADER_BYTES = 128 * 1024
+
+# Stop looking for the Exif segment after this many bytes of headers
+MAX_HEADER_SCAN = 256 * 1024
+# Guard against corrupt files declaring absurd IFD sizes
+MAX_IFD_ENTRIES = 1024
+
+# TIFF field type -> (struct code, size in bytes)
+FIELD_TYPES = {
+    1: ("B", 1),   # BYTE
+    2: ("s", 1),   # ASCII
+    3: ("H", 2),   # SHORT
+    4: ("L", 4),   # LONG
+    5: ("LL", 8),  # RATIONAL
+    6: ("b", 1),   # SBYTE
+    7: ("s", 1),   # UNDEFINED
+    8: ("h", 2),   # SSHORT
+    9: ("l", 4),   # SLONG
+    10: ("ll", 8), # SRATIONAL
+    11: ("f", 4),  # FLOAT
+    12: ("d", 8),  # DOUBLE
+}
+
+
+class Rational:
+    """A TIFF rational value.
+
+    Formats the same way as Pillow's `IFDRational`, so markdown written from
+    either engine is identical.
+    """
+
+    __slots__ = ("numerator", "denominator")
+
+    def __init__(self, numerator: int, denominator: int = 1):
+        self.numerator = numerator
+        self.denominator = denominator
+
+    def __float__(self) -> float:
+        if self.denominator == 0:
+            return math.nan
+        return self.numerator / self.denominator
+
+    def __eq__(self, other) -> bool:
+        try:
+            return float(self) == float(other)
+        except (TypeError, ValueError):
+            return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(float(self))
+
+    def __str__(self) -> str:
+        return str(float(self))
+
+    __repr__ = __str__
+
+
+class TruncatedHeader(ValueError):
+    """Raised when parsing needs bytes beyond the header prefix that was read."""
+
+
+class HeaderBuffer(io.BytesIO):
+    """In-memory prefix of an image file.
+
+    Args:
+        data (bytes): Leading bytes of the file.
+        complete (bool): Whether `data` is the whole file. If not, reads past
+            its end raise TruncatedHeader rather than returning short data.
+    """
+
+    def __init__(self, data: bytes, complete: bool):
+        super().__init__(data)
+        self.complete = complete
+
+    def read(self, size: int = -1) -> bytes:
+        if not self.complete and (size < 0 or self.tell() + size > len(self.getbuffer())):
+            raise TruncatedHeader("Metadata extends past the header prefix")
+        return super().read(size)
+
+
+class TiffReader:
+    """Decode selected entries from a TIFF structure inside a file.
+
+    Args:
+        fp (BinaryIO): Seekable binary file positioned anywhere.
+        base (int): Offset of the TIFF header within `fp`. IFD offsets are
+            relative to it.
+    """
+
+    def __init__(self, fp: BinaryIO, base: int = 0):
+        self.fp = fp
+        self.base = base
+        header = self.read_at(0, 8)
+        if len(header) < 8 or header[:2] not in (b"II", b"MM"):
+            raise ValueError("Not a TIFF header")
+        self.endian = "<" if header[:2] == b"II" else ">"
+        self.first_ifd = struct.unpack(self.endian + "L", header[4:8])[0]
+
+    def read_at(self, offset: int, size: int) -> bytes:
+        """Read `size` bytes at `offset` relative to the TIFF header."""
+        self.fp.seek(self.base + offset)
+        return self.fp.read(size)
+
+    def read_ifd(self, offset: int, tags: Optional[Collection[int]] = None) -> Dict[int, object]:
+        """Decode the entries of the IFD at `offset`.
+
+        Args:
+            offset (int): Offset of the IFD relative to the TIFF header.
+            tags (Collection[int]): Tag IDs to decode. Sub-IFD pointers are
+                always returned as plain offsets. None decodes everything.
+        Returns:
+            (dict) Tag IDs mapped to their decoded values.
+        """
+        raw_count = self.read_at(offset, 2)
+        if len(raw_count) < 2:
+            return {}
+        count = struct.unpack(self.endian + "H", raw_count)[0]
+        if count > MAX_IFD_ENTRIES:
+            raise ValueError(f"IFD at {offset} declares {count} entries")
+
+        entries = self.read_at(offset + 2, count * 12)
+        values = {}
+        for i in range(len(entries) // 12):
+            entry = entries[i * 12:(i + 1) * 12]
+            tag, field_type, n = struct.unpack(self.endian + "HHL", entry[:8])
+            pointer = tag in (EXIF_IFD_POINTER, GPS_IFD_POINTER)
+            if not pointer and tags is not None and tag not in tags:
+                continue
+            if field_type not in FIELD_TYPES:
+                continue
+            value = self._decode(field_type, n, entry[8:12])
+            if value is not None:
+                values[tag] = value
+        return values
+
+    def _decode(self, field_type: int, n: int, inline: bytes):
+        """Decode a single IFD entry value, reading out-of-line data if needed."""
+        code, size = FIELD_TYPES[field_type]
+        total = size * n
+        if total <= 4:
+            data = inline[:total]
+        else:
+            value_offset = struct.unpack(self.endian + "L", inline)[0]
+            data = self.read_at(value_offset, total)
+            if len(data) < total:
+                return None
+
+        if field_type == 2:
+            if data.endswith(b"\x00"):
+                data = data[:-1]
+            return data.decode("latin-1", "replace")
+        if field_type in (1, 7):
+            return data
+
+        values = struct.unpack(self.endian + code * n, data)
+        if field_type in (5, 10):
+            values = tuple(
+                Rational(values[i], values[i + 1]) for i in range(0, len(values), 2)
+            )
+        return values[0] if len(values) == 1 else values
+
+
+def find_exif_segment(fp: BinaryIO) -> Optional[int]:
+    """Locate the TIFF header of the APP1/Exif segment of a JPEG file.
+
+    Only the marker headers are read; other segments are skipped with seeks.
+
+    Args:
+        fp (BinaryIO): Binary file positioned at the start of the JPEG.
+    Returns:
+        (int) Offset of the TIFF header within the file, or None if the file is
+        not a JPEG or has no Exif segment before the image data.
+    """
+    start = fp.tell()
+    if fp.read(2) != SOI:
+        return None
+
+    while fp.tell() - start < MAX_HEADER_SCAN:
+        marker = fp.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        # Markers may be preceded by any number of 0xFF fill bytes
+        while marker[1] == 0xFF:
+            marker = marker[1:] + fp.read(1)
+            if len(marker) < 2:
+                return None
+        if marker[1] in (SOS, EOI):
+            return None
+        raw_length = fp.read(2)
+        if len(raw_length) < 2:
+            return None
+        length = struct.unpack(">H", raw_length)[0]
+        if marker[1] == APP1 and length >= 8 + len(EXIF_HEADER):
+            if fp.read(len(EXIF_HEADER)) == EXIF_HEADER:
+                return fp.tell()
+            fp.seek(length - 2 - len(EXIF_HEADER), io.SEEK_CUR)
+        else:
+            fp.seek(length - 2, io.SEEK_CUR)
+    return None
+
+
+def read_tiff_exif(reader: TiffReader, tags: Optional[Collection[int]] = None) -> Dict[int, object]:
+    """Collect the requested tags from IFD0 and its Exif and GPS sub-IFDs.
+
+    The result is shaped like Pillow's `_getexif()`: IFD0 and Exif IFD entries
+    are merged into one dict and the GPS IFD, if requested, is nested under
+    the GPSInfo tag.
+
+    Args:
+        reader (TiffReader): Reader over the TIFF structure.
+        tags (Collection[int]): Tag IDs to extract. None extracts everything.
+    Returns:
+        (dict) Tag IDs mapped to decoded values.
+    """
+    exif = reader.read_ifd(reader.first_ifd, tags)
+    exif_offset = exif.pop(EXIF_IFD_POINTER, None)
+    gps_offset = exif.pop(GPS_IFD_POINTER, None)
+
+    if isinstance(exif_offset, int) and (tags is None or not set(tags) <= exif.keys()):
+        exif_ifd = reader.read_ifd(exif_offset, tags)
+        exif_ifd.pop(EXIF_IFD_POINTER, None)
+        exif_ifd.pop(GPS_IFD_POINTER, None)
+        exif.update(exif_ifd)
+
+    if isinstance(gps_offset, int) and (tags is None or GPS_IFD_POINTER in tags):
+        exif[GPS_IFD_POINTER] = reader.read_ifd(gps_offset)
+
+    return exif
+
+
+def read_exif(fp: BinaryIO, tags: Optional[Collection[int]] = None) -> Optional[Dict[int, object]]:
+    """Read EXIF data from the header of a JPEG or TIFF-based file object.
+
+    The container is detected from the leading bytes: JPEGs are scanned for
+    their Exif segment, while TIFF and TIFF-based RAW files start with the
+    TIFF header itself.
+
+    Args:
+        fp (BinaryIO): Seekable binary file positioned at the start of the image.
+        tags (Collection[int]): Tag IDs to extract. None extracts everything.
+    Returns:
+        (dict) Tag IDs mapped to decoded values, or None if the format is not
+        recognised or no Exif segment was found.
+    """
+    start = fp.tell()
+    magic = fp.read(2)
+    fp.seek(start)
+
+    if magic == SOI:
+        tiff_offset = find_exif_segment(fp)
+    elif magic in (b"II", b"MM"):
+        tiff_offset = start
+    else:
+        return None
+
+    if tiff_offset is None:
+        return None
+    return read_tiff_exif(TiffReader(fp, tiff_offset), tags)
+
+
+def read_exif_bytes(
+    data: bytes, tags: Optional[Collection[int]] = None, complete: bool = True
+) -> Optional[Dict[int, object]]:
+    """Read EXIF data from the leading bytes of an image file.
+
+    Args:
+        data (bytes): Leading bytes of the image file.
+        tags (Collection[int]): Tag IDs to extract. None extracts everything.
+        complete (bool): Whether `data` is the whole file.
+    Returns:
+        (dict) Tag IDs mapped to decoded values, or None if the format is not
+        recognised or no Exif segment was found.
+    Raises:
+        TruncatedHeader: If the metadata extends past the end of an
+            incomplete prefix.
+    """
+    return read_exif(HeaderBuffer(data, complete), tags)
+
+
+def read_exif_file(image_file: str, tags: Optional[Collection[int]] = None) -> Optional[Dict[int, object]]:
+    """Read EXIF data from the header of a JPEG, TIFF or RAW file on disk.
+
+    Args:
+        image_file (str): Path to the image file.
+        tags (Collection[int]): Tag IDs to extract. None extracts everything.
+    Returns:
+        (dict) Tag IDs mapped to decoded values, or None if no Exif segment
+        was found.
+    """
+    with open(image_file, "rb") as fp:
+        return read_exif(fp, tags)
@@ -0,0 +1,74 @@
+"""Typed EXIF fields for the Photo Info application.
+
+The default tags (see `tags.DEFAULT_TAGS`) as plain Python values: rationals
+become floats, dates are parsed and padded strings are stripped. Records of
+`extract_many` hold these fields, and the manifest keeps them in indexed
+columns for `photo-info query`.
+"""
+
+# photo_info/fields.py
+
+import datetime
+import math
+from typing import Optional, Tuple
+
+# Attribute, EXIF tag and kind of value of each field
+FIELDS: Tuple[Tuple[str, str, str], ...] = (
+    ("make", "Make", "str"),
+    ("model", "Model", "str"),
+    ("datetime_original", "DateTimeOriginal", "datetime"),
+    ("focal_length", "FocalLength", "float"),
+    ("f_number", "FNumber", "float"),
+    ("exposure_time", "ExposureTime", "float"),
+    ("iso", "ISOSpeedRatings", "int"),
+    ("exposure_bias", "ExposureBiasValue", "float"),
+    ("lens_make", "LensMake", "str"),
+    ("lens_model", "LensModel", "str"),
+)
+
+
+def _first(value):
+    # Multi-valued tags, e.g. ISOSpeedRatings of some cameras, keep their first
+    # value, also once written out as text, e.g. "(200, 0)"
+    if isinstance(value, (tuple, list)):
+        return value[0] if value else None
+    if isinstance(value, str) and value.startswith("("):
+        return value.strip("()").split(",")[0]
+    return value
+
+
+def _to_str(value) -> Optional[str]:
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", "replace")
+    value = str(value).strip("\x00 \t\r\n")
+    return value or None
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        number = float(_first(value))
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _to_int(value) -> Optional[int]:
+    number = _to_float(value)
+    return int(number) if number is not None else None
+
+
+def _to_datetime(value) -> Optional[datetime.datetime]:
+    text = _to_str(value)
+    if text is None or len(text) < 19:
+        return None
+    # "YYYY:MM:DD HH:MM:SS"; cameras without a clock write zeros or blanks
+    try:
+        return datetime.datetime(
+            int(text[0:4]), int(text[5:7]), int(text[8:10]),
+            int(text[11:13]), int(text[14:16]), int(text[17:19]),
+        )
+    except ValueError:
+        return None
+
+
+NORMALIZERS = {"str": _to_str, "float": _to_float, "int": _to_int, "datetime": _to_datetime}
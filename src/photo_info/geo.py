@@ -0,0 +1,250 @@
+"""GPS coordinates and location queries for the Photo Info application.
+
+When `GPSInfo` is among the configured tags, the GPS IFD of an image is
+normalized into decimal degrees and labeled `GPSLatitude` and `GPSLongitude`,
+plus `GPSAltitude` in metres when recorded, so the coordinates are written to
+the front-matter with the other tags.
+
+The manifest keeps the coordinates of every image along with their geohash,
+which is indexed. Geohashes sharing a prefix lie in the same grid cell, so the
+images in any area are found by reading the few index ranges of the cells
+covering it rather than every image: `near` and `within` take milliseconds
+even over millions of images, without reading any of them again.
+"""
+
+# photo_info/geo.py
+
+import math
+from typing import TYPE_CHECKING, Dict, List, Mapping, NamedTuple, Optional, Tuple
+
+if TYPE_CHECKING:
+    from photo_info.manifest import Manifest
+
+# GPS IFD tags
+GPS_LATITUDE_REF = 1
+GPS_LATITUDE = 2
+GPS_LONGITUDE_REF = 3
+GPS_LONGITUDE = 4
+GPS_ALTITUDE_REF = 5
+GPS_ALTITUDE = 6
+
+# Six decimals of a degree are about 0.1 m
+COORDINATE_DECIMALS = 6
+
+# Geohashes of 12 characters locate a point to a few centimetres
+GEOHASH_PRECISION = 12
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Index ranges read per query at most; areas spanning more cells are read at a
+# coarser precision
+MAX_QUERY_CELLS = 32
+
+# Mean radius of the Earth
+EARTH_RADIUS_KM = 6371.0088
+
+
+def _degrees(value, ref) -> Optional[float]:
+    """Convert degrees, minutes and seconds to signed decimal degrees."""
+    try:
+        parts = [float(part) for part in value] if isinstance(value, (tuple, list)) else [float(value)]
+    except (TypeError, ValueError, ZeroDivisionError):
+        return None
+    degrees = sum(part / 60 ** i for i, part in enumerate(parts[:3]))
+    if not math.isfinite(degrees):
+        return None
+    if isinstance(ref, bytes):
+        ref = ref.decode("latin-1")
+    if str(ref).strip("\x00 ").upper() in ("S", "W"):
+        degrees = -degrees
+    return degrees
+
+
+def gps_labels(gps_info) -> Dict[str, float]:
+    """Normalize a GPS IFD into labeled decimal coordinates.
+
+    Args:
+        gps_info (dict): GPS IFD tag IDs mapped to their values.
+    Returns:
+        (dict) GPSLatitude and GPSLongitude in decimal degrees, and
+        GPSAltitude in metres if recorded; empty if the image has no valid
+        position.
+    """
+    if not isinstance(gps_info, Mapping):
+        return {}
+    latitude = _degrees(gps_info.get(GPS_LATITUDE), gps_info.get(GPS_LATITUDE_REF, "N"))
+    longitude = _degrees(gps_info.get(GPS_LONGITUDE), gps_info.get(GPS_LONGITUDE_REF, "E"))
+    if latitude is None or longitude is None or abs(latitude) > 90 or abs(longitude) > 180:
+        return {}
+
+    labels = {
+        "GPSLatitude": round(latitude, COORDINATE_DECIMALS),
+        "GPSLongitude": round(longitude, COORDINATE_DECIMALS),
+    }
+    if GPS_ALTITUDE in gps_info:
+        altitude = _degrees(gps_info[GPS_ALTITUDE], "")
+        if altitude is not None:
+            # A reference of 1 means below sea level
+            ref = gps_info.get(GPS_ALTITUDE_REF, 0)
+            below = ref in (1, b"\x01") or (isinstance(ref, (tuple, list)) and ref[:1] == (1,))
+            labels["GPSAltitude"] = round(-altitude if below else altitude, 1)
+    return labels
+
+
+def location(labeled_exif: Mapping[str, object]) -> Optional[Tuple[float, float]]:
+    """Return the latitude and longitude of labeled EXIF data, if it has them."""
+    try:
+        return float(labeled_exif["GPSLatitude"]), float(labeled_exif["GPSLongitude"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def geohash(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Encode a position as a geohash of `precision` characters."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def _cell_size(precision: int) -> Tuple[float, float]:
+    """Return the height and width in degrees of the geohash cells of a precision."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def covering_prefixes(south: float, west: float, north: float, east: float) -> List[str]:
+    """Return geohash prefixes whose cells together cover a bounding box.
+
+    The finest precision covering the box with at most MAX_QUERY_CELLS cells
+    is used. A box whose west edge is east of its east edge crosses the
+    antimeridian.
+
+    Args:
+        south, west, north, east (float): Edges of the box in decimal degrees.
+    Returns:
+        (List[str]) Distinct prefixes; [""] when the box is the whole world.
+    """
+    if west > east:
+        return sorted(set(covering_prefixes(south, west, north, 180.0) + covering_prefixes(south, -180.0, north, east)))
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = _cell_size(precision)
+        rows = range(
+            int((south + 90) // height), min(int((north + 90) // height), 2 ** (5 * precision // 2) - 1) + 1
+        )
+        columns = range(
+            int((west + 180) // width), min(int((east + 180) // width), 2 ** ((5 * precision + 1) // 2) - 1) + 1
+        )
+        if len(rows) * len(columns) <= MAX_QUERY_CELLS:
+            return sorted({
+                geohash(-90 + (row + 0.5) * height, -180 + (column + 0.5) * width, precision)
+                for row in rows
+                for column in columns
+            })
+    return [""]
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Return the great-circle distance between two positions, in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """Return the south, west, north and east edges of a box around a circle.
+
+    Args:
+        latitude, longitude (float): Center of the circle in decimal degrees.
+        radius_km (float): Radius of the circle.
+    Returns:
+        (tuple) Edges in decimal degrees. West is east of east when the box
+        crosses the antimeridian.
+    """
+    d_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(-90.0, latitude - d_lat), min(90.0, latitude + d_lat)
+    if south == -90.0 or north == 90.0:
+        # The circle covers a pole, and with it every longitude
+        return south, -180.0, north, 180.0
+    d_lon = math.degrees(math.asin(min(1.0, math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(latitude)))))
+    if d_lon >= 180:
+        return south, -180.0, north, 180.0
+    west = (longitude - d_lon + 540) % 360 - 180
+    east = (longitude + d_lon + 540) % 360 - 180
+    return south, west, north, east
+
+
+class Match(NamedTuple):
+    """An image found by a location query."""
+
+    path: str
+    latitude: float
+    longitude: float
+    # Distance from the center of a `near` query, in kilometres
+    distance: Optional[float] = None
+
+
+def within(manifest: "Manifest", south: float, west: float, north: float, east: float) -> List[Match]:
+    """Find the images taken inside a bounding box.
+
+    Args:
+        manifest (Manifest): Manifest of processed images.
+        south, west, north, east (float): Edges of the box in decimal degrees.
+            A box whose west edge is east of its east edge crosses the
+            antimeridian.
+    Returns:
+        (List[Match]) The images, ordered by path.
+    """
+    if west > east:
+        matches = within(manifest, south, west, north, 180.0) + within(manifest, south, -180.0, north, east)
+        return sorted(set(matches))
+
+    query = (
+        "SELECT path, latitude, longitude FROM images "
+        "WHERE geohash >= ? AND geohash < ? "
+        "AND latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?"
+    )
+    matches = []
+    with manifest.lock:
+        for prefix in covering_prefixes(south, west, north, east):
+            # "{" sorts right after "z", the last geohash character
+            rows = manifest.conn.execute(query, (prefix, prefix + "{", south, north, west, east))
+            matches.extend(Match(*row) for row in rows)
+    return sorted(matches)
+
+
+def near(manifest: "Manifest", latitude: float, longitude: float, radius_km: float) -> List[Match]:
+    """Find the images taken within a distance of a position.
+
+    Args:
+        manifest (Manifest): Manifest of processed images.
+        latitude, longitude (float): The position in decimal degrees.
+        radius_km (float): Maximum distance in kilometres.
+    Returns:
+        (List[Match]) The images with their distance, nearest first.
+    """
+    matches = []
+    for match in within(manifest, *bounding_box(latitude, longitude, radius_km)):
+        distance = distance_km(latitude, longitude, match.latitude, match.longitude)
+        if distance <= radius_km:
+            matches.append(match._replace(distance=distance))
+    return sorted(matches, key=lambda match: (match.distance, match.path))
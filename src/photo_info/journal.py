@@ -0,0 +1,122 @@
+"""Append-only journal of processed images for the Photo Info application.
+
+The manifest is committed in batches, so a run that is killed between two
+commits would lose the record of up to a batch of finished images and process
+them again on the next run. The journal closes that gap: every image that
+finished or was quarantined is appended to it as one JSON line, flushed right
+away, and the journal is emptied whenever the manifest is committed. When a
+run starts with a non-empty journal, the previous run was interrupted, and its
+entries are replayed into the manifest before scanning, so the run resumes
+exactly where the previous one stopped.
+
+Lines look like:
+
+    {"path":"2024/DSC_0001.jpg","done":[size,mtime_ns,hash],"exif":{...}}
+    {"path":"2024/DSC_0002.jpg","failed":[size,mtime_ns,attempts,error]}
+"""
+
+# photo_info/journal.py
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, IO, Optional
+
+from photo_info.manifest import Failure, Fingerprint, Manifest
+
+JOURNAL_SUFFIX = ".journal"
+
+
+def journal_path(manifest_path: Path) -> Path:
+    """Return the journal kept next to a manifest, e.g. that of a shard."""
+    return Path(manifest_path).with_suffix(JOURNAL_SUFFIX)
+
+
+class Journal:
+    """Journal of the images finished since the manifest was last committed.
+
+    The journal file is only created once something is written to it.
+
+    Args:
+        path (Path): Path of the journal file, see `journal_path`.
+        manifest (Manifest): Manifest the journal's entries belong to.
+        fsync (bool): Whether to flush each entry to disk, not just to the OS.
+    """
+
+    def __init__(self, path: Path, manifest: Manifest, fsync: bool = False):
+        self.path = Path(path)
+        self.manifest = manifest
+        self.fsync = fsync
+        self.file: Optional[IO[str]] = None
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def replay(self) -> Dict[str, dict]:
+        """Apply the entries left by an interrupted run to the manifest.
+
+        A last line cut short by the interruption is ignored. The manifest is
+        committed and the journal emptied afterwards.
+
+        Returns:
+            (dict) Paths of the images that were recorded as processed, mapped
+            to their labeled EXIF data.
+        """
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                lines = f.read().split("\n")[:-1]
+        except FileNotFoundError:
+            return {}
+
+        done = {}
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            path = entry["path"]
+            if "done" in entry:
+                self.manifest.record(path, Fingerprint(*entry["done"]), entry["exif"])
+                done[path] = entry["exif"]
+            elif "failed" in entry:
+                self.manifest.record_failure(path, Failure(*entry["failed"]))
+                done.pop(path, None)
+        self.manifest.commit()
+        self.checkpoint()
+        return done
+
+    def done(self, path: str, image_fingerprint: Fingerprint, labeled_exif: dict) -> None:
+        """Journal an image whose markdown file was written."""
+        exif = {label: str(value).rstrip("\x00") for label, value in labeled_exif.items()}
+        self._append({"path": path, "done": list(image_fingerprint), "exif": exif})
+
+    def failed(self, path: str, failure: Failure) -> None:
+        """Journal an image that was quarantined."""
+        self._append({"path": path, "failed": list(failure)})
+
+    def _append(self, entry: dict) -> None:
+        if self.file is None:
+            self.file = open(self.path, "a", encoding="utf-8")
+        self.file.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+
+    def checkpoint(self) -> None:
+        """Empty the journal once the manifest holds everything in it."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def close(self) -> None:
+        """Close the journal, keeping anything the manifest may not hold yet."""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
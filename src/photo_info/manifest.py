@@ -0,0 +1,365 @@
+"""Persistent manifest of processed images for the Photo Info application.
+
+The manifest lives next to the markdown files it describes and records, for
+every processed image, the size, mtime and content hash of the file along with
+the EXIF data written for it. Reruns compare the current state of each image
+against it so that only new or modified images are processed again. Images
+with GPS coordinates are also indexed by location, see geo.py, and the default
+tags are kept in typed, indexed columns for `photo-info query`, see query.py.
+"""
+
+# photo_info/manifest.py
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from photo_info.fields import FIELDS, NORMALIZERS
+from photo_info.geo import geohash, location
+
+MANIFEST_NAME = ".photo_info.db"
+
+# Read size used when hashing image contents
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# "full" hashes every byte; "sampled" hashes the size plus the start, middle and
+# end of large files, which avoids reading whole multi-megabyte RAW files
+HASH_MODES = ("full", "sampled")
+HASH_SAMPLE_SIZE = 256 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash TEXT NOT NULL,
+    exif TEXT NOT NULL,
+    latitude REAL,
+    longitude REAL,
+    geohash TEXT,
+    make TEXT,
+    model TEXT,
+    datetime_original TEXT,
+    focal_length REAL,
+    f_number REAL,
+    exposure_time REAL,
+    iso INTEGER,
+    exposure_bias REAL,
+    lens_make TEXT,
+    lens_model TEXT
+)
+"""
+
+# SQLite type of each kind of field; dates are stored as "YYYY-MM-DD HH:MM:SS",
+# which sorts chronologically
+FIELD_TYPES = {"str": "TEXT", "float": "REAL", "int": "INTEGER", "datetime": "TEXT"}
+
+# Columns added to the images table since it was first released, for manifests
+# created before them
+MIGRATIONS = (("latitude", "REAL"), ("longitude", "REAL"), ("geohash", "TEXT")) + tuple(
+    (name, FIELD_TYPES[kind]) for name, _, kind in FIELDS
+)
+
+# Location queries read the geohash ranges of the area asked about, see geo.py
+LOCATION_INDEX = "CREATE INDEX IF NOT EXISTS images_geohash ON images (geohash)"
+
+# Every field is indexed, so queries filter and sort without scanning the table
+FIELD_INDEXES = tuple(f"CREATE INDEX IF NOT EXISTS images_{name} ON images ({name})" for name, _, _ in FIELDS)
+
+# Columns written for each processed image
+RECORD_COLUMNS = ("path", "size", "mtime_ns", "hash", "exif", "latitude", "longitude", "geohash") + tuple(
+    name for name, _, _ in FIELDS
+)
+RECORD_IMAGE = (
+    f"INSERT OR REPLACE INTO images ({', '.join(RECORD_COLUMNS)}) VALUES ({', '.join('?' * len(RECORD_COLUMNS))})"
+)
+
+# Rows filled per statement when a migration fills new columns
+BACKFILL_BATCH_SIZE = 10000
+
+# Images that failed every attempt, skipped until they change
+FAILURES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS failures (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    attempts INTEGER NOT NULL,
+    error TEXT NOT NULL
+)
+"""
+
+
+class Fingerprint(NamedTuple):
+    """Identity of an image file's contents at a point in time."""
+
+    size: int
+    mtime_ns: int
+    hash: Optional[str] = None
+
+
+class Failure(NamedTuple):
+    """A quarantined image and why it failed."""
+
+    size: int
+    mtime_ns: int
+    attempts: int
+    error: str
+
+
+def hash_file(image_file: str, mode: str = "full") -> str:
+    """Hash the contents of a file.
+
+    Args:
+        image_file (str): Path to the file.
+        mode (str): Either "full" or "sampled", see HASH_MODES.
+    Returns:
+        (str) Hex digest of the file contents.
+    """
+    with open(image_file, "rb") as f:
+        return hash_open_file(f, mode)
+
+
+def hash_open_file(f: BinaryIO, mode: str = "full") -> str:
+    """Hash the contents of a file opened in binary mode, reading from its start.
+
+    Args:
+        f (BinaryIO): The open file.
+        mode (str): Either "full" or "sampled", see HASH_MODES.
+    Returns:
+        (str) Hex digest of the file contents.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    size = os.fstat(f.fileno()).st_size
+    if mode == "sampled" and size > 3 * HASH_SAMPLE_SIZE:
+        digest.update(size.to_bytes(8, "little"))
+        for offset in (0, (size - HASH_SAMPLE_SIZE) // 2, size - HASH_SAMPLE_SIZE):
+            f.seek(offset)
+            digest.update(f.read(HASH_SAMPLE_SIZE))
+    else:
+        f.seek(0)
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint(image_file: str, hash_mode: str = "full") -> Fingerprint:
+    """Stat and hash an image file.
+
+    Args:
+        image_file (str): Path to the image file.
+        hash_mode (str): Either "full" or "sampled", see HASH_MODES.
+    Returns:
+        (Fingerprint) Size, mtime and content hash of the file.
+    """
+    st = os.stat(image_file)
+    return Fingerprint(st.st_size, st.st_mtime_ns, hash_file(image_file, hash_mode))
+
+
+def field_values(labeled_exif: dict) -> Tuple:
+    """Normalize the default tags of an image for the typed columns.
+
+    Args:
+        labeled_exif (dict): Labeled EXIF data, with raw or stringified values.
+    Returns:
+        (tuple) Value of each field in FIELDS order, None where missing.
+    """
+    values = []
+    for _, tag, kind in FIELDS:
+        value = labeled_exif.get(tag)
+        if value is not None:
+            value = NORMALIZERS[kind](value)
+        if kind == "datetime" and value is not None:
+            value = value.isoformat(" ")
+        values.append(value)
+    return tuple(values)
+
+
+class Manifest:
+    """SQLite-backed record of processed images.
+
+    A manifest may be shared between threads, e.g. a scanner thread checking
+    images while the main thread records results; access is serialized.
+
+    Args:
+        md_dir (Path): Markdown directory the manifest is stored in.
+        hash_mode (str): How content hashes are computed, see HASH_MODES.
+        name (str): File name of the manifest, e.g. that of a shard's manifest.
+    """
+
+    def __init__(self, md_dir: Path, hash_mode: str = "full", name: str = MANIFEST_NAME):
+        import sqlite3
+
+        self.path = Path(md_dir) / name
+        self.hash_mode = hash_mode
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.lock = threading.RLock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(images)")}
+        for column, kind in MIGRATIONS:
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE images ADD COLUMN {column} {kind}")
+        if any(name not in columns for name, _, _ in FIELDS):
+            self._backfill_fields()
+        self.conn.execute(LOCATION_INDEX)
+        for index in FIELD_INDEXES:
+            self.conn.execute(index)
+        self.conn.execute(FAILURES_SCHEMA)
+        self.conn.commit()
+
+    def _backfill_fields(self) -> None:
+        """Fill the typed columns from the EXIF data recorded before they existed."""
+        assignments = ", ".join(f"{name} = ?" for name, _, _ in FIELDS)
+        rows = self.conn.execute("SELECT path, exif FROM images").fetchall()
+        for start in range(0, len(rows), BACKFILL_BATCH_SIZE):
+            self.conn.executemany(
+                f"UPDATE images SET {assignments} WHERE path = ?",
+                [
+                    (*field_values(json.loads(exif)), path)
+                    for path, exif in rows[start:start + BACKFILL_BATCH_SIZE]
+                ],
+            )
+
+    def __enter__(self) -> "Manifest":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def entries(self) -> Dict[str, Fingerprint]:
+        """Load the fingerprint of every recorded image.
+
+        Returns:
+            (dict) Image paths mapped to their recorded fingerprints.
+        """
+        with self.lock:
+            rows = self.conn.execute("SELECT path, size, mtime_ns, hash FROM images").fetchall()
+        return {path: Fingerprint(size, mtime_ns, digest) for path, size, mtime_ns, digest in rows}
+
+    def get(self, path: str) -> Optional[Fingerprint]:
+        """Return the recorded fingerprint of an image, if any."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT size, mtime_ns, hash FROM images WHERE path = ?", (path,)
+            ).fetchone()
+        return Fingerprint(*row) if row else None
+
+    def exif(self, path: str) -> Optional[dict]:
+        """Return the labeled EXIF data recorded for an image, if any."""
+        with self.lock:
+            row = self.conn.execute("SELECT exif FROM images WHERE path = ?", (path,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def record(self, path: str, image_fingerprint: Fingerprint, labeled_exif: dict) -> None:
+        """Record an image as processed.
+
+        Args:
+            path (str): Image path relative to the image directory.
+            image_fingerprint (Fingerprint): Fingerprint taken before processing.
+            labeled_exif (dict): Labeled EXIF data written for the image.
+        """
+        exif = {label: str(value).rstrip("\x00") for label, value in labeled_exif.items()}
+        position = location(labeled_exif)
+        latitude, longitude = position or (None, None)
+        cell = geohash(*position) if position else None
+        with self.lock:
+            self.conn.execute(
+                RECORD_IMAGE,
+                (
+                    path, image_fingerprint.size, image_fingerprint.mtime_ns, image_fingerprint.hash,
+                    json.dumps(exif), latitude, longitude, cell, *field_values(labeled_exif),
+                ),
+            )
+            self.conn.execute("DELETE FROM failures WHERE path = ?", (path,))
+
+    def record_failure(self, path: str, failure: Failure) -> None:
+        """Quarantine an image that failed to process.
+
+        Args:
+            path (str): Image path relative to the image directory.
+            failure (Failure): Stat of the file when it failed, and the error.
+        """
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO failures (path, size, mtime_ns, attempts, error) VALUES (?, ?, ?, ?, ?)",
+                (path, *failure),
+            )
+
+    def failures(self) -> Dict[str, Failure]:
+        """Load every quarantined image.
+
+        Returns:
+            (dict) Image paths mapped to their failures.
+        """
+        with self.lock:
+            rows = self.conn.execute("SELECT path, size, mtime_ns, attempts, error FROM failures").fetchall()
+        return {path: Failure(*row) for path, *row in rows}
+
+    def clear_failures(self, paths: Optional[Iterable[str]] = None) -> None:
+        """Release quarantined images, or all of them if no paths are given."""
+        with self.lock:
+            if paths is None:
+                self.conn.execute("DELETE FROM failures")
+            else:
+                self.conn.executemany("DELETE FROM failures WHERE path = ?", [(path,) for path in paths])
+
+    def needs_processing(
+        self, path: str, image_file: str, st: os.stat_result, recorded: Optional[Fingerprint]
+    ) -> bool:
+        """Decide whether an image is new or modified since it was recorded.
+
+        Files are first compared by size and mtime. Only when those differ is
+        the content hash computed, so a file that was merely touched is not
+        processed again; its new stat is recorded instead.
+
+        Args:
+            path (str): Image path relative to the image directory.
+            image_file (str): Path to the image file.
+            st (os.stat_result): Current stat of the image file.
+            recorded (Fingerprint): Fingerprint from the manifest, if any.
+        Returns:
+            (bool) True if the image needs processing.
+        """
+        if recorded is None:
+            return True
+        if (st.st_size, st.st_mtime_ns) == (recorded.size, recorded.mtime_ns):
+            return False
+        if st.st_size == recorded.size and hash_file(image_file, self.hash_mode) == recorded.hash:
+            self.update_stat(path, st.st_size, st.st_mtime_ns)
+            return False
+        return True
+
+    def update_stat(self, path: str, size: int, mtime_ns: int) -> None:
+        """Refresh the size and mtime of an image whose contents did not change."""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE images SET size = ?, mtime_ns = ? WHERE path = ?",
+                (size, mtime_ns, path),
+            )
+
+    def remove(self, paths: Iterable[str]) -> None:
+        """Forget images that no longer exist."""
+        with self.lock:
+            self.conn.executemany("DELETE FROM images WHERE path = ?", [(path,) for path in paths])
+
+    def clear(self) -> None:
+        """Forget every image and quarantined image, forcing a full rebuild."""
+        with self.lock:
+            self.conn.execute("DELETE FROM images")
+            self.conn.execute("DELETE FROM failures")
+
+    def commit(self) -> None:
+        """Persist pending changes."""
+        with self.lock:
+            self.conn.commit()
+
+    def close(self) -> None:
+        """Commit pending changes and close the database."""
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
@@ -0,0 +1,198 @@
+"""Run metrics for the Photo Info application.
+
+Collects per-stage counters and latency histograms while images are processed,
+and keeps track of the slowest files, so a slow run shows where its time went.
+
+Stages:
+
+    scan     walking the image directory and checking the manifest
+    hash     fingerprinting an image for the manifest
+    wait     waiting for a read slot on a busy device (locality schedule only)
+    read     reading image headers (pipeline or locality schedule only)
+    extract  extracting EXIF data, including any Image.open/verify fallback
+    label    labeling EXIF tags
+    derive   decoding the image and writing resized derivatives
+    write    rendering and writing the markdown file
+"""
+
+# photo_info/metrics.py
+
+import heapq
+import json
+import math
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+STAGES = ("scan", "hash", "wait", "read", "extract", "label", "derive", "write")
+
+# Histogram buckets grow by a factor of 2**(1/BUCKETS_PER_DOUBLING) from
+# MIN_LATENCY, bounding the error of reported percentiles to about 19%
+MIN_LATENCY = 1e-6
+BUCKETS_PER_DOUBLING = 4
+
+# Number of slowest files remembered
+SLOWEST_FILES = 10
+
+
+@contextmanager
+def timed(timings: Optional[Dict[str, float]], stage: str) -> Iterator[None]:
+    """Add the time spent in the block to `timings[stage]`, if timings are kept."""
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+class Histogram:
+    """Log-scale latency histogram with constant memory."""
+
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @staticmethod
+    def _bucket(seconds: float) -> int:
+        if seconds <= MIN_LATENCY:
+            return 0
+        return math.ceil(math.log2(seconds / MIN_LATENCY) * BUCKETS_PER_DOUBLING)
+
+    def observe(self, seconds: float) -> None:
+        bucket = self._bucket(seconds)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction: float) -> float:
+        """Return an upper bound of the given percentile, in seconds."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(fraction * self.count))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(MIN_LATENCY * 2 ** (bucket / BUCKETS_PER_DOUBLING), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.50),
+            "p90": self.percentile(0.90),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
+
+
+class Metrics:
+    """Counters, latency histograms and slowest files of a run.
+
+    Safe to update from several threads, e.g. the pipeline's scanner thread
+    and the thread consuming results.
+
+    Args:
+        slowest (int): Number of slowest files to remember.
+    """
+
+    def __init__(self, slowest: int = SLOWEST_FILES):
+        self.counters: Counter = Counter()
+        self.stages: Dict[str, Histogram] = {}
+        self.slowest: List[Tuple[float, str, Dict[str, float]]] = []
+        self.max_slowest = slowest
+        # Settings the run was made with that affect its timings, e.g. the I/O schedule
+        self.settings: Dict[str, object] = {}
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self.lock:
+            self.counters[name] += n
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self.lock:
+            self.stages.setdefault(stage, Histogram()).observe(seconds)
+
+    def record(self, path: str, timings: Optional[Dict[str, float]], failed: bool = False) -> None:
+        """Record the outcome and stage timings of one image.
+
+        Args:
+            path (str): Image path relative to the image directory.
+            timings (dict): Seconds spent per stage on the image.
+            failed (bool): Whether processing the image failed.
+        """
+        timings = timings or {}
+        with self.lock:
+            self.counters["failed" if failed else "processed"] += 1
+            for stage, seconds in timings.items():
+                self.stages.setdefault(stage, Histogram()).observe(seconds)
+            entry = (sum(timings.values()), path, dict(timings))
+            if len(self.slowest) < self.max_slowest:
+                heapq.heappush(self.slowest, entry)
+            elif entry > self.slowest[0]:
+                heapq.heapreplace(self.slowest, entry)
+
+    def scanned(self, items: Iterable) -> Iterator:
+        """Pass items through, timing the scanner that produces them."""
+        iterator = iter(items)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            self.observe("scan", time.perf_counter() - start)
+            self.count("scanned")
+            yield item
+
+    def stop(self) -> None:
+        """Mark the end of the run."""
+        self.finished = time.perf_counter()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.perf_counter()) - self.started
+
+    def slowest_files(self) -> List[Tuple[float, str, Dict[str, float]]]:
+        """Return the slowest files, slowest first."""
+        with self.lock:
+            return sorted(self.slowest, reverse=True)
+
+    def to_dict(self) -> dict:
+        """Return the metrics as JSON-serializable data."""
+        with self.lock:
+            stages = {
+                stage: self.stages[stage].summary()
+                for stage in sorted(self.stages, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES))
+            }
+            counters = dict(self.counters)
+        return {
+            "elapsed": self.elapsed,
+            "settings": dict(self.settings),
+            "counters": counters,
+            "stages": stages,
+            "slowest": [
+                {"path": path, "seconds": seconds, "stages": timings}
+                for seconds, path, timings in self.slowest_files()
+            ],
+        }
+
+    def write_json(self, path: str) -> None:
+        """Write the metrics to a JSON file."""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write("\n")
@@ -2,94 +2,339 @@
 
 # photo_info/photo_info.py
 
+import concurrent.futures
+import contextlib
+import io
 import os
-import pdb
+import struct
 import sys
+import threading
+from collections import deque
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple, TypeVar
+
 from PIL import Image
-from PIL.ExifTags import TAGS
-
-# Specify which EXIF tags to extract
-MY_TAGS = [
-    "Make",
-    "Model",
-    "DateTimeOriginal",
-    "FocalLength",
-    "FNumber",
-    "ExposureTime",
-    "ISOSpeedRatings",
-    "ExposureBiasValue",
-    "LensMake",
-    "LensModel",
-]
-
-
-def get_exif_data(image_file: str) -> dict:
+
+from photo_info import exif_reader
+from photo_info.manifest import Fingerprint, fingerprint
+from photo_info.metrics import timed
+from photo_info.derivatives import DerivativeSettings, Derivatives, make_derivatives
+from photo_info.scanner import WorkItem, site_path
+from photo_info.scheduler import IOSettings, device_slot, read_header, fingerprint as scheduled_fingerprint
+from photo_info.tags import DEFAULT_TAGS, TagRules, TagSet
+
+# EXIF tags extracted unless the configuration selects others
+MY_TAGS = DEFAULT_TAGS
+MY_TAG_SET = TagSet(MY_TAGS)
+MY_TAG_RULES = TagRules(MY_TAG_SET)
+
+# Numeric tag IDs of MY_TAGS, used by the header-only reader
+MY_TAG_IDS = MY_TAG_SET.ids
+
+# Available EXIF extraction engines
+ENGINES = ("fast", "pillow")
+
+# Executors available for spreading per-image work across workers, by class
+# name so the multiprocessing machinery is only imported when it is used
+EXECUTORS = {
+    "thread": "ThreadPoolExecutor",
+    "process": "ProcessPoolExecutor",
+}
+
+# Front-matter fields edited by hand or by other commands, e.g. `dedupe --link`,
+# which are kept when a markdown file is rewritten from its image
+EDITABLE_FIELDS = ("title", "description", "duplicate_of")
+
+# Work items queued per worker; bounds memory while keeping workers busy
+QUEUE_DEPTH_PER_WORKER = 4
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class ProcessResult(NamedTuple):
+    """Outcome of processing a single image."""
+
+    item: WorkItem
+    labeled_exif: dict
+    error: Optional[str] = None
+    fingerprint: Optional[Fingerprint] = None
+    timings: Optional[Dict[str, float]] = None
+
+
+def get_exif_data(
+    image_file: str, engine: str = "fast", verify: bool = True, tags: Optional[TagSet] = None
+) -> dict:
     """Get embedded EXIF data from image file.
+
+    The "fast" engine reads only the JPEG headers, or the IFDs of TIFF-based
+    RAW files, and decodes only the selected tags; other tags, MakerNote blobs
+    and sub-IFDs nothing was requested from are skipped. Files it cannot handle
+    (other formats, missing Exif segment, corrupt headers) fall back to Pillow.
+
     Args:
-        image_file (str): Path to the image file.
+        image_file (str): Path to the image file, or a seekable binary file
+            object such as an archive member read into memory.
+        engine (str): Either "fast" or "pillow".
+        verify (bool): Whether Pillow should verify the file before reading it.
+        tags (TagSet): Tags to extract. Defaults to MY_TAGS.
     Returns:
         (dict) A dictionary containing the EXIF
         data extracted from the image.
     """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown EXIF engine {engine!r}, expected one of {ENGINES}")
+    tag_ids = (tags or MY_TAG_SET).ids
+
+    if engine == "fast" and isinstance(image_file, (str, os.PathLike, io.IOBase)):
+        start = None if isinstance(image_file, (str, os.PathLike)) else image_file.tell()
+        try:
+            if start is None:
+                exif_data = exif_reader.read_exif_file(image_file, tag_ids)
+            else:
+                exif_data = exif_reader.read_exif(image_file, tag_ids)
+        except (OSError, ValueError, struct.error):
+            exif_data = None
+        if exif_data is not None:
+            return exif_data
+        if start is not None:
+            image_file.seek(start)
+
     image = Image.open(image_file)
-    image.verify()
-    return image._getexif()
+    if verify:
+        # A verified image cannot be loaded any more; open it again
+        image.verify()
+        if hasattr(image_file, "seek"):
+            image_file.seek(0)
+        image = Image.open(image_file)
+    if hasattr(image, "_getexif"):
+        exif_data = image._getexif()
+    else:
+        # PNG, TIFF and other formats without the JPEG-only legacy helper
+        exif = image.getexif()
+        exif_data = {**exif, **exif.get_ifd(exif_reader.EXIF_IFD_POINTER)} or None
+        if exif_data and exif_reader.GPS_IFD_POINTER in tag_ids and exif_reader.GPS_IFD_POINTER in exif:
+            exif_data[exif_reader.GPS_IFD_POINTER] = dict(exif.get_ifd(exif_reader.GPS_IFD_POINTER))
+    if exif_data is None:
+        return None
+    return {tag: value for tag, value in exif_data.items() if tag in tag_ids}
 
 
-def get_labeled_exif(exif_data: dict) -> dict:
+def get_labeled_exif(exif_data: dict, tags: Optional[TagSet] = None) -> dict:
     """Get human-readable labels for EXIF data.
 
+    Labels are emitted in the order the tags were selected in, so the
+    front-matter does not depend on the order the tags were stored in the
+    file or decoded by the engine.
+
     Args:
-        exif_data (dict): EXIF data extracted from the image.
+        exif_data (dict): EXIF data extracted from the image, or None if it
+            has none.
+        tags (TagSet): Tags to label. Defaults to MY_TAGS.
     Returns:
-        (dict) A dictionary containing the labeled EXIF data.
+        (dict) A dictionary containing the labeled EXIF data, empty if none of
+        the tags were found.
     """
     if exif_data is None:
-        print("No EXIF data found")
         return {}
+    return (tags or MY_TAG_SET).label(exif_data)
 
-    labeled_exif = {
-        TAGS.get(tag): value
-        for tag, value in exif_data.items()
-        if TAGS.get(tag) in MY_TAGS
-    }
-    return labeled_exif
 
+def render_markdown(
+    image_name: str,
+    labeled_exif: dict,
+    rel_path: Optional[str] = None,
+    derivatives: Optional[Derivatives] = None,
+) -> str:
+    """Render the markdown front-matter for an image.
+
+    Args:
+        image_name (str): Path to the image file.
+        labeled_exif (dict): Labeled EXIF data.
+        rel_path (str): Optional image path relative to the image directory,
+            used as `src` when the image is not under a `public` directory.
+        derivatives (Derivatives): Optional dimensions, resized variants and
+            placeholder of the image.
+    Returns:
+        (str) The markdown file contents.
+    """
+    # If 'public' is not in path, use the path within the image directory
+    local_path = site_path(image_name, rel_path or image_name.split("/")[-1])
 
-def write_to_markdown(image_name: str, labeled_exif: dict, md_dir: str) -> None:
+    lines = [
+        "---",
+        "title: placeholder",
+        "description: placeholder",
+        "src: " + local_path,
+    ]
+    if derivatives is not None:
+        lines.extend(derivatives.front_matter())
+    lines.append("details:")
+    for label, value in labeled_exif.items():
+        value = str(value).rstrip("\x00")  # some values have trailing null bytes
+        lines.append(f"  {label}: {value}")
+    lines.append("---")
+    return "\n".join(lines) + "\n"
+
+
+def write_to_markdown(
+    image_name: str,
+    labeled_exif: dict,
+    md_dir: str,
+    md_file: Optional[str] = None,
+    rel_path: Optional[str] = None,
+    fsync: bool = False,
+    derivatives: Optional[Derivatives] = None,
+) -> bool:
     """Write EXIF data to markdown file.
 
+    When the file exists, its title, description and other fields in
+    EDITABLE_FIELDS, and anything after the front-matter, are kept. The file is
+    left untouched, keeping its mtime, when its contents would not change.
+    Otherwise it is written to a temporary file in the same directory and
+    renamed into place, so readers never see a partially written file.
+
     Args:
         image_name (str): Path to the image file.
         labeled_exif (dict): Labeled EXIF data.
         md_dir (str): Path to the directory where the markdown file will be saved.
+        md_file (str): Optional path of the markdown file, overriding the name
+            derived from `image_name`. Missing parent directories are created.
+        rel_path (str): Optional image path relative to the image directory,
+            used as `src` when the image is not under a `public` directory.
+        fsync (bool): Whether to flush the file to disk before renaming it.
+            See `sync_directories` to make the renames durable.
+        derivatives (Derivatives): Optional dimensions, resized variants and
+            placeholder of the image, recorded in the front-matter.
+    Returns:
+        (bool) True if the file was written, False if it was already up to date.
+    """
+    if md_file is None:
+        filename = md_dir + os.path.splitext(image_name.split("/")[-1])[0] + ".md"
+    else:
+        filename = md_file
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok=True)
+
+    content = render_markdown(image_name, labeled_exif, rel_path, derivatives)
+    try:
+        with open(filename, "rb") as f:
+            existing = f.read()
+    except FileNotFoundError:
+        existing = None
+    if existing is not None:
+        content = _keep_edits(content, existing.decode("utf-8", "replace"))
+    if content.encode("utf-8") == existing:
+        return False
+    _write_file(filename, content.encode("utf-8"), fsync)
+    return True
+
+
+def _keep_edits(rendered: str, existing: str) -> str:
+    """Carry the fields in EDITABLE_FIELDS and the body of an existing markdown file over to its new contents."""
+    lines = existing.split("\n")
+    if not lines or lines[0] != "---" or "---" not in lines[1:]:
+        return rendered
+    end = lines.index("---", 1)
+    kept: Dict[str, List[str]] = {}
+    key = None
+    for line in lines[1:end]:
+        # Indented lines continue the value of the field above them
+        if not line[:1].isspace():
+            key = line.split(":", 1)[0]
+            if key in EDITABLE_FIELDS:
+                kept[key] = []
+        if key in kept:
+            kept[key].append(line)
+
+    new_lines = rendered.split("\n")
+    new_end = new_lines.index("---", 1)
+    front_matter = []
+    for line in new_lines[1:new_end]:
+        field = line.split(":", 1)[0]
+        if field == "details":
+            # Fields the rendered contents lack, e.g. duplicate_of, go before details
+            for key in list(kept):
+                if all(not other.startswith(key + ":") for other in new_lines[1:new_end]):
+                    front_matter.extend(kept.pop(key))
+        front_matter.extend(kept.pop(field, [line]))
+    return "\n".join(["---"] + front_matter + ["---"] + lines[end + 1:])
+
+
+def set_front_matter(md_file: str, key: str, value: Optional[str]) -> bool:
+    """Set or remove a top-level field in the front-matter of a markdown file.
+
+    The field goes right before `details`, or at the end of the front-matter.
+    Used to add fields that are not derived from the image itself, such as
+    `duplicate_of`. Those in EDITABLE_FIELDS survive when the file is
+    rewritten from the image, see `write_to_markdown`.
+
+    Args:
+        md_file (str): Path of the markdown file.
+        key (str): Name of the field.
+        value (str): New value of the field, or None to remove it.
     Returns:
-        None - Writes the markdown file to disk.
+        (bool) True if the file was written, False if it was already up to date.
     """
-    filename = md_dir + image_name.split("/")[-1].replace(".jpg", ".md")
-    local_path_sections = image_name.split("/")
+    with open(md_file, "rb") as f:
+        existing = f.read()
+    lines = existing.decode("utf-8").split("\n")
+    if not lines or lines[0] != "---" or "---" not in lines[1:]:
+        raise ValueError(f"{md_file} has no front-matter")
+    end = lines.index("---", 1)
+    front_matter = [line for line in lines[1:end] if not line.startswith(key + ":")]
+    if value is not None:
+        position = front_matter.index("details:") if "details:" in front_matter else len(front_matter)
+        front_matter.insert(position, f"{key}: {value}")
+
+    content = "\n".join(["---"] + front_matter + lines[end:]).encode("utf-8")
+    if content == existing:
+        return False
+    _write_file(md_file, content, fsync=False)
+    return True
+
+
+def _write_file(filename: str, content: bytes, fsync: bool) -> None:
+    """Write a file through a temporary file in the same directory and rename it into place."""
+    directory, name = os.path.split(filename)
+    temp_file = os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    fd = os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
     try:
-        public_index = local_path_sections.index("public")
-        local_path = "/".join(local_path_sections[public_index + 1:])
-    except ValueError:
-        # If 'public' is not in path, use the filename only
-        local_path = image_name.split("/")[-1]
-
-    with open(filename, "w+", encoding="utf-8") as f:
-        f.write("---\n")
-        f.write("title: placeholder\n")
-        f.write("description: placeholder\n")
-        f.write("src: " + local_path + "\n")
-        f.write("details:\n")
-        for label, value in labeled_exif.items():
-            value = str(value).rstrip("\x00")  # some values have trailing null bytes
-            f.write(f"  {label}: {value}\n")
-        f.write("---\n")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_file, filename)
+    except BaseException:
+        try:
+            os.unlink(temp_file)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def sync_directories(directories: Iterable[str]) -> None:
+    """Flush directory entries to disk, making renamed markdown files durable.
+
+    Batching this per directory costs one fsync per directory rather than one
+    per file.
+
+    Args:
+        directories (Iterable[str]): Directories containing written files.
+    """
+    for directory in set(directories):
+        fd = os.open(directory or ".", os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
 
 
 def identify_new_images(image_dir: str, md_dir: str) -> list:
     """Identify images that do not have a correspdoning markdown file.
 
+    Only looks at ".jpg" files directly inside `image_dir`; see
+    `scanner.scan_images` for recursive, incremental scanning.
+
     Args:
         image_dir (str): Path to the directory containing images.
         md_dir (str): Path to the directory containing markdown files.
@@ -99,11 +344,250 @@ def identify_new_images(image_dir: str, md_dir: str) -> list:
     images = [f for f in os.listdir(image_dir) if f.endswith(".jpg")]
     mds = [f for f in os.listdir(md_dir) if f.endswith(".md")]
     image_names = [f.split(".")[0] for f in images]
-    md_names = [f.split(".")[0] for f in mds]
+    md_names = {f.split(".")[0] for f in mds}
     new_images = [f for f in image_names if f not in md_names]
     return new_images
 
 
+def process_image(
+    item: WorkItem,
+    engine: str = "fast",
+    verify: bool = True,
+    fsync: bool = False,
+    timings: Optional[Dict[str, float]] = None,
+    tags: TagRules = MY_TAG_RULES,
+    derivatives: Optional[DerivativeSettings] = None,
+    io_settings: Optional[IOSettings] = None,
+) -> dict:
+    """Extract, label and write the EXIF data of a single image.
+
+    Args:
+        item (WorkItem): The image and the markdown file to write for it.
+        engine (str): EXIF extraction engine, see `get_exif_data`.
+        verify (bool): Whether Pillow should verify the file before reading it.
+        fsync (bool): Whether to flush the markdown file to disk before renaming it.
+        timings (dict): If given, seconds spent per stage are added to it,
+            see `metrics.STAGES`.
+        tags (TagRules): Which tags to extract for which images.
+        derivatives (DerivativeSettings): If given, resized variants of the
+            image are written and recorded in the front-matter.
+        io_settings (IOSettings): If given, the header is read in one call
+            while holding a read slot of its device, as is the whole file if
+            the header is not enough, see scheduler.py.
+    Returns:
+        (dict) The labeled EXIF data written to the markdown file.
+    """
+    tag_set = tags.for_path(item.rel_path)
+    exif_data = None
+    if io_settings is not None and engine == "fast":
+        header, complete = read_header(item.image_file, io_settings.reads_per_device, timings)
+        with timed(timings, "extract"):
+            try:
+                exif_data = exif_reader.read_exif_bytes(header, tag_set.ids, complete)
+            except (ValueError, struct.error):
+                exif_data = None
+    if exif_data is None:
+        # Metadata beyond the header, or a format only Pillow understands
+        slot = contextlib.nullcontext()
+        if io_settings is not None:
+            slot = device_slot(item.image_file, io_settings.reads_per_device, timings)
+        with slot, timed(timings, "extract"):
+            exif_data = get_exif_data(item.image_file, engine=engine, verify=verify, tags=tag_set)
+    with timed(timings, "label"):
+        labeled_exif = get_labeled_exif(exif_data, tag_set)
+    image_derivatives = None
+    if derivatives is not None:
+        with timed(timings, "derive"):
+            image_derivatives = make_derivatives(item.image_file, item.rel_path, derivatives)
+    with timed(timings, "write"):
+        write_item_markdown(item, labeled_exif, fsync=fsync, derivatives=image_derivatives)
+    return labeled_exif
+
+
+def write_item_markdown(
+    item: WorkItem,
+    labeled_exif: dict,
+    fsync: bool = False,
+    derivatives: Optional[Derivatives] = None,
+) -> bool:
+    """Write the markdown file of a work item.
+
+    Args:
+        item (WorkItem): The image and the markdown file to write for it.
+        labeled_exif (dict): Labeled EXIF data.
+        fsync (bool): Whether to flush the file to disk before renaming it.
+        derivatives (Derivatives): Optional derivatives to record in the front-matter.
+    Returns:
+        (bool) True if the file was written, False if it was already up to date.
+    """
+    md_dir = os.path.dirname(item.markdown_file) + "/"
+    return write_to_markdown(
+        item.image_file,
+        labeled_exif,
+        md_dir,
+        md_file=item.markdown_file,
+        rel_path=item.rel_path,
+        fsync=fsync,
+        derivatives=derivatives,
+    )
+
+
+def _process_image_safely(args: tuple) -> ProcessResult:
+    """Run `process_image`, capturing any error instead of raising it.
+
+    Defined at module level so it can be pickled by a process pool.
+    """
+    item, hash_mode, options = args
+    timings: Dict[str, float] = {}
+    try:
+        # Fingerprint first so the manifest describes the file that was read
+        image_fingerprint = None
+        io_settings = options.get("io_settings")
+        if hash_mode and io_settings is not None:
+            image_fingerprint = scheduled_fingerprint(item.image_file, hash_mode, io_settings.reads_per_device, timings)
+        elif hash_mode:
+            with timed(timings, "hash"):
+                image_fingerprint = fingerprint(item.image_file, hash_mode)
+        labeled_exif = process_image(item, timings=timings, **options)
+        return ProcessResult(item, labeled_exif, fingerprint=image_fingerprint, timings=timings)
+    except Exception as e:
+        return ProcessResult(item, {}, f"{type(e).__name__}: {e}", timings=timings)
+
+
+def process_images(
+    items: Iterable[WorkItem],
+    jobs: Optional[int] = None,
+    executor: str = "thread",
+    hash_mode: Optional[str] = None,
+    pool: Optional[concurrent.futures.Executor] = None,
+    **options,
+) -> Iterator[ProcessResult]:
+    """Process images across a pool of workers.
+
+    Results are yielded in the same order as `items`, whatever order the
+    workers finish in, so output stays deterministic. A failing image does not
+    stop the run; its error is reported on its `ProcessResult` instead.
+    `items` is consumed lazily, with only a few items per worker in flight.
+
+    Args:
+        items (Iterable[WorkItem]): Images to process, e.g. from `scan_images`.
+        jobs (int): Number of workers. Defaults to the number of CPUs.
+        executor (str): Either "thread" or "process".
+        hash_mode (str): When set, fingerprint each image for the manifest
+            using this hash mode, see `manifest.HASH_MODES`.
+        pool (Executor): Pool to run on instead of starting one, see `open_pool`.
+        **options: Keyword arguments passed on to `process_image`.
+    Returns:
+        (Iterator[ProcessResult]) One result per image, in input order.
+    """
+    work = ((item, hash_mode, options) for item in items)
+    return ordered_map(_process_image_safely, work, jobs=jobs, executor=executor, pool=pool)
+
+
+def process_image_groups(
+    groups: Sequence[Tuple[Iterable[WorkItem], Optional[str], dict]],
+    jobs: Optional[int] = None,
+    executor: str = "thread",
+    pool: Optional[concurrent.futures.Executor] = None,
+) -> Iterator[Tuple[int, ProcessResult]]:
+    """Process several groups of images, each with its own options, as one stream.
+
+    The groups are fed to the workers one after another, so the workers move
+    on to the next group while the last images of the previous one are still
+    in flight, rather than the pool draining at the end of every group.
+
+    Args:
+        groups (Sequence[tuple]): The images, hash mode and `process_image`
+            options of each group, see `process_images`.
+        jobs (int): Number of workers. Defaults to the number of CPUs.
+        executor (str): Either "thread" or "process".
+        pool (Executor): Pool to run on instead of starting one, see `open_pool`.
+    Returns:
+        (Iterator[tuple]) The index of the group and the result of each image,
+        in input order.
+    """
+    # Images are submitted ahead of the results, which come back in input order
+    indices = deque()
+
+    def work():
+        for index, (items, hash_mode, options) in enumerate(groups):
+            for item in items:
+                indices.append(index)
+                yield item, hash_mode, options
+
+    for result in ordered_map(_process_image_safely, work(), jobs=jobs, executor=executor, pool=pool):
+        yield indices.popleft(), result
+
+
+def open_pool(jobs: Optional[int] = None, executor: str = "thread") -> Optional[concurrent.futures.Executor]:
+    """Start a pool of workers that several `ordered_map` calls can share.
+
+    Sharing one pool between batches, such as the collections of one run,
+    saves starting workers, and with the "process" executor importing Pillow
+    in each of them, once per batch. The caller shuts the pool down.
+
+    Args:
+        jobs (int): Number of workers. Defaults to the number of CPUs.
+        executor (str): Either "thread" or "process".
+    Returns:
+        (Executor) The pool, or None for a single job, which runs inline.
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor {executor!r}, expected one of {sorted(EXECUTORS)}")
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1:
+        return None
+    return getattr(concurrent.futures, EXECUTORS[executor])(max_workers=jobs)
+
+
+def ordered_map(
+    func: Callable[[T], R],
+    args: Iterable[T],
+    jobs: Optional[int] = None,
+    executor: str = "thread",
+    pool: Optional[concurrent.futures.Executor] = None,
+) -> Iterator[R]:
+    """Apply `func` to each of `args` across a pool of workers, in input order.
+
+    `args` is consumed lazily, with only a few calls per worker in flight.
+
+    Args:
+        func (Callable): Function to apply. It must be defined at module level
+            to be used with the "process" executor.
+        args (Iterable): Arguments of each call.
+        jobs (int): Number of workers. Defaults to the number of CPUs.
+        executor (str): Either "thread" or "process".
+        pool (Executor): Pool of `jobs` workers to run on, which is left
+            running, instead of starting one. See `open_pool`.
+    Returns:
+        (Iterator) The result of each call, in input order.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if pool is not None:
+        yield from _map_on_pool(pool, func, args, jobs)
+        return
+
+    pool = open_pool(jobs, executor)
+    if pool is None:
+        yield from map(func, args)
+        return
+    with pool:
+        yield from _map_on_pool(pool, func, args, jobs)
+
+
+def _map_on_pool(
+    pool: concurrent.futures.Executor, func: Callable[[T], R], args: Iterable[T], jobs: int
+) -> Iterator[R]:
+    """Submit calls to a pool, a few per worker at a time, yielding results in input order."""
+    pending = deque()
+    for arg in args:
+        pending.append(pool.submit(func, arg))
+        if len(pending) >= jobs * QUEUE_DEPTH_PER_WORKER:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
 def main():
     image_dir = sys.argv[1]
     md_dir = sys.argv[2]
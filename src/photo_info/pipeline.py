@@ -0,0 +1,276 @@
+"""Pipelined processing for the Photo Info application.
+
+Splits per-image work into stages joined by bounded queues:
+
+    scan -> read headers -> parse EXIF -> write markdown
+
+Each stage runs with its own concurrency limit, so waiting on slow storage
+overlaps with parsing while the bounded queues keep memory flat however many
+images are scanned.
+"""
+
+# photo_info/pipeline.py
+
+import asyncio
+import contextlib
+import queue
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterable, Iterator, NamedTuple, Optional
+
+from photo_info import exif_reader, photo_info
+from photo_info.derivatives import DerivativeSettings, make_derivatives
+from photo_info.exif_reader import HEADER_BYTES
+from photo_info.manifest import fingerprint
+from photo_info.metrics import timed
+from photo_info.photo_info import ProcessResult
+from photo_info.scanner import WorkItem
+from photo_info.scheduler import IOSettings, device_slot, read_header, fingerprint as scheduled_fingerprint
+from photo_info.tags import TagRules
+
+# Marks the end of a queue
+_DONE = object()
+
+
+class PipelineLimits(NamedTuple):
+    """Concurrency limits of the pipeline stages."""
+
+    readers: int = 8
+    parsers: int = 2
+    writers: int = 4
+    queue_size: int = 64
+
+
+class _Job:
+    """An image moving through the pipeline."""
+
+    __slots__ = ("item", "header", "complete", "fingerprint", "labeled_exif", "derivatives", "error", "timings")
+
+    def __init__(self, item: WorkItem):
+        self.item = item
+        self.header = b""
+        self.complete = False
+        self.fingerprint = None
+        self.labeled_exif = {}
+        self.derivatives = None
+        self.error: Optional[str] = None
+        self.timings = {}
+
+    def fail(self, e: Exception) -> None:
+        self.error = f"{type(e).__name__}: {e}"
+
+    def result(self) -> ProcessResult:
+        return ProcessResult(self.item, self.labeled_exif, self.error, self.fingerprint, self.timings)
+
+
+def _read(job: _Job, hash_mode: Optional[str], io_settings: Optional[IOSettings]) -> None:
+    """Read the header bytes of an image, fingerprinting it first if asked."""
+    if hash_mode and io_settings is not None:
+        job.fingerprint = scheduled_fingerprint(job.item.image_file, hash_mode, io_settings.reads_per_device, job.timings)
+    elif hash_mode:
+        with timed(job.timings, "hash"):
+            job.fingerprint = fingerprint(job.item.image_file, hash_mode)
+    if io_settings is not None:
+        job.header, job.complete = read_header(job.item.image_file, io_settings.reads_per_device, job.timings)
+        return
+    with timed(job.timings, "read"), open(job.item.image_file, "rb") as f:
+        job.header = f.read(HEADER_BYTES + 1)
+    job.complete = len(job.header) <= HEADER_BYTES
+    job.header = job.header[:HEADER_BYTES]
+
+
+def _parse(
+    job: _Job,
+    engine: str,
+    verify: bool,
+    tags: TagRules,
+    derivatives: Optional[DerivativeSettings],
+    io_settings: Optional[IOSettings],
+) -> None:
+    """Extract and label EXIF data from the header bytes of an image, and
+    decode it to write derivatives if asked."""
+    tag_set = tags.for_path(job.item.rel_path)
+    exif_data = None
+    if engine == "fast":
+        with timed(job.timings, "extract"):
+            try:
+                exif_data = exif_reader.read_exif_bytes(job.header, tag_set.ids, job.complete)
+            except (ValueError, struct.error):
+                exif_data = None
+    if exif_data is None:
+        # Metadata beyond the prefix, or a format only Pillow understands
+        slot = contextlib.nullcontext()
+        if io_settings is not None:
+            slot = device_slot(job.item.image_file, io_settings.reads_per_device, job.timings)
+        with slot, timed(job.timings, "extract"):
+            exif_data = photo_info.get_exif_data(job.item.image_file, engine=engine, verify=verify, tags=tag_set)
+    job.header = b""
+    with timed(job.timings, "label"):
+        job.labeled_exif = photo_info.get_labeled_exif(exif_data, tag_set)
+    if derivatives is not None:
+        with timed(job.timings, "derive"):
+            job.derivatives = make_derivatives(job.item.image_file, job.item.rel_path, derivatives)
+
+
+def _write(job: _Job, fsync: bool) -> None:
+    """Write the markdown file of an image."""
+    with timed(job.timings, "write"):
+        photo_info.write_item_markdown(job.item, job.labeled_exif, fsync=fsync, derivatives=job.derivatives)
+
+
+async def run_pipeline(
+    items: Iterable[WorkItem],
+    limits: PipelineLimits = PipelineLimits(),
+    hash_mode: Optional[str] = None,
+    engine: str = "fast",
+    verify: bool = True,
+    fsync: bool = False,
+    tags: TagRules = photo_info.MY_TAG_RULES,
+    derivatives: Optional[DerivativeSettings] = None,
+    io_settings: Optional[IOSettings] = None,
+) -> AsyncIterator[ProcessResult]:
+    """Process images through the staged pipeline.
+
+    `items` is iterated on a dedicated thread, so a blocking scanner such as
+    `scan_images` can be passed directly. Results are yielded as images finish,
+    which is not necessarily input order. A failing image does not stop the
+    run; its error is reported on its `ProcessResult` instead.
+
+    Args:
+        items (Iterable[WorkItem]): Images to process, e.g. from `scan_images`.
+        limits (PipelineLimits): Concurrency limits of the stages.
+        hash_mode (str): When set, fingerprint each image for the manifest
+            using this hash mode, see `manifest.HASH_MODES`.
+        engine (str): EXIF extraction engine, see `get_exif_data`.
+        verify (bool): Whether Pillow should verify files it falls back to.
+        fsync (bool): Whether to flush markdown files to disk before renaming them.
+        tags (TagRules): Which tags to extract for which images.
+        derivatives (DerivativeSettings): If given, resized variants are
+            written in the parse stage and recorded in the front-matter.
+        io_settings (IOSettings): If given, headers are read with readahead
+            hints and a cap on reads per device, see scheduler.py.
+    Returns:
+        (AsyncIterator[ProcessResult]) One result per image.
+    """
+    loop = asyncio.get_running_loop()
+    to_read: asyncio.Queue = asyncio.Queue(limits.queue_size)
+    to_parse: asyncio.Queue = asyncio.Queue(limits.queue_size)
+    to_write: asyncio.Queue = asyncio.Queue(limits.queue_size)
+    finished: asyncio.Queue = asyncio.Queue(limits.queue_size)
+
+    scan_pool = ThreadPoolExecutor(1, thread_name_prefix="photo-info-scan")
+    io_pool = ThreadPoolExecutor(limits.readers + limits.writers, thread_name_prefix="photo-info-io")
+    cpu_pool = ThreadPoolExecutor(limits.parsers, thread_name_prefix="photo-info-parse")
+
+    def produce() -> None:
+        for item in items:
+            asyncio.run_coroutine_threadsafe(to_read.put(_Job(item)), loop).result()
+
+    async def worker(inbox: asyncio.Queue, outbox: asyncio.Queue, pool, func, *args) -> None:
+        while True:
+            job = await inbox.get()
+            if job is _DONE:
+                return
+            if job.error is None:
+                try:
+                    await loop.run_in_executor(pool, func, job, *args)
+                except Exception as e:
+                    job.fail(e)
+            await outbox.put(job)
+
+    async def stage(inbox, outbox, count, downstream, pool, func, *args) -> None:
+        workers = [worker(inbox, outbox, pool, func, *args) for _ in range(count)]
+        await asyncio.gather(*workers)
+        for _ in range(downstream):
+            await outbox.put(_DONE)
+
+    async def scan() -> None:
+        try:
+            await loop.run_in_executor(scan_pool, produce)
+        finally:
+            for _ in range(limits.readers):
+                await to_read.put(_DONE)
+
+    tasks = [
+        asyncio.ensure_future(scan()),
+        asyncio.ensure_future(stage(to_read, to_parse, limits.readers, limits.parsers, io_pool, _read, hash_mode, io_settings)),
+        asyncio.ensure_future(stage(
+            to_parse, to_write, limits.parsers, limits.writers, cpu_pool, _parse, engine, verify, tags, derivatives,
+            io_settings,
+        )),
+        asyncio.ensure_future(stage(to_write, finished, limits.writers, 1, io_pool, _write, fsync)),
+    ]
+    try:
+        while True:
+            job = await finished.get()
+            if job is _DONE:
+                break
+            yield job.result()
+        # Surface scanner errors once everything that was scanned has finished
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        for pool in (scan_pool, io_pool, cpu_pool):
+            pool.shutdown(wait=False)
+
+
+def process_pipeline(
+    items: Iterable[WorkItem],
+    limits: PipelineLimits = PipelineLimits(),
+    hash_mode: Optional[str] = None,
+    engine: str = "fast",
+    verify: bool = True,
+    fsync: bool = False,
+    tags: TagRules = photo_info.MY_TAG_RULES,
+    derivatives: Optional[DerivativeSettings] = None,
+    io_settings: Optional[IOSettings] = None,
+) -> Iterator[ProcessResult]:
+    """Run `run_pipeline` on a background event loop and yield its results.
+
+    This is the synchronous entry point used by the CLI; results can be
+    consumed from the calling thread while the pipeline keeps running.
+
+    Args:
+        items (Iterable[WorkItem]): Images to process, e.g. from `scan_images`.
+        limits (PipelineLimits): Concurrency limits of the stages.
+        hash_mode (str): When set, fingerprint each image for the manifest.
+        engine (str): EXIF extraction engine, see `get_exif_data`.
+        verify (bool): Whether Pillow should verify files it falls back to.
+        fsync (bool): Whether to flush markdown files to disk before renaming them.
+        tags (TagRules): Which tags to extract for which images.
+        derivatives (DerivativeSettings): If given, resized variants are
+            written and recorded in the front-matter.
+        io_settings (IOSettings): If given, headers are read with readahead
+            hints and a cap on reads per device, see scheduler.py.
+    Returns:
+        (Iterator[ProcessResult]) One result per image, in completion order.
+    """
+    results: queue.Queue = queue.Queue(limits.queue_size)
+
+    async def drain() -> None:
+        loop = asyncio.get_running_loop()
+        async for result in run_pipeline(
+            items, limits, hash_mode, engine, verify, fsync, tags, derivatives, io_settings
+        ):
+            await loop.run_in_executor(None, results.put, result)
+
+    def run() -> None:
+        try:
+            asyncio.run(drain())
+        except BaseException as e:
+            results.put(e)
+        finally:
+            results.put(_DONE)
+
+    thread = threading.Thread(target=run, name="photo-info-pipeline", daemon=True)
+    thread.start()
+    while True:
+        result = results.get()
+        if result is _DONE:
+            break
+        if isinstance(result, BaseException):
+            raise result
+        yield result
+    thread.join()
@@ -0,0 +1,221 @@
+"""Metadata queries for the Photo Info application.
+
+`photo-info query` finds images by their EXIF data in the manifest, which keeps
+the default tags in typed, indexed columns (see manifest.py) as `process`
+records each image. A condition is a tag, an operator and a value:
+
+    ISOSpeedRatings > 3200
+    LensModel ~ 24-70          (contains, ignoring case)
+    DateTimeOriginal = 2024    (any time in 2024; also 2024-06, 2024-06-01 ...)
+    ExposureTime <= 1/250
+
+Values are compared as the tag's type: numbers as numbers and dates as
+periods. Tags without a column of their own are read from the recorded EXIF
+data, which needs a scan of the manifest rather than an index lookup.
+"""
+
+# photo_info/query.py
+
+import datetime
+import json
+import re
+from fractions import Fraction
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from photo_info.fields import FIELDS
+
+if TYPE_CHECKING:
+    from photo_info.manifest import Manifest
+
+OPERATORS = ("<=", ">=", "!=", "=", "<", ">", "~")
+
+# Column and kind of value of each tag with a column of its own
+COLUMNS: Dict[str, Tuple[str, str]] = {tag: (name, kind) for name, tag, kind in FIELDS}
+COLUMNS["GPSLatitude"] = ("latitude", "float")
+COLUMNS["GPSLongitude"] = ("longitude", "float")
+
+# Labels written for GPSInfo (see geo.py) rather than named after a tag
+GPS_LABELS = ("GPSAltitude",)
+
+# Tags by lower-cased tag and column name, e.g. "fnumber" and "f_number"
+ALIASES = {key.lower(): tag for tag, (name, _) in COLUMNS.items() for key in (tag, name)}
+
+# A tag, an operator and a value
+CONDITION_PATTERN = re.compile(
+    r"^\s*([A-Za-z][A-Za-z0-9_]*)\s*(" + "|".join(map(re.escape, OPERATORS)) + r")\s*(.*?)\s*$"
+)
+
+# A date and time, from the year down to the second
+DATETIME_PATTERN = re.compile(
+    r"^(\d{4})(?:[-:](\d{1,2})(?:[-:](\d{1,2})(?:[ T](\d{1,2})(?::(\d{1,2})(?::(\d{1,2}))?)?)?)?)?$"
+)
+
+
+class Condition(NamedTuple):
+    """A parsed condition on an EXIF tag."""
+
+    tag: str
+    sql: str
+    params: tuple
+
+
+class Order(NamedTuple):
+    """A parsed sort order."""
+
+    tag: str
+    sql: str
+    descending: bool = False
+
+
+class Result(NamedTuple):
+    """An image found by a query."""
+
+    path: str
+    exif: dict
+
+
+def _column(name: str) -> Tuple[str, str, str]:
+    """Resolve a tag name to its tag, SQL expression and kind of value.
+
+    Raises:
+        ValueError: If the name is not a known EXIF tag.
+    """
+    tag = ALIASES.get(name.lower())
+    if tag is not None:
+        column, kind = COLUMNS[tag]
+        return tag, column, kind
+
+    if name not in GPS_LABELS:
+        from photo_info.tags import TagSet
+
+        TagSet([name])
+    return name, f"json_extract(exif, '$.{name}')", "json"
+
+
+def _number(value: str) -> float:
+    # Fractions as written for exposure times, e.g. "1/250"
+    try:
+        return float(Fraction(value))
+    except (ValueError, ZeroDivisionError):
+        raise ValueError(f"Not a number: {value!r}") from None
+
+
+def _period(value: str) -> Tuple[str, str]:
+    """Parse a possibly partial date and time into the period it covers.
+
+    Returns:
+        (tuple) Start and end of the period, as stored in the manifest.
+    """
+    match = DATETIME_PATTERN.match(value)
+    if not match:
+        raise ValueError(f"Not a date: {value!r}, expected e.g. 2024, 2024-06 or 2024-06-01 12:30")
+    parts = [int(part) for part in match.groups() if part is not None]
+    try:
+        start = datetime.datetime(*parts, *[1] * max(0, 3 - len(parts)))
+        if len(parts) == 1:
+            end = start.replace(year=start.year + 1)
+        elif len(parts) == 2:
+            end = start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+        else:
+            unit = ("days", "hours", "minutes", "seconds")[len(parts) - 3]
+            end = start + datetime.timedelta(**{unit: 1})
+    except ValueError as e:
+        raise ValueError(f"Not a date: {value!r}, {e}") from None
+    return start.isoformat(" "), end.isoformat(" ")
+
+
+def parse_condition(text: str) -> Condition:
+    """Parse a condition such as "FNumber <= 2.8".
+
+    Args:
+        text (str): Tag, operator and value; quotes around the value are dropped.
+    Returns:
+        (Condition) The condition.
+    Raises:
+        ValueError: If the condition, tag or value is not valid.
+    """
+    match = CONDITION_PATTERN.match(text)
+    if not match or not match.group(3):
+        raise ValueError(f"Invalid condition {text!r}, expected TAG OPERATOR VALUE with one of {' '.join(OPERATORS)}")
+    name, operator, value = match.groups()
+    value = value.strip("'\"")
+    tag, column, kind = _column(name)
+
+    if operator == "~":
+        if kind not in ("str", "json"):
+            raise ValueError(f"{tag} is not text; use = < <= > >= or != instead of ~")
+        escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return Condition(tag, f"{column} LIKE ? ESCAPE '\\'", (f"%{escaped}%",))
+
+    if kind == "datetime":
+        start, end = _period(value)
+        sql = {
+            "=": f"{column} >= ? AND {column} < ?",
+            "!=": f"({column} < ? OR {column} >= ?)",
+            "<": f"{column} < ?",
+            "<=": f"{column} < ?",
+            ">": f"{column} >= ?",
+            ">=": f"{column} >= ?",
+        }[operator]
+        params = {"<": (start,), "<=": (end,), ">": (end,), ">=": (start,)}.get(operator, (start, end))
+        return Condition(tag, sql, params)
+
+    if kind in ("float", "int"):
+        return Condition(tag, f"{column} {operator} ?", (_number(value),))
+    if kind == "json":
+        # Recorded values are text; numbers compare as numbers
+        try:
+            return Condition(tag, f"CAST({column} AS REAL) {operator} ?", (_number(value),))
+        except ValueError:
+            pass
+    return Condition(tag, f"{column} {operator} ?", (value,))
+
+
+def parse_order(text: str) -> Order:
+    """Parse a sort order such as "DateTimeOriginal", or "-ISOSpeedRatings" for descending.
+
+    Raises:
+        ValueError: If the tag is not a known EXIF tag.
+    """
+    descending = text.startswith("-")
+    tag, column, _ = _column(text.lstrip("-+").strip())
+    return Order(tag, column, descending)
+
+
+def find(
+    manifest: "Manifest",
+    conditions: Sequence[Condition] = (),
+    order: Optional[Order] = None,
+    limit: Optional[int] = None,
+) -> List[Result]:
+    """Find the images matching every condition.
+
+    Args:
+        manifest (Manifest): Manifest of processed images.
+        conditions (Sequence[Condition]): Conditions the images must all meet.
+        order (Order): Sort order. Images without the tag sorted on are left
+            out. Defaults to the order of paths.
+        limit (int): Maximum number of images to return.
+    Returns:
+        (List[Result]) The images with their recorded EXIF data.
+    """
+    clauses = [condition.sql for condition in conditions]
+    params = [param for condition in conditions for param in condition.params]
+    if order is not None:
+        clauses.append(f"{order.sql} IS NOT NULL")
+        direction = " DESC" if order.descending else ""
+        order_by = f"{order.sql}{direction}, path{direction}"
+    else:
+        order_by = "path"
+
+    query = "SELECT path, exif FROM images"
+    if clauses:
+        query += " WHERE " + " AND ".join(f"({clause})" for clause in clauses)
+    query += f" ORDER BY {order_by}"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    with manifest.lock:
+        rows = manifest.conn.execute(query, params).fetchall()
+    return [Result(path, json.loads(exif)) for path, exif in rows]
@@ -0,0 +1,217 @@
+"""Batch EXIF extraction for library use of the Photo Info application.
+
+`extract_many` reads the EXIF data of many images into compact `ExifRecord`s
+rather than the per-file dicts of `get_exif_data` and `get_labeled_exif`.
+Records hold the default tags as plain Python values, see `fields.FIELDS`.
+They use `__slots__`, so millions of them fit in memory.
+
+`to_numpy` and `to_arrow` turn records into columns, so statistics over a
+whole archive need no per-row Python code. NumPy and pyarrow are optional and
+only imported by the functions that need them.
+"""
+
+# photo_info/records.py
+
+import math
+from importlib import import_module
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from photo_info.fields import FIELDS, NORMALIZERS
+from photo_info.photo_info import get_exif_data, ordered_map
+from photo_info.tags import TagSet
+
+# Columns of exported records, in order, with their kind of value
+COLUMNS: Tuple[Tuple[str, str], ...] = (("path", "str"),) + tuple(
+    (name, kind) for name, _, kind in FIELDS
+) + (("error", "str"),)
+
+RECORD_TAGS = TagSet([tag for _, tag, _ in FIELDS])
+
+
+class ExifRecord:
+    """The EXIF data of one image, with normalized values.
+
+    Every field is None when the image does not have the tag, or the value
+    could not be normalized. `datetime_original` is a naive datetime, since
+    EXIF does not record the camera's time zone; `exposure_time` is in
+    seconds and `focal_length` in millimetres.
+
+    Args:
+        path (str): Path of the image.
+        error (str): Why the image could not be read, if it could not.
+        **values: Initial field values, by attribute name.
+    """
+
+    __slots__ = ("path", "error") + tuple(name for name, _, _ in FIELDS)
+
+    def __init__(self, path: str, error: Optional[str] = None, **values):
+        self.path = path
+        self.error = error
+        for name, _, _ in FIELDS:
+            setattr(self, name, values.pop(name, None))
+        if values:
+            raise TypeError(f"Unknown fields: {', '.join(values)}")
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ExifRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        values = (f"{name}={getattr(self, name)!r}" for name in self.__slots__ if getattr(self, name) is not None)
+        return f"ExifRecord({', '.join(values)})"
+
+    def as_dict(self) -> dict:
+        """Return the record as a dict, in column order."""
+        return {name: getattr(self, name) for name, _ in COLUMNS}
+
+
+# Attribute, tag ID and normalizer of each field
+_EXTRACTORS = tuple(
+    (name, tag_id, NORMALIZERS[kind])
+    for (name, _, kind), (tag_id, _) in zip(FIELDS, RECORD_TAGS.labels)
+)
+
+
+def make_record(path: str, exif_data: Optional[dict]) -> ExifRecord:
+    """Build a record from raw EXIF data, as returned by `get_exif_data`.
+
+    Args:
+        path (str): Path of the image.
+        exif_data (dict): EXIF tag IDs mapped to their values, or None.
+    Returns:
+        (ExifRecord) The normalized record.
+    """
+    record = ExifRecord(path)
+    if exif_data:
+        for name, tag_id, normalize in _EXTRACTORS:
+            value = exif_data.get(tag_id)
+            if value is not None:
+                setattr(record, name, normalize(value))
+    return record
+
+
+def _extract_safely(args: tuple) -> ExifRecord:
+    """Extract the record of one image, capturing any error on the record.
+
+    Defined at module level so it can be pickled by a process pool.
+    """
+    path, engine, verify = args
+    try:
+        return make_record(path, get_exif_data(path, engine=engine, verify=verify, tags=RECORD_TAGS))
+    except Exception as e:
+        return ExifRecord(path, error=f"{type(e).__name__}: {e}")
+
+
+def extract_many(
+    paths: Iterable[str],
+    jobs: Optional[int] = None,
+    executor: str = "thread",
+    engine: str = "fast",
+    verify: bool = True,
+) -> Iterator[ExifRecord]:
+    """Extract the EXIF data of many images.
+
+    Paths are consumed lazily and records are yielded in the same order. An
+    image that cannot be read does not stop the iteration; its record has
+    `error` set and no values.
+
+    Args:
+        paths (Iterable[str]): Paths of the images.
+        jobs (int): Number of workers. Defaults to the number of CPUs.
+        executor (str): Either "thread" or "process".
+        engine (str): EXIF extraction engine, see `get_exif_data`.
+        verify (bool): Whether Pillow should verify files it falls back to.
+    Returns:
+        (Iterator[ExifRecord]) One record per image.
+    """
+    work = ((str(path), engine, verify) for path in paths)
+    return ordered_map(_extract_safely, work, jobs=jobs, executor=executor)
+
+
+def collect_columns(records: Iterable[ExifRecord]) -> Dict[str, List]:
+    """Gather records into one list of values per column, see COLUMNS."""
+    columns: Dict[str, List] = {name: [] for name, _ in COLUMNS}
+    appenders = [(name, columns[name].append) for name, _ in COLUMNS]
+    for record in records:
+        for name, append in appenders:
+            append(getattr(record, name))
+    return columns
+
+
+def _optional(module: str, feature: str, package: str):
+    """Import an optional dependency, explaining how to install it if it is missing."""
+    try:
+        return import_module(module)
+    except ImportError:
+        raise ImportError(f"{feature} needs {package}; install it with `pip install {package}`") from None
+
+
+def to_numpy(records: Iterable[ExifRecord]):
+    """Export records as a NumPy structured array.
+
+    Strings become fixed-width unicode fields as wide as the longest value,
+    with "" for missing values. Floats are NaN and `iso` is 0 when missing;
+    `datetime_original` is a `datetime64[s]` field with NaT when missing.
+
+    Args:
+        records (Iterable[ExifRecord]): Records, e.g. from `extract_many`.
+    Returns:
+        (numpy.ndarray) One row per record, one field per column.
+    Raises:
+        ImportError: If NumPy is not installed.
+    """
+    numpy = _optional("numpy", "NumPy export", "numpy")
+    columns = collect_columns(records)
+
+    arrays = []
+    for name, kind in COLUMNS:
+        values = columns[name]
+        if kind == "str":
+            width = max((len(value) for value in values if value), default=1)
+            array = numpy.array([value or "" for value in values], dtype=f"U{width}")
+        elif kind == "float":
+            array = numpy.array([math.nan if value is None else value for value in values], dtype="f8")
+        elif kind == "int":
+            array = numpy.array([value or 0 for value in values], dtype="i8")
+        else:
+            array = numpy.array(values, dtype="datetime64[s]")
+        arrays.append((name, array))
+
+    table = numpy.empty(len(columns["path"]), dtype=[(name, array.dtype) for name, array in arrays])
+    for name, array in arrays:
+        table[name] = array
+    return table
+
+
+def to_arrow(records: Iterable[ExifRecord]):
+    """Export records as an Arrow table, with nulls for missing values.
+
+    Args:
+        records (Iterable[ExifRecord]): Records, e.g. from `extract_many`.
+    Returns:
+        (pyarrow.Table) One row per record, one column per field.
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    pa = _optional("pyarrow", "Arrow export", "pyarrow")
+    types = {"str": pa.string(), "float": pa.float64(), "int": pa.int64(), "datetime": pa.timestamp("s")}
+    columns = collect_columns(records)
+    return pa.table({name: pa.array(columns[name], type=types[kind]) for name, kind in COLUMNS})
+
+
+def write_parquet(records: Iterable[ExifRecord], path: str) -> int:
+    """Write records to a Parquet file.
+
+    Args:
+        records (Iterable[ExifRecord]): Records, e.g. from `extract_many`.
+        path (str): Path of the Parquet file.
+    Returns:
+        (int) The number of records written.
+    Raises:
+        ImportError: If pyarrow is not installed.
+    """
+    table = to_arrow(records)
+    parquet = _optional("pyarrow.parquet", "Parquet export", "pyarrow")
+    parquet.write_table(table, path)
+    return table.num_rows
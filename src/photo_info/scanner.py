@@ -0,0 +1,251 @@
+"""Directory scanning for the Photo Info application.
+
+Walks the image directory with `os.scandir`, yielding work items lazily so
+processing can start before the scan finishes. Markdown files mirror the
+subdirectory layout of the image directory.
+"""
+
+# photo_info/scanner.py
+
+import os
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from photo_info.exif_reader import RAW_EXTENSIONS
+from photo_info.manifest import Failure, Manifest
+
+if TYPE_CHECKING:
+    from photo_info.shard import Shard
+
+# Image extensions picked up by default, matched case-insensitively. When two
+# files in a directory share a name, the one whose extension comes first wins,
+# so RAW files are only processed when there is no JPEG alongside them.
+DEFAULT_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tif", ".tiff") + RAW_EXTENSIONS
+
+
+class WorkItem(NamedTuple):
+    """An image to process and where its markdown file goes."""
+
+    rel_path: str
+    image_file: str
+    markdown_file: str
+
+
+def markdown_path(md_dir: str, rel_path: str) -> str:
+    """Return the markdown file mirroring an image's place in the image tree.
+
+    Args:
+        md_dir (str): Path to the markdown directory.
+        rel_path (str): Image path relative to the image directory.
+    Returns:
+        (str) Path of the markdown file.
+    """
+    return os.path.join(md_dir, os.path.splitext(rel_path)[0] + ".md")
+
+
+def site_path(path: str, fallback: str) -> str:
+    """Return the path a file is served under by the site.
+
+    Files under a `public` directory are served from the part of their path
+    after it; other files use `fallback`.
+
+    Args:
+        path (str): Path of the file, using "/" separators.
+        fallback (str): Path to use when `path` is not under `public`.
+    Returns:
+        (str) The site path.
+    """
+    sections = path.split("/")
+    try:
+        return "/".join(sections[sections.index("public") + 1:])
+    except ValueError:
+        return fallback
+
+
+def work_item_for(
+    image_dir: str,
+    md_dir: str,
+    image_file: str,
+    extensions: Sequence[str] = DEFAULT_EXTENSIONS,
+) -> Optional[WorkItem]:
+    """Build the work item for a single file, applying the scanner's rules.
+
+    Args:
+        image_dir (str): Path to the directory containing images.
+        md_dir (str): Path to the markdown directory.
+        image_file (str): Path to a file inside `image_dir`.
+        extensions (Sequence[str]): Image extensions, in order of preference.
+    Returns:
+        (WorkItem) The work item, or None if the file is hidden, outside
+        `image_dir`, not an image, or shadowed by a file with the same name
+        and a preferred extension.
+    """
+    rel_path = os.path.relpath(image_file, image_dir).replace(os.sep, "/")
+    if rel_path.startswith("../") or any(part.startswith(".") for part in rel_path.split("/")):
+        return None
+
+    ranks = [extension.lower() for extension in extensions]
+    stem, extension = os.path.splitext(image_file)
+    if extension.lower() not in ranks:
+        return None
+    # Stat likely spellings of preferred siblings rather than listing what may
+    # be a very large directory on every event
+    for preferred in ranks[: ranks.index(extension.lower())]:
+        if any(os.path.exists(stem + variant) for variant in {preferred, preferred.upper()}):
+            return None
+
+    return WorkItem(rel_path, image_file, markdown_path(md_dir, rel_path))
+
+
+def iter_image_files(
+    image_dir: str,
+    extensions: Sequence[str] = DEFAULT_EXTENSIONS,
+    recursive: bool = True,
+    on_error: Optional[Callable[[str, OSError], None]] = None,
+) -> Iterator[Tuple[str, os.DirEntry]]:
+    """Walk the image directory, yielding image files as they are found.
+
+    Directories are visited depth-first and entries are sorted by name, so the
+    order is stable between runs. Hidden files and directories are skipped.
+
+    Args:
+        image_dir (str): Path to the directory containing images.
+        extensions (Sequence[str]): Image extensions, in order of preference.
+        recursive (bool): Whether to descend into subdirectories.
+        on_error (Callable): If given, subdirectories that cannot be listed
+            are passed to it with the error, relative to `image_dir` and
+            ending with "/", and skipped. Otherwise the error is raised.
+    Returns:
+        (Iterator) Pairs of the image path relative to `image_dir`, using "/"
+        separators, and its directory entry.
+    """
+    priority = {}
+    for index, extension in enumerate(extensions):
+        priority.setdefault(extension.lower(), index)
+
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            with os.scandir(os.path.join(image_dir, rel_dir)) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            if on_error is None or not rel_dir:
+                raise
+            on_error(rel_dir, e)
+            continue
+
+        subdirs = []
+        chosen: Dict[str, Tuple[int, os.DirEntry]] = {}
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            if entry.is_dir():
+                if recursive:
+                    subdirs.append(rel_dir + entry.name + "/")
+                continue
+            stem, extension = os.path.splitext(entry.name)
+            rank = priority.get(extension.lower())
+            if rank is None or not entry.is_file():
+                continue
+            # Files sharing a stem would share a markdown file; keep the preferred one
+            if stem not in chosen or rank < chosen[stem][0]:
+                chosen[stem] = (rank, entry)
+
+        for stem in sorted(chosen):
+            entry = chosen[stem][1]
+            yield rel_dir + entry.name, entry
+        stack.extend(reversed(subdirs))
+
+
+def scan_images(
+    image_dir: str,
+    md_dir: str,
+    manifest: Optional[Manifest] = None,
+    extensions: Sequence[str] = DEFAULT_EXTENSIONS,
+    recursive: bool = True,
+    shard: Optional["Shard"] = None,
+    retry_failed: bool = False,
+    on_skip: Optional[Callable[[WorkItem, Failure], None]] = None,
+    on_error: Optional[Callable[[str, OSError], None]] = None,
+) -> Iterator[WorkItem]:
+    """Lazily yield the images that need processing.
+
+    With a manifest, images are compared against what was recorded on previous
+    runs and recorded images that no longer exist are dropped from it once the
+    scan completes. Images quarantined after failing on a previous run are
+    skipped until they change. Without a manifest, an image needs processing
+    when its markdown file does not exist yet.
+
+    An image that cannot be checked, e.g. because it cannot be read, is
+    yielded so that processing reports its error, and a subdirectory that
+    cannot be listed is skipped; neither stops the scan.
+
+    Args:
+        image_dir (str): Path to the directory containing images.
+        md_dir (str): Path to the markdown directory.
+        manifest (Manifest): Optional manifest of previously processed images.
+        extensions (Sequence[str]): Image extensions, in order of preference.
+        recursive (bool): Whether to descend into subdirectories.
+        shard (Shard): If given, only images of this shard are considered.
+        retry_failed (bool): Process quarantined images even if unchanged.
+        on_skip (Callable): Called with each quarantined image that is skipped.
+        on_error (Callable): Called with each subdirectory that cannot be
+            listed and the error.
+    Returns:
+        (Iterator[WorkItem]) Images to process.
+    """
+    recorded = manifest.entries() if manifest is not None else None
+    failures = manifest.failures() if manifest is not None else None
+    md_names: Dict[str, Set[str]] = {}
+    unlisted: List[str] = []
+
+    def unreadable(rel_dir: str, error: OSError) -> None:
+        unlisted.append(rel_dir)
+        if on_error is not None:
+            on_error(rel_dir, error)
+
+    for rel_path, entry in iter_image_files(image_dir, extensions, recursive, on_error=unreadable):
+        if shard is not None and not shard.contains(rel_path):
+            continue
+        item = WorkItem(rel_path, entry.path, markdown_path(md_dir, rel_path))
+
+        if manifest is None:
+            rel_dir = os.path.dirname(rel_path)
+            if rel_dir not in md_names:
+                md_names[rel_dir] = _list_markdown(os.path.join(md_dir, rel_dir))
+            if os.path.basename(item.markdown_file) not in md_names[rel_dir]:
+                yield item
+            continue
+
+        previous = recorded.pop(rel_path, None)
+        failure = failures.pop(rel_path, None)
+        try:
+            st = entry.stat()
+            if failure is not None and not retry_failed and (st.st_size, st.st_mtime_ns) == failure[:2]:
+                if on_skip is not None:
+                    on_skip(item, failure)
+                continue
+            needed = manifest.needs_processing(rel_path, entry.path, st, previous)
+        except FileNotFoundError:
+            # Removed while scanning; the next scan forgets it
+            continue
+        except OSError:
+            needed = True
+        if needed:
+            yield item
+
+    if manifest is not None:
+        # Images in directories that could not be listed may still exist
+        prefixes = tuple(unlisted)
+        manifest.remove(path for path in recorded if not path.startswith(prefixes))
+        manifest.clear_failures(path for path in failures if not path.startswith(prefixes))
+        manifest.commit()
+
+
+def _list_markdown(directory: str) -> Set[str]:
+    """Return the names of the markdown files in a directory, if it exists."""
+    try:
+        with os.scandir(directory) as it:
+            return {entry.name for entry in it if entry.name.endswith(".md")}
+    except FileNotFoundError:
+        return set()
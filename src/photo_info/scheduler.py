@@ -0,0 +1,210 @@
+"""I/O scheduling for the Photo Info application.
+
+On spinning disks and network mounts, reading the headers of many images
+costs more in seeks and round trips than in bytes. The "locality" schedule
+(`[io] schedule = "locality"`) cuts both:
+
+    ordering   pending images are read in order of device and inode within
+               windows of scanned images, which on most file systems follows
+               their place on disk, rather than in name order
+    readahead  each image is opened with a hint that only its header will be
+               read, which is then read in one call of HEADER_BYTES, so the
+               kernel neither reads ahead into pixel data nor issues many small
+               reads over the network
+    slots      at most `reads_per_device` reads are in flight per device, so a
+               slow disk is not flooded with seeks by every worker at once
+               while other devices sit idle
+
+Hashing an image for the manifest reads it too, all of it with the default
+`performance.hash = "full"`. Those reads hold a slot of the device as well,
+with readahead hinted on for full hashes and off for sampled ones; use
+"sampled" to read little more than headers.
+
+Images whose EXIF data does not fit in the header, or that only Pillow can
+read, are read again in full under a slot as well. Decoding images to write
+derivatives is not limited: it is bound by the CPU rather than by reads.
+
+Time spent waiting for a slot is reported as the "wait" stage, header reads as
+the "read" stage and hashing as the "hash" stage, see metrics.py. Hints are
+skipped on platforms without `posix_fadvise`. Slots are per process, so with
+the "process" executor every worker has its own.
+"""
+
+# photo_info/scheduler.py
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from photo_info.exif_reader import HEADER_BYTES
+from photo_info.manifest import Fingerprint, hash_open_file
+from photo_info.metrics import timed
+from photo_info.scanner import WorkItem
+
+IO_SCHEDULES = ("off", "locality")
+
+# Scanned images reordered at a time; processing starts once the first window
+# is scanned
+DEFAULT_WINDOW = 1024
+
+# Reads in flight per device
+DEFAULT_READS_PER_DEVICE = 4
+
+
+class IOSettings(NamedTuple):
+    """Settings of the "locality" schedule."""
+
+    # Reads in flight per device; 0 for no limit
+    reads_per_device: int = DEFAULT_READS_PER_DEVICE
+    window: int = DEFAULT_WINDOW
+
+
+_slots: Dict[Tuple[int, int], threading.BoundedSemaphore] = {}
+_slots_lock = threading.Lock()
+
+
+def _device_slots(device: int, limit: int) -> threading.BoundedSemaphore:
+    """Return the semaphore bounding reads in flight on a device."""
+    with _slots_lock:
+        slots = _slots.get((device, limit))
+        if slots is None:
+            slots = _slots[(device, limit)] = threading.BoundedSemaphore(limit)
+        return slots
+
+
+def _advise_header(fd: int) -> None:
+    """Tell the kernel only the header of a file is about to be read."""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        # No readahead past what is read, and the header fetched in one request
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_RANDOM)
+        os.posix_fadvise(fd, 0, HEADER_BYTES + 1, os.POSIX_FADV_WILLNEED)
+    except OSError:
+        pass
+
+
+def _advise_hash(fd: int, hash_mode: str) -> None:
+    """Tell the kernel how a file is about to be read for hashing."""
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        # A full hash reads the whole file, so readahead helps; a sampled one
+        # reads a few blocks, so it would only fetch bytes that are not used
+        advice = os.POSIX_FADV_SEQUENTIAL if hash_mode == "full" else os.POSIX_FADV_RANDOM
+        os.posix_fadvise(fd, 0, 0, advice)
+    except OSError:
+        pass
+
+
+@contextmanager
+def _device_slot(st: os.stat_result, reads_per_device: int, timings: Optional[Dict[str, float]]) -> Iterator[None]:
+    """Hold one of the read slots of a file's device, timing the wait as the "wait" stage."""
+    if not reads_per_device:
+        yield
+        return
+    slots = _device_slots(st.st_dev, reads_per_device)
+    with timed(timings, "wait"):
+        slots.acquire()
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+@contextmanager
+def device_slot(
+    image_file: str, reads_per_device: int = DEFAULT_READS_PER_DEVICE, timings: Optional[Dict[str, float]] = None
+) -> Iterator[None]:
+    """Hold a read slot of an image's device while the block reads the image, e.g. through Pillow.
+
+    Args:
+        image_file (str): Path to the image file.
+        reads_per_device (int): Reads in flight per device; 0 for no limit.
+        timings (dict): If given, seconds spent waiting for a slot are added
+            to its "wait" stage.
+    """
+    with _device_slot(os.stat(image_file), reads_per_device, timings):
+        yield
+
+
+def fingerprint(
+    image_file: str,
+    hash_mode: str,
+    reads_per_device: int = DEFAULT_READS_PER_DEVICE,
+    timings: Optional[Dict[str, float]] = None,
+) -> Fingerprint:
+    """Stat and hash an image like `manifest.fingerprint`, holding a slot of its device.
+
+    A full hash reads the whole file, so it is the larger part of the I/O of
+    an image; it is scheduled the same way as header reads.
+
+    Args:
+        image_file (str): Path to the image file.
+        hash_mode (str): Either "full" or "sampled", see `manifest.HASH_MODES`.
+        reads_per_device (int): Reads in flight per device; 0 for no limit.
+        timings (dict): If given, seconds spent waiting for a slot and hashing
+            are added to its "wait" and "hash" stages.
+    Returns:
+        (Fingerprint) Size, mtime and content hash of the file.
+    """
+    with open(image_file, "rb") as f:
+        st = os.fstat(f.fileno())
+        with _device_slot(st, reads_per_device, timings), timed(timings, "hash"):
+            _advise_hash(f.fileno(), hash_mode)
+            digest = hash_open_file(f, hash_mode)
+    return Fingerprint(st.st_size, st.st_mtime_ns, digest)
+
+
+def read_header(
+    image_file: str, reads_per_device: int = DEFAULT_READS_PER_DEVICE, timings: Optional[Dict[str, float]] = None
+) -> Tuple[bytes, bool]:
+    """Read the leading HEADER_BYTES of an image, holding a slot of its device.
+
+    Args:
+        image_file (str): Path to the image file.
+        reads_per_device (int): Reads in flight per device; 0 for no limit.
+        timings (dict): If given, seconds spent waiting for a slot and reading
+            are added to its "wait" and "read" stages.
+    Returns:
+        (tuple) The header bytes, and whether they are the whole file.
+    """
+    with open(image_file, "rb") as f:
+        with _device_slot(os.fstat(f.fileno()), reads_per_device, timings), timed(timings, "read"):
+            _advise_header(f.fileno())
+            header = f.read(HEADER_BYTES + 1)
+    return header[:HEADER_BYTES], len(header) <= HEADER_BYTES
+
+
+def _by_inode(items: List[WorkItem]) -> List[WorkItem]:
+    """Sort work items by device and inode; files that cannot be stat'ed go last."""
+    keys = []
+    for item in items:
+        try:
+            st = os.stat(item.image_file)
+            keys.append((st.st_dev, st.st_ino))
+        except OSError:
+            # Processing reports the error
+            keys.append((float("inf"), 0))
+    return [item for _, item in sorted(zip(keys, items), key=lambda pair: pair[0])]
+
+
+def locality_order(items: Iterable[WorkItem], window: int = DEFAULT_WINDOW) -> Iterator[WorkItem]:
+    """Reorder work items by their place on disk, a window at a time.
+
+    Args:
+        items (Iterable[WorkItem]): Images to process, e.g. from `scan_images`.
+        window (int): Number of images reordered at a time. Larger windows
+            save more seeks but delay the start of processing.
+    Returns:
+        (Iterator[WorkItem]) The same images, ordered by device and inode
+        within each window.
+    """
+    batch: List[WorkItem] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= window:
+            yield from _by_inode(batch)
+            batch = []
+    yield from _by_inode(batch)
@@ -0,0 +1,163 @@
+"""Sharded processing for the Photo Info application.
+
+A large image tree can be split across machines sharing a filesystem by
+running `photo-info process --shard I/N` on each of them. Images are assigned
+to shards by a stable hash of their path relative to the image directory, so
+the shards never overlap and no coordinator is needed. Each shard writes its
+own markdown files and keeps its own manifest next to the main one; `merge`
+then combines the shard manifests into the main manifest.
+"""
+
+# photo_info/shard.py
+
+import hashlib
+import re
+from pathlib import Path
+from typing import List, NamedTuple, Set, Tuple
+
+from photo_info.manifest import Manifest
+
+SHARD_MANIFEST_PATTERN = re.compile(r"^\.photo_info\.shard-(\d+)-of-(\d+)\.db$")
+
+# Manifest tables keyed by image path, merged shard by shard
+MERGED_TABLES = ("images", "failures", "image_hashes")
+
+
+def shard_of(rel_path: str, count: int) -> int:
+    """Return the shard, from 1 to `count`, an image belongs to.
+
+    Args:
+        rel_path (str): Image path relative to the image directory.
+        count (int): Number of shards.
+    Returns:
+        (int) The shard number.
+    """
+    digest = hashlib.blake2b(rel_path.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % count + 1
+
+
+class Shard(NamedTuple):
+    """One of `count` shards, numbered from 1."""
+
+    index: int
+    count: int
+
+    @classmethod
+    def parse(cls, spec: str) -> "Shard":
+        """Parse a shard given as "I/N".
+
+        Raises:
+            ValueError: If the spec is malformed or I is not between 1 and N.
+        """
+        match = re.fullmatch(r"\s*(\d+)\s*/\s*(\d+)\s*", spec)
+        if not match:
+            raise ValueError(f"Shard must be given as I/N, got {spec!r}")
+        index, count = int(match.group(1)), int(match.group(2))
+        if not 1 <= index <= count:
+            raise ValueError(f"Shard index must be between 1 and {count}, got {index}")
+        return cls(index, count)
+
+    def __str__(self) -> str:
+        return f"{self.index}/{self.count}"
+
+    def contains(self, rel_path: str) -> bool:
+        return shard_of(rel_path, self.count) == self.index
+
+    @property
+    def manifest_name(self) -> str:
+        return f".photo_info.shard-{self.index}-of-{self.count}.db"
+
+
+def find_shard_manifests(md_dir: Path) -> List[Tuple[Shard, Path]]:
+    """Find the shard manifests in a markdown directory, ordered by shard."""
+    found = []
+    for path in Path(md_dir).iterdir():
+        match = SHARD_MANIFEST_PATTERN.match(path.name)
+        if match:
+            found.append((Shard(int(match.group(1)), int(match.group(2))), path))
+    return sorted(found)
+
+
+class MergeResult(NamedTuple):
+    """What `merge_shards` combined."""
+
+    shards: List[Shard]
+    missing: List[int]
+    images: int
+
+
+def merge_shards(manifest: Manifest, md_dir: Path, partial: bool = False) -> MergeResult:
+    """Combine the shard manifests of a markdown directory into its main manifest.
+
+    The main manifest's records of every merged shard are replaced by the
+    shard's own records, so images a shard dropped are dropped from the main
+    manifest too, while records of shards that were not merged are kept.
+    Quarantined images and the image hashes indexed by `dedupe` are merged
+    the same way.
+
+    Args:
+        manifest (Manifest): The main manifest.
+        md_dir (Path): Markdown directory holding the shard manifests.
+        partial (bool): Merge even if some shards have no manifest yet.
+    Returns:
+        (MergeResult) The merged shards, missing shard numbers and number of
+        images in the main manifest afterwards.
+    Raises:
+        ValueError: If there are no shard manifests, they were written with
+            different shard counts, or shards are missing and `partial` is False.
+    """
+    found = find_shard_manifests(md_dir)
+    if not found:
+        raise ValueError(f"No shard manifests found in {md_dir}")
+    counts = sorted({shard.count for shard, _ in found})
+    if len(counts) > 1:
+        raise ValueError(
+            f"Shard manifests were written with different shard counts ({', '.join(map(str, counts))}); "
+            "remove the stale ones"
+        )
+    count = counts[0]
+    merged = {shard.index for shard, _ in found}
+    missing = [index for index in range(1, count + 1) if index not in merged]
+    if missing and not partial:
+        raise ValueError(f"Missing manifests of shards {', '.join(map(str, missing))} of {count}")
+
+    from photo_info.dedupe import HashIndex
+
+    HashIndex(manifest)  # make sure the hash table exists
+    with manifest.lock:
+        conn = manifest.conn
+        try:
+            _replace_shard_records(conn, found, count, merged)
+        except BaseException:
+            # Everything happens in one transaction, so a failed merge changes nothing
+            conn.rollback()
+            raise
+        conn.commit()
+        images = conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+    return MergeResult([shard for shard, _ in found], missing, images)
+
+
+def _replace_shard_records(conn, found: List[Tuple[Shard, Path]], count: int, merged: Set[int]) -> None:
+    """Replace the main manifest's records of the merged shards with the shards' own."""
+    import sqlite3
+
+    for table in MERGED_TABLES:
+        stale = [
+            (path,) for (path,) in conn.execute(f"SELECT path FROM {table}")
+            if shard_of(path, count) in merged
+        ]
+        conn.executemany(f"DELETE FROM {table} WHERE path = ?", stale)
+
+    for _, path in found:
+        shard_conn = sqlite3.connect(str(path))
+        try:
+            tables = {name for (name,) in shard_conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for table in MERGED_TABLES:
+                if table in tables:
+                    rows = shard_conn.execute(f"SELECT * FROM {table}")
+                    # By name, since a shard may predate columns added to the table
+                    columns = ", ".join(column[0] for column in rows.description)
+                    placeholders = ", ".join("?" * len(rows.description))
+                    conn.executemany(f"INSERT OR REPLACE INTO {table} ({columns}) VALUES ({placeholders})", rows)
+        finally:
+            shard_conn.close()
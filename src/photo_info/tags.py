@@ -0,0 +1,123 @@
+"""EXIF tag selection for the Photo Info application.
+
+The tags written to the front-matter are configured by name. They are compiled
+once into a `TagSet` holding the numeric tag IDs, which the extraction engines
+use to skip every other tag, and sub-IFD, without decoding it.
+"""
+
+# photo_info/tags.py
+
+from functools import lru_cache
+from typing import Dict, Mapping, Optional, Sequence
+
+from photo_info.exif_reader import GPS_IFD_POINTER
+from photo_info.geo import gps_labels
+
+# Tags extracted when the configuration does not say otherwise
+DEFAULT_TAGS = [
+    "Make",
+    "Model",
+    "DateTimeOriginal",
+    "FocalLength",
+    "FNumber",
+    "ExposureTime",
+    "ISOSpeedRatings",
+    "ExposureBiasValue",
+    "LensMake",
+    "LensModel",
+]
+
+
+@lru_cache(maxsize=None)
+def _tag_ids() -> Dict[str, int]:
+    """Map EXIF tag names to their IDs, keeping the lowest ID of duplicate names."""
+    from PIL.ExifTags import TAGS
+
+    ids: Dict[str, int] = {}
+    for tag_id in sorted(TAGS):
+        ids.setdefault(TAGS[tag_id], tag_id)
+    return ids
+
+
+class TagSet:
+    """A compiled selection of EXIF tags.
+
+    Args:
+        names (Sequence[str]): Tag names, in the order they are written.
+    Raises:
+        ValueError: If a name is not a known EXIF tag.
+    """
+
+    __slots__ = ("names", "ids", "labels")
+
+    def __init__(self, names: Sequence[str]):
+        known = _tag_ids()
+        unknown = [name for name in names if name not in known]
+        if unknown:
+            raise ValueError(f"Unknown EXIF tags: {', '.join(unknown)}")
+        self.names = tuple(dict.fromkeys(names))
+        self.labels = tuple((known[name], name) for name in self.names)
+        self.ids = frozenset(tag_id for tag_id, _ in self.labels)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, TagSet) and self.names == other.names
+
+    def __repr__(self) -> str:
+        return f"TagSet({list(self.names)!r})"
+
+    def label(self, exif_data: Mapping[int, object]) -> dict:
+        """Label the selected tags of raw EXIF data, in configured order.
+
+        The GPS IFD is labeled as decimal coordinates, see `geo.gps_labels`.
+        """
+        labeled = {}
+        for tag_id, name in self.labels:
+            if tag_id in exif_data:
+                if tag_id == GPS_IFD_POINTER:
+                    labeled.update(gps_labels(exif_data[tag_id]))
+                else:
+                    labeled[name] = exif_data[tag_id]
+        return labeled
+
+
+class TagRules:
+    """The tag set of each image, with overrides for parts of the image tree.
+
+    Args:
+        default (TagSet): Tags for images no override applies to.
+        overrides (dict): Directories relative to the image directory mapped
+            to the tag sets of the images inside them. The deepest matching
+            directory wins.
+    """
+
+    def __init__(self, default: TagSet, overrides: Optional[Mapping[str, TagSet]] = None):
+        self.default = default
+        self.overrides = {
+            directory.strip("/") + "/": tag_set for directory, tag_set in (overrides or {}).items()
+        }
+        self._order = sorted(self.overrides, key=len, reverse=True)
+
+    def for_path(self, rel_path: str) -> TagSet:
+        """Return the tag set of an image, given its path relative to the image directory."""
+        for directory in self._order:
+            if rel_path.startswith(directory):
+                return self.overrides[directory]
+        return self.default
+
+
+def compile_tags(
+    names: Optional[Sequence[str]] = None,
+    overrides: Optional[Mapping[str, Sequence[str]]] = None,
+) -> TagRules:
+    """Compile configured tag names into tag rules.
+
+    Args:
+        names (Sequence[str]): Default tag names. Defaults to DEFAULT_TAGS.
+        overrides (dict): Directories mapped to the tag names of their images.
+    Returns:
+        (TagRules) The compiled rules.
+    Raises:
+        ValueError: If a name is not a known EXIF tag.
+    """
+    default = TagSet(DEFAULT_TAGS if names is None else names)
+    return TagRules(default, {directory: TagSet(tags) for directory, tags in (overrides or {}).items()})
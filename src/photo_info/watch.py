@@ -0,0 +1,322 @@
+"""Filesystem watching for the Photo Info application.
+
+Turns filesystem events under the image directory into batches of work items.
+On Linux events come from inotify; elsewhere, or when inotify is unavailable,
+the directory is polled. Files are only handed out once they look completely
+written, and bursts of arrivals are grouped into one batch.
+"""
+
+# photo_info/watch.py
+
+import os
+import select
+import struct
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from photo_info.manifest import Manifest
+from photo_info.scanner import DEFAULT_EXTENSIONS, WorkItem, iter_image_files, work_item_for
+
+BACKENDS = ("auto", "inotify", "polling")
+
+# inotify event masks, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+INOTIFY_EVENT = struct.Struct("iIII")
+INOTIFY_READ_SIZE = 64 * 1024
+
+
+class Change:
+    """A file that changed, and whether it is known to be completely written."""
+
+    __slots__ = ("path", "complete")
+
+    def __init__(self, path: str, complete: bool):
+        self.path = path
+        self.complete = complete
+
+
+class Rescan(Exception):
+    """Raised by a watcher that lost events and needs a full rescan."""
+
+
+class InotifyWatcher:
+    """Watch a directory tree with Linux inotify.
+
+    Args:
+        image_dir (str): Directory to watch.
+        recursive (bool): Whether to watch subdirectories too.
+    """
+
+    def __init__(self, image_dir: str, recursive: bool = True):
+        import ctypes
+        import ctypes.util
+
+        self.ctypes = ctypes
+        libc_name = ctypes.util.find_library("c")
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self.libc, "inotify_init1"):
+            raise OSError("inotify is not available on this platform")
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.recursive = recursive
+        self.dirs: Dict[int, str] = {}
+        self._add_tree(image_dir)
+
+    def _add_watch(self, directory: str) -> None:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(self.ctypes.get_errno(), f"Cannot watch {directory}")
+        self.dirs[wd] = directory
+
+    def _add_tree(self, directory: str) -> List[Change]:
+        """Watch a directory and, if recursive, its subdirectories.
+
+        Returns:
+            (list) Files already inside the tree, e.g. after a directory was
+            moved in, reported as complete.
+        """
+        self._add_watch(directory)
+        changes = []
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.name.startswith("."):
+                    continue
+                if entry.is_dir() and self.recursive:
+                    changes.extend(self._add_tree(entry.path))
+                elif entry.is_file():
+                    changes.append(Change(entry.path, True))
+        return changes
+
+    def changes(self, timeout: Optional[float]) -> List[Change]:
+        """Wait up to `timeout` seconds for changes.
+
+        Raises:
+            Rescan: If the kernel event queue overflowed.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return []
+        try:
+            data = os.read(self.fd, INOTIFY_READ_SIZE)
+        except BlockingIOError:
+            return []
+
+        changes = []
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b"\x00")
+            offset += INOTIFY_EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                raise Rescan()
+            if wd not in self.dirs or not name:
+                continue
+            path = os.path.join(self.dirs[wd], os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if self.recursive and mask & (IN_CREATE | IN_MOVED_TO):
+                    try:
+                        changes.extend(self._add_tree(path))
+                    except FileNotFoundError:
+                        pass
+                continue
+            changes.append(Change(path, bool(mask & (IN_CLOSE_WRITE | IN_MOVED_TO))))
+        return changes
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Watch a directory tree by periodically comparing file stats.
+
+    Args:
+        image_dir (str): Directory to watch.
+        extensions (Sequence[str]): Image extensions to look at.
+        recursive (bool): Whether to watch subdirectories too.
+        interval (float): Seconds between polls.
+    """
+
+    def __init__(
+        self,
+        image_dir: str,
+        extensions: Sequence[str] = DEFAULT_EXTENSIONS,
+        recursive: bool = True,
+        interval: float = 1.0,
+    ):
+        self.image_dir = image_dir
+        self.extensions = extensions
+        self.recursive = recursive
+        self.interval = interval
+        self.snapshot = self._snapshot()
+        self.next_poll = time.monotonic() + interval
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for _, entry in iter_image_files(self.image_dir, self.extensions, self.recursive):
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[entry.path] = (st.st_size, st.st_mtime_ns)
+        return snapshot
+
+    def changes(self, timeout: Optional[float]) -> List[Change]:
+        """Wait up to `timeout` seconds, polling when the interval elapses."""
+        wait = self.next_poll - time.monotonic()
+        if timeout is not None and timeout < wait:
+            time.sleep(max(timeout, 0))
+            return []
+        time.sleep(max(wait, 0))
+        self.next_poll = time.monotonic() + self.interval
+
+        snapshot = self._snapshot()
+        changed = [
+            Change(path, False)
+            for path, stat in snapshot.items()
+            if self.snapshot.get(path) != stat
+        ]
+        self.snapshot = snapshot
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+def create_watcher(
+    image_dir: str,
+    backend: str = "auto",
+    extensions: Sequence[str] = DEFAULT_EXTENSIONS,
+    recursive: bool = True,
+    poll_interval: float = 1.0,
+):
+    """Create a watcher for the image directory.
+
+    Args:
+        image_dir (str): Directory to watch.
+        backend (str): "inotify", "polling", or "auto" to use inotify when
+            available and fall back to polling otherwise.
+        extensions (Sequence[str]): Image extensions, used when polling.
+        recursive (bool): Whether to watch subdirectories too.
+        poll_interval (float): Seconds between polls.
+    Returns:
+        (InotifyWatcher | PollingWatcher) The watcher.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown watch backend {backend!r}, expected one of {BACKENDS}")
+    if backend in ("auto", "inotify"):
+        try:
+            return InotifyWatcher(image_dir, recursive)
+        except (OSError, AttributeError):
+            if backend == "inotify":
+                raise
+    return PollingWatcher(image_dir, extensions, recursive, poll_interval)
+
+
+class Debouncer:
+    """Hold back changed files until they have settled.
+
+    Files known to be complete (closed after writing, or renamed into place)
+    are released after `batch_window` seconds so bursts arrive together.
+    Other changes are released once the file has been quiet for `settle`
+    seconds, so partially written files are not read.
+
+    Args:
+        settle (float): Quiet period for files that may still be written.
+        batch_window (float): Delay used to group complete files into batches.
+    """
+
+    def __init__(self, settle: float = 0.5, batch_window: float = 0.1):
+        self.settle = settle
+        self.batch_window = batch_window
+        self.pending: Dict[str, float] = {}
+
+    def add(self, change: Change, now: float) -> None:
+        delay = self.batch_window if change.complete else self.settle
+        self.pending[change.path] = now + delay
+
+    def timeout(self, now: float) -> Optional[float]:
+        """Seconds until the next file is due, or None if nothing is pending."""
+        if not self.pending:
+            return None
+        return max(min(self.pending.values()) - now, 0)
+
+    def pop_ready(self, now: float) -> List[str]:
+        """Remove and return the files that have settled, in sorted order."""
+        ready = sorted(path for path, due in self.pending.items() if due <= now)
+        for path in ready:
+            del self.pending[path]
+        return ready
+
+
+def watch_batches(
+    image_dir: str,
+    md_dir: str,
+    manifest: Manifest,
+    extensions: Sequence[str] = DEFAULT_EXTENSIONS,
+    recursive: bool = True,
+    backend: str = "auto",
+    settle: float = 0.5,
+    batch_window: float = 0.1,
+    poll_interval: float = 1.0,
+    stop: Optional[threading.Event] = None,
+) -> Iterator[List[WorkItem]]:
+    """Yield batches of new or modified images as they appear.
+
+    Images the manifest says are unchanged are dropped, so touching a file or
+    rewriting it with the same contents does not reprocess it. If the watcher
+    loses events, the whole image directory is rescanned.
+
+    Args:
+        image_dir (str): Path to the directory containing images.
+        md_dir (str): Path to the markdown directory.
+        manifest (Manifest): Manifest of processed images.
+        extensions (Sequence[str]): Image extensions, in order of preference.
+        recursive (bool): Whether to watch subdirectories too.
+        backend (str): Watch backend, see `create_watcher`.
+        settle (float): Quiet period before a possibly incomplete file is read.
+        batch_window (float): Delay used to group arrivals into batches.
+        poll_interval (float): Seconds between polls for the polling backend.
+        stop (threading.Event): Set to stop watching.
+    Returns:
+        (Iterator[List[WorkItem]]) Batches of images to process.
+    """
+    stop = stop or threading.Event()
+    watcher = create_watcher(image_dir, backend, extensions, recursive, poll_interval)
+    debouncer = Debouncer(settle, batch_window)
+    try:
+        while not stop.is_set():
+            now = time.monotonic()
+            timeout = debouncer.timeout(now)
+            # Wake up regularly so a stop request is noticed
+            timeout = 1.0 if timeout is None else min(timeout, 1.0)
+            try:
+                for change in watcher.changes(timeout):
+                    debouncer.add(change, time.monotonic())
+            except Rescan:
+                for _, entry in iter_image_files(image_dir, extensions, recursive):
+                    debouncer.add(Change(entry.path, False), time.monotonic())
+
+            batch = []
+            for path in debouncer.pop_ready(time.monotonic()):
+                item = work_item_for(image_dir, md_dir, path, extensions)
+                if item is None:
+                    continue
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if manifest.needs_processing(item.rel_path, path, st, manifest.get(item.rel_path)):
+                    batch.append(item)
+            if batch:
+                yield batch
+    finally:
+        watcher.close()
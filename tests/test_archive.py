@@ -0,0 +1,196 @@
+"""Tests for processing images straight from archives."""
+
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import unittest
+import zipfile
+from pathlib import Path
+from unittest.mock import patch
+
+from PIL import Image
+from typer.testing import CliRunner
+
+from photo_info.archive import is_archive, iter_members, process_archive
+from photo_info.cli import app
+from photo_info.manifest import Manifest
+from tests.test_exif_reader import make_exif
+
+
+def jpeg_bytes(size=(64, 48)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (90, 120, 30)).save(buffer, "JPEG", exif=make_exif())
+    return buffer.getvalue()
+
+
+def png_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8)).save(buffer, "PNG", exif=make_exif())
+    return buffer.getvalue()
+
+
+MEMBERS = {
+    "shoot/DSC_0001.jpg": jpeg_bytes(),
+    "shoot/DSC_0002.png": png_bytes(),
+    "shoot/.DS_Store/x.jpg": b"",
+    "shoot/notes.txt": b"hello",
+}
+
+
+class TestArchive(unittest.TestCase):
+    """Test cases for the archive module."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.md_dir = self.temp_dir / "markdown"
+        self.md_dir.mkdir()
+        self.zip_path = self.temp_dir / "shoot.zip"
+        with zipfile.ZipFile(self.zip_path, "w") as zf:
+            for name, data in MEMBERS.items():
+                zf.writestr(name, data)
+        self.tar_path = self.temp_dir / "shoot.tar.gz"
+        with tarfile.open(self.tar_path, "w:gz") as tar:
+            for name, data in MEMBERS.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = 1_600_000_000
+                tar.addfile(info, io.BytesIO(data))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_is_archive(self):
+        self.assertTrue(is_archive(self.zip_path))
+        self.assertTrue(is_archive(self.tar_path))
+        self.assertFalse(is_archive(self.md_dir))
+
+    def test_iter_members(self):
+        """Only images are listed, skipping hidden paths."""
+        for path in (self.zip_path, self.tar_path):
+            names = [member.rel_path for member, _ in iter_members(str(path), [".jpg", ".png"])]
+            self.assertEqual(names, ["shoot/DSC_0001.jpg", "shoot/DSC_0002.png"])
+
+    @unittest.skipUnless(hasattr(time, "tzset"), "time.tzset is not available")
+    def test_zip_mtime_ignores_time_zone(self):
+        """Zip member times are read the same in every time zone."""
+        with zipfile.ZipFile(self.zip_path, "w") as zf:
+            zf.writestr(zipfile.ZipInfo("DSC_0001.jpg", date_time=(2024, 7, 1, 12, 0, 0)), MEMBERS["shoot/DSC_0001.jpg"])
+        mtimes = set()
+        for tz in ("UTC", "America/Los_Angeles", "Asia/Tokyo"):
+            with patch.dict(os.environ, {"TZ": tz}):
+                time.tzset()
+                mtimes.update(member.mtime_ns for member, _ in iter_members(str(self.zip_path), [".jpg"]))
+        time.tzset()
+        self.assertEqual(mtimes, {1_719_835_200 * 1_000_000_000})
+
+    def test_process_archive(self):
+        """Markdown is written for every image, with src pointing at the member."""
+        for path in (self.zip_path, self.tar_path):
+            results = list(process_archive(str(path), str(self.md_dir) + "/"))
+            self.assertEqual([r.error for r in results], [None, None])
+            self.assertEqual(results[0].labeled_exif["Model"], "NIKON D750")
+            self.assertEqual(results[1].labeled_exif["Make"], "NIKON CORPORATION")
+
+            content = (self.md_dir / "shoot" / "DSC_0001.md").read_text()
+            self.assertIn("src: shoot/DSC_0001.jpg\n", content)
+            self.assertIn("  LensModel: 24-70mm f/2.8\n", content)
+
+    def test_reads_only_jpeg_headers(self):
+        """The rest of a JPEG member is not read once its EXIF data is found."""
+        data = jpeg_bytes((2000, 1500))
+        with zipfile.ZipFile(self.zip_path, "w") as zf:
+            zf.writestr("big.jpg", data)
+
+        with patch("photo_info.archive.HEADER_BYTES", 16 * 1024):
+            with patch("photo_info.photo_info.get_exif_data") as mock_get_exif:
+                results = list(process_archive(str(self.zip_path), str(self.md_dir) + "/"))
+        mock_get_exif.assert_not_called()
+        self.assertGreater(len(data), 16 * 1024)
+        self.assertEqual(results[0].labeled_exif["Make"], "NIKON CORPORATION")
+
+    def test_manifest(self):
+        """Unchanged members are skipped and removed members forgotten."""
+        md_dir = str(self.md_dir) + "/"
+
+        def run(manifest):
+            results = list(process_archive(str(self.tar_path), md_dir, manifest))
+            for result in results:
+                manifest.record(result.item.rel_path, result.fingerprint, result.labeled_exif)
+            return [result.item.rel_path for result in results]
+
+        with Manifest(self.md_dir) as manifest:
+            self.assertEqual(len(run(manifest)), 2)
+            self.assertEqual(run(manifest), [])
+
+            with tarfile.open(self.tar_path, "w:gz") as tar:
+                info = tarfile.TarInfo("shoot/DSC_0001.jpg")
+                info.size = len(MEMBERS["shoot/DSC_0001.jpg"])
+                tar.addfile(info, io.BytesIO(MEMBERS["shoot/DSC_0001.jpg"]))
+            self.assertEqual(run(manifest), ["shoot/DSC_0001.jpg"])
+            self.assertEqual(list(manifest.entries()), ["shoot/DSC_0001.jpg"])
+
+    def test_preferred_extension(self):
+        """A member with a preferred extension replaces one stored before it."""
+        pair = {"shoot/DSC_0003.png": png_bytes(), "shoot/DSC_0003.jpg": jpeg_bytes()}
+        with zipfile.ZipFile(self.zip_path, "w") as zf:
+            for name, data in pair.items():
+                zf.writestr(name, data)
+        with tarfile.open(self.tar_path, "w:gz") as tar:
+            for name, data in pair.items():
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+
+        for path, processed in ((self.zip_path, ["shoot/DSC_0003.jpg"]),
+                                (self.tar_path, ["shoot/DSC_0003.png", "shoot/DSC_0003.jpg"])):
+            with Manifest(self.md_dir, name=f"{path.name}.db") as manifest:
+                results = process_archive(str(path), str(self.md_dir) + "/", manifest, extensions=[".jpg", ".png"])
+                rel_paths = []
+                for result in results:
+                    manifest.record(result.item.rel_path, result.fingerprint, result.labeled_exif)
+                    rel_paths.append(result.item.rel_path)
+                self.assertEqual(rel_paths, processed)
+                self.assertEqual(list(manifest.entries()), ["shoot/DSC_0003.jpg"])
+                content = (self.md_dir / "shoot" / "DSC_0003.md").read_text()
+                self.assertIn("src: shoot/DSC_0003.jpg\n", content)
+
+    def test_preferred_extension_on_rerun(self):
+        """A tar member superseded on one run does not replace the preferred one on the next."""
+        raw_exif = make_exif()
+        raw_exif[272] = "RAWCAM"
+        raw = io.BytesIO()
+        Image.new("RGB", (8, 8)).save(raw, "PNG", exif=raw_exif)
+        jpg_exif = make_exif()
+        jpg_exif[272] = "JPGCAM"
+        jpg = io.BytesIO()
+        Image.new("RGB", (8, 8)).save(jpg, "JPEG", exif=jpg_exif)
+        with tarfile.open(self.tar_path, "w:gz") as tar:
+            for name, data in (("DSC.png", raw.getvalue()), ("DSC.jpg", jpg.getvalue())):
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = 1_600_000_000
+                tar.addfile(info, io.BytesIO(data))
+
+        with Manifest(self.md_dir) as manifest:
+            for _ in range(2):
+                for result in process_archive(str(self.tar_path), str(self.md_dir) + "/", manifest,
+                                              extensions=[".jpg", ".png"]):
+                    manifest.record(result.item.rel_path, result.fingerprint, result.labeled_exif)
+                content = (self.md_dir / "DSC.md").read_text()
+                self.assertIn("src: DSC.jpg\n", content)
+                self.assertIn("Model: JPGCAM\n", content)
+                self.assertEqual(list(manifest.entries()), ["DSC.jpg"])
+
+    def test_process_command(self):
+        """The process command accepts an archive in place of the image directory."""
+        result = CliRunner().invoke(app, ["process", str(self.zip_path), str(self.md_dir)])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("processed 2 new or changed", result.output)
+        self.assertTrue((self.md_dir / "shoot" / "DSC_0002.md").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+"""Tests for the benchmark corpus generator."""
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from benchmarks import corpus
+from photo_info.photo_info import get_exif_data, get_labeled_exif
+
+
+class TestCorpus(unittest.TestCase):
+    """Test cases for the synthetic corpus."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_generate_is_reproducible(self):
+        """Test that the same seed produces identical files."""
+        first = corpus.generate(self.temp_dir / "a", 4, profiles=["nikon", "nikon-raw"], subdirs=2)
+        second = corpus.generate(self.temp_dir / "b", 4, profiles=["nikon", "nikon-raw"], subdirs=2)
+        self.assertEqual(
+            [path.relative_to(self.temp_dir / "a") for path in first],
+            [path.relative_to(self.temp_dir / "b") for path in second],
+        )
+        for a, b in zip(first, second):
+            self.assertEqual(a.read_bytes(), b.read_bytes())
+
+    def test_generated_exif(self):
+        """Test that every profile produces parseable EXIF data."""
+        paths = corpus.generate(self.temp_dir, len(corpus.PROFILES), profiles=sorted(corpus.PROFILES))
+        for path in paths:
+            labeled = get_labeled_exif(get_exif_data(str(path)))
+            self.assertIn(labeled["Make"], {profile.make for profile in corpus.PROFILES.values()})
+            self.assertIn("ISOSpeedRatings", labeled)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+"""Tests for the aggregated image catalog."""
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from PIL import Image
+from typer.testing import CliRunner
+
+from photo_info import catalog as catalog_module
+from photo_info.catalog import Catalog, read_catalog, sync_with_manifest
+from photo_info.cli import app
+from photo_info.manifest import Fingerprint, Manifest
+
+
+class TestCatalog(unittest.TestCase):
+    """Test cases for the catalog module."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.path = str(self.temp_dir / "catalog.ndjson")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def lines(self):
+        return Path(self.path).read_text().splitlines()
+
+    def test_changes_are_appended(self):
+        """Only new, changed and removed images add lines."""
+        with Catalog(self.path) as catalog:
+            catalog.update("a.jpg", "a.jpg", {"Make": "NIKON\x00"})
+            catalog.update("b.jpg", "b.jpg", {"Make": "Canon"})
+        self.assertEqual(len(self.lines()), 2)
+        self.assertEqual(self.lines()[0], '{"path":"a.jpg","src":"a.jpg","details":{"Make":"NIKON"}}')
+
+        with Catalog(self.path) as catalog:
+            self.assertFalse(catalog.update("a.jpg", "a.jpg", {"Make": "NIKON"}))
+            self.assertTrue(catalog.update("b.jpg", "b.jpg", {"Make": "Sony"}))
+            catalog.remove(["a.jpg", "missing.jpg"])
+        self.assertEqual(len(self.lines()), 4)
+        self.assertEqual(self.lines()[-1], '{"path":"a.jpg","removed":true}')
+
+        self.assertEqual(
+            read_catalog(self.path),
+            {"b.jpg": {"path": "b.jpg", "src": "b.jpg", "details": {"Make": "Sony"}}},
+        )
+
+    def test_compaction(self):
+        """The file is rewritten once most of its lines are superseded."""
+        with Catalog(self.path) as catalog:
+            for i in range(catalog_module.COMPACT_MIN_LINES):
+                catalog.update(f"{i}.jpg", f"{i}.jpg", {})
+        for _ in range(2):
+            with Catalog(self.path) as catalog:
+                catalog.retain({"0.jpg", "1.jpg"})
+                catalog.update("0.jpg", "0.jpg", {"Make": "NIKON"})
+
+        self.assertEqual(len(self.lines()), 2)
+        self.assertEqual(sorted(read_catalog(self.path)), ["0.jpg", "1.jpg"])
+
+    def test_truncates_partial_line(self):
+        """A line cut short by a crash is dropped before appending."""
+        with Catalog(self.path) as catalog:
+            catalog.update("a.jpg", "a.jpg", {})
+        with open(self.path, "a") as f:
+            f.write('{"path":"b.jpg","sr')
+
+        with Catalog(self.path) as catalog:
+            catalog.update("c.jpg", "c.jpg", {})
+        self.assertEqual(list(read_catalog(self.path)), ["a.jpg", "c.jpg"])
+
+    def test_sync_with_manifest(self):
+        """Images recorded in the manifest are added; forgotten ones removed."""
+        with Manifest(self.temp_dir) as manifest:
+            manifest.record("a.jpg", Fingerprint(1, 1, "x"), {"Make": "NIKON"})
+            with Catalog(self.path) as catalog:
+                catalog.update("gone.jpg", "gone.jpg", {})
+                sync_with_manifest(catalog, manifest, "/site/public/images/")
+
+        self.assertEqual(
+            read_catalog(self.path),
+            {"a.jpg": {"path": "a.jpg", "src": "images/a.jpg", "details": {"Make": "NIKON"}}},
+        )
+
+    def test_process_with_catalog(self):
+        """process --catalog keeps the catalog in step with the image directory."""
+        image_dir = self.temp_dir / "images"
+        md_dir = self.temp_dir / "markdown"
+        image_dir.mkdir()
+        md_dir.mkdir()
+        for name in ("DSC_0001", "DSC_0002"):
+            Image.new("RGB", (8, 8)).save(image_dir / f"{name}.jpg", "JPEG")
+        args = ["process", str(image_dir), str(md_dir), "--jobs", "1", "--catalog", self.path]
+        runner = CliRunner()
+
+        result = runner.invoke(app, args)
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(list(read_catalog(self.path)), ["DSC_0001.jpg", "DSC_0002.jpg"])
+
+        (image_dir / "DSC_0001.jpg").unlink()
+        runner.invoke(app, args)
+        runner.invoke(app, args)
+        self.assertEqual(list(read_catalog(self.path)), ["DSC_0002.jpg"])
+        self.assertEqual(len(self.lines()), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
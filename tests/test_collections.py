@@ -0,0 +1,151 @@
+"""Tests for processing several collections in one run."""
+
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from PIL import Image
+from typer.testing import CliRunner
+
+from photo_info import photo_info
+from photo_info.cli import app
+from photo_info.config import DEFAULT_CONFIG_NAME, Config
+from tests.test_exif_reader import make_exif
+
+CONFIG = """
+[performance]
+jobs = 2
+
+[tags]
+names = ["Make"]
+
+[[collections]]
+name = "small"
+images = "small/images"
+markdown = "small/markdown"
+
+[[collections]]
+images = "large/images"
+markdown = "large/markdown"
+tags = ["Model"]
+catalog = "large/catalog.ndjson"
+
+[[collections]]
+name = "medium"
+images = "medium/images"
+markdown = "medium/markdown"
+"""
+
+
+class TestCollections(unittest.TestCase):
+    """Test cases for [[collections]]."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.config_path = self.temp_dir / DEFAULT_CONFIG_NAME
+        self.config_path.write_text(CONFIG)
+        for name, count in (("small", 1), ("large", 3), ("medium", 2)):
+            (self.temp_dir / name / "markdown").mkdir(parents=True)
+            (self.temp_dir / name / "images").mkdir()
+            for i in range(count):
+                Image.new("RGB", (8, 8)).save(
+                    self.temp_dir / name / "images" / f"{name}_{i}.jpg", "JPEG", exif=make_exif()
+                )
+        self.runner = CliRunner()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def process(self, *args):
+        with patch("pathlib.Path.cwd", return_value=self.temp_dir):
+            return self.runner.invoke(app, ["process", *args])
+
+    def test_load_collections(self):
+        """Collections have their own paths and tags and share every other setting."""
+        config = Config(self.config_path)
+        self.assertEqual([collection.name for collection in config.collections], ["small", "images", "medium"])
+
+        large = config.collections[1]
+        self.assertEqual(large.image_dir, (self.temp_dir / "large" / "images").resolve())
+        self.assertEqual(large.tags, ["Model"])
+        self.assertEqual(large.catalog_path, (self.temp_dir / "large" / "catalog.ndjson").resolve())
+        self.assertEqual(large.jobs, 2)
+        self.assertEqual(config.collections[0].tags, ["Make"])
+        self.assertIsNone(config.collections[0].catalog_path)
+        self.assertTrue(config.validate_collections())
+
+        self.config_path.write_text(CONFIG.replace("medium/markdown", "small/markdown"))
+        self.assertFalse(Config(self.config_path).validate_collections())
+
+    def test_process_collections(self):
+        """All collections are processed on one pool, the one with the most new images first."""
+        with patch("photo_info.photo_info.open_pool", wraps=photo_info.open_pool) as open_pool:
+            result = self.process()
+        self.assertEqual(result.exit_code, 0, result.output)
+        open_pool.assert_called_once_with(2, "thread")
+        self.assertIn("Successfully processed 6", result.output)
+        self.assertLess(result.output.index("images: 3 new"), result.output.index("medium: 2 new"))
+        self.assertLess(result.output.index("medium: 2 new"), result.output.index("small: 1 new"))
+
+        self.assertIn("Make:", (self.temp_dir / "small" / "markdown" / "small_0.md").read_text())
+        self.assertNotIn("Make:", (self.temp_dir / "large" / "markdown" / "large_0.md").read_text())
+        self.assertTrue((self.temp_dir / "large" / "catalog.ndjson").exists())
+
+        Image.new("RGB", (8, 8)).save(self.temp_dir / "small" / "images" / "small_9.jpg", "JPEG")
+        result = self.process()
+        self.assertIn("Processed small_9.jpg", result.output)
+        self.assertIn("Successfully processed 1", result.output)
+
+    def test_workers_cross_collections(self):
+        """Workers start on the next collection while the last images of the previous one finish."""
+        process_image = photo_info.process_image
+        started, finished = {}, {}
+
+        def slow_large(item, **options):
+            started[item.rel_path] = time.monotonic()
+            if item.rel_path.startswith("large_"):
+                time.sleep(0.3)
+            try:
+                return process_image(item, **options)
+            finally:
+                finished[item.rel_path] = time.monotonic()
+
+        with patch("photo_info.photo_info.process_image", side_effect=slow_large):
+            result = self.process()
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(len(started), 6)
+        # Three slow images on two workers: one worker is free for the other
+        # collections while the last large image is still being processed
+        last_large = max(finished[path] for path in finished if path.startswith("large_"))
+        self.assertLess(min(started[path] for path in started if not path.startswith("large_")), last_large)
+
+        # Results are still recorded in their own collection
+        self.assertIn("Make:", (self.temp_dir / "medium" / "markdown" / "medium_0.md").read_text())
+        self.assertIn("Model:", (self.temp_dir / "large" / "markdown" / "large_2.md").read_text())
+
+    def test_select_collection(self):
+        result = self.process("--collection", "medium")
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Successfully processed 2", result.output)
+        self.assertFalse((self.temp_dir / "small" / "markdown" / "small_0.md").exists())
+
+        result = self.process("--collection", "nope")
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("Unknown collection: nope", result.output)
+
+        result = self.process("--catalog", str(self.temp_dir / "catalog.ndjson"))
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("in its [[collections]] entry", result.output)
+
+        # Directories on the command line replace the collections
+        small = self.temp_dir / "small"
+        result = self.process(str(small / "images"), str(small / "markdown"))
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Successfully processed 1", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -77,6 +77,152 @@ markdown = "~/markdown"
             self.assertEqual(config.image_dir, Path.home() / "images")
             self.assertEqual(config.markdown_dir, Path.home() / "markdown")
 
+    def test_load_config_with_performance(self):
+        """Test loading the performance section."""
+        config_data = """
+[performance]
+jobs = 6
+executor = "process"
+"""
+        with patch("builtins.open", mock_open(read_data=config_data.encode('utf-8'))):
+            config = Config(self.config_path)
+            config._load_config()
+            self.assertEqual(config.jobs, 6)
+            self.assertEqual(config.executor, "process")
+
+    def test_load_config_with_exif(self):
+        """Test loading the exif section."""
+        config_data = """
+[exif]
+engine = "pillow"
+verify = false
+"""
+        with patch("builtins.open", mock_open(read_data=config_data.encode('utf-8'))):
+            config = Config(self.config_path)
+            config._load_config()
+            self.assertEqual(config.exif_engine, "pillow")
+            self.assertFalse(config.verify)
+
+    def test_load_config_with_tags(self):
+        """Test loading the tags section with per-collection overrides."""
+        config_data = """
+[tags]
+names = ["Model", "Make"]
+
+[tags.overrides]
+"scans" = ["DateTimeOriginal"]
+"""
+        with patch("builtins.open", mock_open(read_data=config_data.encode('utf-8'))):
+            config = Config(self.config_path)
+            config._load_config()
+            self.assertEqual(config.tags, ["Model", "Make"])
+            self.assertEqual(config.tag_overrides, {"scans": ["DateTimeOriginal"]})
+            rules = config.tag_rules()
+            self.assertEqual(rules.for_path("a.jpg").names, ("Model", "Make"))
+            self.assertEqual(rules.for_path("scans/a.jpg").names, ("DateTimeOriginal",))
+
+    def test_validate_with_unknown_tag(self):
+        """Test validation rejects unknown tag names."""
+        config = Config()
+        config.image_dir = Path(self.temp_dir)
+        config.markdown_dir = Path(self.temp_dir)
+        config.tag_overrides = {"scans": ["Make", "Shoesize"]}
+        self.assertFalse(config.validate())
+
+    def test_load_config_with_derivatives(self):
+        """Test loading the derivatives section."""
+        config_data = """
+[derivatives]
+enabled = true
+directory = "public/derived"
+widths = [320, 640]
+formats = ["WebP"]
+"""
+        with patch("builtins.open", mock_open(read_data=config_data.encode('utf-8'))):
+            config = Config(self.config_path)
+            config._load_config()
+            settings = config.derivative_settings()
+            self.assertEqual(settings.directory, str(Path(self.temp_dir) / "public" / "derived"))
+            self.assertEqual(settings.widths, (320, 640))
+            self.assertEqual(settings.formats, ("webp",))
+
+    def test_validate_with_invalid_derivatives(self):
+        """Test validation rejects incomplete derivative settings."""
+        config = Config()
+        config.image_dir = Path(self.temp_dir)
+        config.markdown_dir = Path(self.temp_dir)
+        config.derivatives = True
+        self.assertFalse(config.validate())
+        config.derivatives_dir = Path(self.temp_dir)
+        self.assertTrue(config.validate())
+        config.derivative_formats = ["avif"]
+        self.assertFalse(config.validate())
+
+    def test_load_config_with_dedupe(self):
+        """Test loading and validating the dedupe section."""
+        config_data = """
+[dedupe]
+hash = "dhash"
+threshold = 4
+skip_duplicates = true
+"""
+        with patch("builtins.open", mock_open(read_data=config_data.encode('utf-8'))):
+            config = Config(self.config_path)
+            config._load_config()
+            self.assertEqual(config.duplicate_hash, "dhash")
+            self.assertEqual(config.duplicate_threshold, 4)
+            self.assertTrue(config.skip_duplicates)
+
+        config.image_dir = Path(self.temp_dir)
+        config.markdown_dir = Path(self.temp_dir)
+        self.assertTrue(config.validate())
+        config.duplicate_hash = "md5"
+        self.assertFalse(config.validate())
+        config.duplicate_hash = "phash"
+        config.duplicate_threshold = 65
+        self.assertFalse(config.validate())
+
+    def test_load_config_with_catalog(self):
+        """Test that the catalog path is resolved relative to the config file."""
+        config_data = """
+[catalog]
+path = "markdown/catalog.ndjson"
+"""
+        with patch("builtins.open", mock_open(read_data=config_data.encode('utf-8'))):
+            config = Config(self.config_path)
+            config._load_config()
+            self.assertEqual(config.catalog_path, (Path(self.temp_dir) / "markdown" / "catalog.ndjson").resolve())
+
+    def test_load_config_with_errors(self):
+        """Test that retry settings are loaded and validated."""
+        config_data = """
+[errors]
+retries = 3
+retry_delay = 0.5
+"""
+        with patch("builtins.open", mock_open(read_data=config_data.encode('utf-8'))):
+            config = Config(self.config_path)
+            config._load_config()
+            self.assertEqual(config.retries, 3)
+            self.assertEqual(config.retry_delay, 0.5)
+
+        config.image_dir = Path(self.temp_dir)
+        config.markdown_dir = Path(self.temp_dir)
+        self.assertTrue(config.validate())
+        config.retries = -1
+        self.assertFalse(config.validate())
+
+    def test_validate_with_invalid_performance(self):
+        """Test validation rejects bad performance settings."""
+        config = Config()
+        config.image_dir = Path(self.temp_dir)
+        config.markdown_dir = Path(self.temp_dir)
+        config.jobs = 0
+        self.assertFalse(config.validate())
+        config.jobs = 2
+        config.executor = "fibers"
+        self.assertFalse(config.validate())
+
     def test_validate_with_valid_config(self):
         """Test validation with valid configuration."""
         config = Config()
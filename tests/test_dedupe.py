@@ -0,0 +1,213 @@
+"""Tests for duplicate detection."""
+
+import random
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from PIL import Image, ImageDraw
+from typer.testing import CliRunner
+
+from photo_info import dedupe
+from photo_info.cli import app
+from photo_info.dedupe import (
+    BKTree,
+    DuplicateFinder,
+    HashIndex,
+    compute_hashes,
+    find_duplicate_groups,
+    hamming,
+    skip_duplicates,
+)
+from photo_info.manifest import Manifest
+from photo_info.photo_info import set_front_matter
+from photo_info.scanner import WorkItem
+
+
+def make_photo(path: Path, seed: int, size=(640, 480), quality: int = 90) -> None:
+    """Save a JPEG of random shapes; the same seed draws the same picture."""
+    rng = random.Random(seed)
+    image = Image.new("RGB", (640, 480), tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(image)
+    for _ in range(12):
+        x, y = rng.randrange(600), rng.randrange(440)
+        draw.ellipse(
+            (x, y, x + rng.randrange(40, 300), y + rng.randrange(40, 300)),
+            fill=tuple(rng.randrange(256) for _ in range(3)),
+        )
+    image.resize(size, Image.LANCZOS).save(path, "JPEG", quality=quality)
+
+
+class TestDedupe(unittest.TestCase):
+    """Test cases for the dedupe module."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.image_dir = self.temp_dir / "images"
+        self.md_dir = self.temp_dir / "markdown"
+        self.image_dir.mkdir()
+        self.md_dir.mkdir()
+        make_photo(self.image_dir / "DSC_0001.jpg", seed=1)
+        make_photo(self.image_dir / "export.jpg", seed=1, size=(320, 240), quality=60)
+        shutil.copy(self.image_dir / "DSC_0001.jpg", self.image_dir / "copy.jpg")
+        make_photo(self.image_dir / "DSC_0002.jpg", seed=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def hashes(self):
+        return {path.name: compute_hashes(str(path)) for path in sorted(self.image_dir.iterdir())}
+
+    def test_perceptual_hashes(self):
+        """Re-encoded copies hash close together, different pictures far apart."""
+        hashes = self.hashes()
+        original, export, other = hashes["DSC_0001.jpg"], hashes["export.jpg"], hashes["DSC_0002.jpg"]
+
+        self.assertEqual(original.content, hashes["copy.jpg"].content)
+        self.assertNotEqual(original.content, export.content)
+        for kind in dedupe.HASH_KINDS:
+            self.assertLessEqual(hamming(getattr(original, kind), getattr(export, kind)), 6)
+            self.assertGreater(hamming(getattr(original, kind), getattr(other, kind)), 12)
+
+    def test_phash_matches_numpy(self):
+        """The pure-Python transform gives the same hash as NumPy."""
+        if dedupe._numpy() is None:
+            self.skipTest("numpy is not installed")
+        with_numpy = compute_hashes(str(self.image_dir / "DSC_0001.jpg"))
+        with patch.object(dedupe, "_numpy", return_value=None):
+            without_numpy = compute_hashes(str(self.image_dir / "DSC_0001.jpg"))
+        self.assertEqual(with_numpy.phash, without_numpy.phash)
+
+    def test_bk_tree_search(self):
+        """The BK-tree finds exactly the values a linear scan finds."""
+        rng = random.Random(0)
+        values = [rng.getrandbits(64) for _ in range(500)]
+        values += [value ^ (1 << rng.randrange(64)) for value in values[:50]]
+        tree = BKTree()
+        for i, value in enumerate(values):
+            tree.add(value, str(i))
+
+        for query in values[:20]:
+            expected = {(hamming(query, value), str(i)) for i, value in enumerate(values) if hamming(query, value) <= 4}
+            self.assertEqual(set(tree.search(query, 4)), expected)
+
+    def test_find_duplicate_groups(self):
+        """Copies are grouped under the largest file, identical ones at distance 0."""
+        groups = find_duplicate_groups(self.hashes())
+
+        self.assertEqual(len(groups), 1)
+        original, *copies = groups[0]
+        self.assertEqual(original.path, "DSC_0001.jpg")
+        distances = {copy.path: copy.distance for copy in copies}
+        self.assertEqual(distances["copy.jpg"], 0)
+        self.assertIn("export.jpg", distances)
+        self.assertEqual(find_duplicate_groups(self.hashes(), threshold=0)[0][1].path, "copy.jpg")
+
+    def test_index_reuses_unchanged_hashes(self):
+        """Images are only hashed again when their size or mtime changes."""
+        image_file = str(self.image_dir / "DSC_0001.jpg")
+        with Manifest(self.md_dir) as manifest:
+            index = HashIndex(manifest)
+            first = index.update("DSC_0001.jpg", image_file)
+            manifest.commit()
+
+        with Manifest(self.md_dir) as manifest:
+            index = HashIndex(manifest)
+            with patch("photo_info.dedupe.compute_hashes") as mock_compute:
+                self.assertEqual(index.update("DSC_0001.jpg", image_file), first)
+                mock_compute.assert_not_called()
+
+            make_photo(self.image_dir / "DSC_0001.jpg", seed=3)
+            self.assertNotEqual(index.update("DSC_0001.jpg", image_file), first)
+
+            index.remove(["DSC_0001.jpg"])
+            self.assertEqual(index.entries(), {})
+
+    def test_skip_duplicates(self):
+        """Only the first of each set of duplicates is passed on."""
+        items = [
+            WorkItem(path.name, str(path), str(self.md_dir / (path.stem + ".md")))
+            for path in sorted(self.image_dir.iterdir())
+        ]
+        skipped = []
+        with Manifest(self.md_dir) as manifest:
+            kept = list(skip_duplicates(
+                items, str(self.image_dir), HashIndex(manifest),
+                on_skip=lambda item, original: skipped.append((item.rel_path, original.path)),
+            ))
+
+        self.assertEqual([item.rel_path for item in kept], ["DSC_0001.jpg", "DSC_0002.jpg"])
+        self.assertEqual(skipped, [("copy.jpg", "DSC_0001.jpg"), ("export.jpg", "DSC_0001.jpg")])
+
+    def test_duplicate_finder_rejects_unknown_hash(self):
+        with self.assertRaises(ValueError):
+            DuplicateFinder("md5")
+
+    def test_set_front_matter(self):
+        """Fields are added before details, replaced, and removed."""
+        md_file = self.md_dir / "DSC_0001.md"
+        md_file.write_text("---\ntitle: placeholder\nsrc: DSC_0001.jpg\ndetails:\n  Make: Nikon\n---\nNotes\n")
+
+        self.assertTrue(set_front_matter(str(md_file), "duplicate_of", "a.jpg"))
+        self.assertEqual(
+            md_file.read_text(),
+            "---\ntitle: placeholder\nsrc: DSC_0001.jpg\nduplicate_of: a.jpg\ndetails:\n  Make: Nikon\n---\nNotes\n",
+        )
+        self.assertFalse(set_front_matter(str(md_file), "duplicate_of", "a.jpg"))
+        set_front_matter(str(md_file), "duplicate_of", "b.jpg")
+        self.assertIn("duplicate_of: b.jpg\n", md_file.read_text())
+        set_front_matter(str(md_file), "duplicate_of", None)
+        self.assertNotIn("duplicate_of", md_file.read_text())
+
+    def test_dedupe_command(self):
+        """The dedupe command reports duplicates and links them in the front-matter."""
+        runner = CliRunner()
+        result = runner.invoke(app, ["process", str(self.image_dir), str(self.md_dir), "--jobs", "1"])
+        self.assertEqual(result.exit_code, 0, result.output)
+
+        result = runner.invoke(app, ["dedupe", str(self.image_dir), str(self.md_dir), "--link"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Found 2 duplicate images in 1 groups", result.output)
+        self.assertIn("duplicate_of: DSC_0001.jpg\n", (self.md_dir / "export.md").read_text())
+        self.assertIn("duplicate_of: DSC_0001.jpg\n", (self.md_dir / "copy.md").read_text())
+        self.assertNotIn("duplicate_of", (self.md_dir / "DSC_0002.md").read_text())
+
+        (self.image_dir / "copy.jpg").unlink()
+        make_photo(self.image_dir / "export.jpg", seed=4)
+        result = runner.invoke(app, ["dedupe", str(self.image_dir), str(self.md_dir), "--link"])
+        self.assertIn("No duplicate images found", result.output)
+        self.assertNotIn("duplicate_of", (self.md_dir / "export.md").read_text())
+
+    def test_process_skip_duplicates(self):
+        """process --skip-duplicates writes no markdown for duplicates."""
+        result = CliRunner().invoke(
+            app, ["process", str(self.image_dir), str(self.md_dir), "--jobs", "1", "--skip-duplicates"]
+        )
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Skipped copy.jpg: duplicate of DSC_0001.jpg", result.output)
+        self.assertEqual(sorted(p.name for p in self.md_dir.glob("*.md")), ["DSC_0001.md", "DSC_0002.md"])
+
+    def test_process_skip_duplicates_after_dedupe(self):
+        """Images indexed by dedupe but never processed do not count as originals."""
+        runner = CliRunner()
+        result = runner.invoke(app, ["dedupe", str(self.image_dir), str(self.md_dir)])
+        self.assertEqual(result.exit_code, 0, result.output)
+
+        result = runner.invoke(
+            app, ["process", str(self.image_dir), str(self.md_dir), "--jobs", "1", "--skip-duplicates"]
+        )
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual(sorted(p.name for p in self.md_dir.glob("*.md")), ["DSC_0001.md", "DSC_0002.md"])
+
+        # Processed originals still count on later runs
+        shutil.copy(self.image_dir / "DSC_0002.jpg", self.image_dir / "copy2.jpg")
+        result = runner.invoke(
+            app, ["process", str(self.image_dir), str(self.md_dir), "--jobs", "1", "--skip-duplicates"]
+        )
+        self.assertIn("Skipped copy2.jpg: duplicate of DSC_0002.jpg", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
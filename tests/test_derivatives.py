@@ -0,0 +1,100 @@
+"""Tests for resized image derivatives."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from PIL import Image
+from PIL.JpegImagePlugin import JpegImageFile
+
+from photo_info.derivatives import DerivativeSettings, make_derivatives
+from photo_info.photo_info import render_markdown
+
+
+class TestDerivatives(unittest.TestCase):
+    """Test cases for the derivatives module."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.image_file = str(self.temp_dir / "DSC_0001.jpg")
+        Image.new("RGB", (1600, 1200), (200, 100, 50)).save(self.image_file, "JPEG")
+        self.settings = DerivativeSettings(
+            str(self.temp_dir / "public" / "derived"), widths=(200, 400, 3000), formats=("webp", "jpeg")
+        )
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_writes_variants(self):
+        """Every width is written in every format, clamped to the image width."""
+        result = make_derivatives(self.image_file, "2024/DSC_0001.jpg", self.settings)
+
+        self.assertEqual((result.width, result.height), (1600, 1200))
+        self.assertEqual(
+            [(v.rel_path, v.width, v.height) for v in result.variants],
+            [
+                ("2024/DSC_0001-1600.webp", 1600, 1200),
+                ("2024/DSC_0001-1600.jpg", 1600, 1200),
+                ("2024/DSC_0001-400.webp", 400, 300),
+                ("2024/DSC_0001-400.jpg", 400, 300),
+                ("2024/DSC_0001-200.webp", 200, 150),
+                ("2024/DSC_0001-200.jpg", 200, 150),
+            ],
+        )
+        for variant in result.variants:
+            with Image.open(variant.path) as image:
+                self.assertEqual(image.size, (variant.width, variant.height))
+                self.assertEqual(image.format, variant.format.upper())
+        self.assertTrue(result.placeholder.startswith("data:image/jpeg;base64,"))
+
+    def test_decodes_at_reduced_scale(self):
+        """JPEGs are decoded in draft mode at the smallest sufficient scale."""
+        settings = self.settings._replace(widths=(200,))
+        with patch.object(JpegImageFile, "draft", autospec=True, side_effect=JpegImageFile.draft) as draft:
+            make_derivatives(self.image_file, "DSC_0001.jpg", settings)
+        self.assertEqual(draft.call_args[0][2], (200, 150))
+
+    def test_skips_up_to_date_derivatives(self):
+        """Derivatives newer than the image are not written again."""
+        make_derivatives(self.image_file, "DSC_0001.jpg", self.settings)
+        variant = os.path.join(self.settings.directory, "DSC_0001-200.webp")
+        os.utime(variant, ns=(os.stat(self.image_file).st_mtime_ns,) * 2)
+
+        with patch("photo_info.derivatives._save") as save:
+            make_derivatives(self.image_file, "DSC_0001.jpg", self.settings)
+        save.assert_not_called()
+
+        os.utime(variant, ns=(0, 0))
+        with patch("photo_info.derivatives._save") as save:
+            make_derivatives(self.image_file, "DSC_0001.jpg", self.settings)
+        self.assertEqual(save.call_count, 7)
+
+    def test_orientation(self):
+        """Dimensions account for the EXIF orientation."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        Image.new("RGB", (1600, 1200)).save(self.image_file, "JPEG", exif=exif.tobytes())
+        result = make_derivatives(self.image_file, "DSC_0001.jpg", self.settings._replace(widths=(300,)))
+
+        self.assertEqual((result.width, result.height), (1200, 1600))
+        with Image.open(result.variants[0].path) as image:
+            self.assertEqual(image.size, (300, 400))
+
+    def test_front_matter(self):
+        """Variants under a public directory are served from below it."""
+        result = make_derivatives(self.image_file, "DSC_0001.jpg", self.settings._replace(formats=("webp",)))
+        content = render_markdown(self.image_file, {"Make": "NIKON"}, "DSC_0001.jpg", result)
+
+        self.assertIn("width: 1600\nheight: 1200\nplaceholder: data:image/jpeg;base64,", content)
+        self.assertIn(
+            "variants:\n  - src: derived/DSC_0001-1600.webp\n    width: 1600\n    height: 1200\n    format: webp\n",
+            content,
+        )
+        self.assertTrue(content.endswith("details:\n  Make: NIKON\n---\n"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,173 @@
+"""Tests for the header-only EXIF reader."""
+
+import io
+import os
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from PIL import Image
+from PIL.TiffImagePlugin import IFDRational
+
+from photo_info import exif_reader
+from photo_info.photo_info import MY_TAG_IDS, get_exif_data, get_labeled_exif
+
+
+def make_exif() -> Image.Exif:
+    """Build an EXIF block with IFD0, Exif IFD and MakerNote entries."""
+    exif = Image.Exif()
+    exif[271] = "NIKON CORPORATION"
+    exif[272] = "NIKON D750"
+    exif[305] = "Ver.1.10"
+    ifd = exif.get_ifd(0x8769)
+    ifd[36867] = "2021:09:01 12:00:00"
+    ifd[37386] = IFDRational(50, 1)
+    ifd[33437] = IFDRational(28, 10)
+    ifd[33434] = IFDRational(1, 125)
+    ifd[34855] = 100
+    ifd[37380] = IFDRational(-1, 3)
+    ifd[42035] = "NIKON"
+    ifd[42036] = "24-70mm f/2.8"
+    ifd[37500] = b"\x00" * 4096
+    return exif
+
+
+def make_raw(endian: str = "<", sensor_bytes: int = 1 << 20) -> bytes:
+    """Build a minimal TIFF-based RAW file with Make, Model and an Exif IFD.
+
+    The Exif IFD and its strings are placed after a block of fake sensor data,
+    the way many RAW formats lay out their metadata.
+    """
+    def ifd(entries, offset):
+        body = struct.pack(endian + "H", len(entries))
+        extra = b""
+        data_offset = offset + 2 + 12 * len(entries) + 4
+        for tag, field_type, count, value in entries:
+            if isinstance(value, bytes):
+                body += struct.pack(endian + "HHLL", tag, field_type, count, data_offset + len(extra))
+                extra += value
+            else:
+                body += struct.pack(endian + "HHL", tag, field_type, count)
+                body += struct.pack(endian + ("H2x" if field_type == 3 else "L"), value)
+        return body + b"\x00" * 4 + extra
+
+    sensor_offset = 8 + 256
+    exif_offset = sensor_offset + sensor_bytes
+    ifd0 = ifd(
+        [
+            (271, 2, 18, b"NIKON CORPORATION\x00"),
+            (272, 2, 11, b"NIKON D750\x00"),
+            (34665, 4, 1, exif_offset),
+        ],
+        8,
+    )
+    exif_ifd = ifd(
+        [
+            (33434, 5, 1, struct.pack(endian + "LL", 1, 250)),
+            (34855, 3, 1, 6400),
+        ],
+        exif_offset,
+    )
+    header = (b"II*\x00" if endian == "<" else b"MM\x00*") + struct.pack(endian + "L", 8)
+    head = header + ifd0
+    return head + b"\x00" * (sensor_offset - len(head)) + b"\xaa" * sensor_bytes + exif_ifd
+
+
+class CountingReader(io.BytesIO):
+    """BytesIO that counts how many bytes were read."""
+
+    bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+class TestExifReader(unittest.TestCase):
+    """Test cases for the exif_reader module."""
+
+    def setUp(self):
+        """Write a small JPEG with EXIF data to a temporary directory."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.image_file = str(Path(self.temp_dir) / "DSC_3106.jpg")
+        Image.new("RGB", (32, 24)).save(self.image_file, "JPEG", exif=make_exif().tobytes())
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        for name in os.listdir(self.temp_dir):
+            os.remove(os.path.join(self.temp_dir, name))
+        os.rmdir(self.temp_dir)
+
+    def test_matches_pillow(self):
+        """The fast engine produces the same labeled values as Pillow."""
+        fast = get_labeled_exif(get_exif_data(self.image_file, engine="fast"))
+        slow = get_labeled_exif(get_exif_data(self.image_file, engine="pillow"))
+        self.assertEqual(list(fast), list(slow))
+        self.assertEqual(
+            {k: str(v) for k, v in fast.items()},
+            {k: str(v) for k, v in slow.items()},
+        )
+
+    def test_only_requested_tags_are_decoded(self):
+        """Tags outside the requested set, such as MakerNote, are skipped."""
+        exif = exif_reader.read_exif_file(self.image_file, MY_TAG_IDS)
+        self.assertNotIn(305, exif)
+        self.assertNotIn(37500, exif)
+        self.assertEqual(exif[272], "NIKON D750")
+        self.assertEqual(str(exif[33434]), "0.008")
+
+    def test_no_exif_segment(self):
+        """A JPEG without an Exif segment returns None."""
+        buf = io.BytesIO()
+        Image.new("RGB", (8, 8)).save(buf, "JPEG")
+        buf.seek(0)
+        self.assertIsNone(exif_reader.read_exif(buf))
+
+    def test_not_a_jpeg(self):
+        """Non-JPEG data returns None instead of raising."""
+        self.assertIsNone(exif_reader.read_exif(io.BytesIO(b"GIF89a" + b"\x00" * 32)))
+
+    @patch("photo_info.photo_info.Image.open")
+    def test_falls_back_to_pillow(self, mock_open):
+        """Files the fast engine cannot read are handed to Pillow."""
+        png_file = str(Path(self.temp_dir) / "scan.png")
+        Image.new("RGB", (8, 8)).save(png_file, "PNG")
+        mock_open.return_value._getexif.return_value = {271: "Canon"}
+
+        exif = get_exif_data(png_file, verify=False)
+
+        self.assertEqual(exif, {271: "Canon"})
+        mock_open.return_value.verify.assert_not_called()
+
+    def test_raw_reads_only_metadata(self):
+        """TIFF-based RAW files are parsed without reading sensor data."""
+        for endian in ("<", ">"):
+            fp = CountingReader(make_raw(endian))
+            exif = exif_reader.read_exif(fp, MY_TAG_IDS)
+            self.assertEqual(exif[271], "NIKON CORPORATION")
+            self.assertEqual(exif[34855], 6400)
+            self.assertEqual(str(exif[33434]), "0.004")
+            self.assertLess(fp.bytes_read, 1024)
+
+    def test_raw_file_through_pipeline(self):
+        """RAW files flow through get_exif_data and get_labeled_exif."""
+        raw_file = str(Path(self.temp_dir) / "DSC_0001.NEF")
+        with open(raw_file, "wb") as f:
+            f.write(make_raw())
+        labeled = get_labeled_exif(get_exif_data(raw_file))
+        self.assertEqual(
+            {k: str(v) for k, v in labeled.items()},
+            {"Make": "NIKON CORPORATION", "Model": "NIKON D750", "ExposureTime": "0.004", "ISOSpeedRatings": "6400"},
+        )
+
+    def test_rational_formatting(self):
+        """Rationals format like Pillow's IFDRational."""
+        self.assertEqual(str(exif_reader.Rational(1, 125)), str(IFDRational(1, 125)))
+        self.assertEqual(str(exif_reader.Rational(1, 0)), "nan")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,178 @@
+"""Tests for GPS coordinates and location queries."""
+
+import random
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from PIL import Image
+from PIL.TiffImagePlugin import IFDRational
+from typer.testing import CliRunner
+
+from photo_info import geo
+from photo_info.cli import app
+from photo_info.config import DEFAULT_CONFIG_NAME
+from photo_info.exif_reader import GPS_IFD_POINTER, Rational
+from photo_info.manifest import Fingerprint, Manifest
+from photo_info.photo_info import get_exif_data
+from photo_info.tags import TagSet
+
+# Sydney Opera House
+GPS_INFO = {
+    1: "S",
+    2: (IFDRational(33), IFDRational(51), IFDRational(3546, 100)),
+    3: "E",
+    4: (IFDRational(151), IFDRational(12), IFDRational(40)),
+    5: b"\x00",
+    6: IFDRational(58),
+}
+
+
+def save_with_gps(path: Path, gps_info: dict) -> None:
+    exif = Image.Exif()
+    exif[271] = "NIKON CORPORATION"
+    exif.get_ifd(GPS_IFD_POINTER).update(gps_info)
+    Image.new("RGB", (8, 8)).save(path, exif=exif)
+
+
+class TestGeo(unittest.TestCase):
+    """Test cases for the geo module."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.image_dir = self.temp_dir / "images"
+        self.md_dir = self.temp_dir / "markdown"
+        self.image_dir.mkdir()
+        self.md_dir.mkdir()
+        self.runner = CliRunner()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_gps_labels(self):
+        """Degrees, minutes and seconds become signed decimal degrees."""
+        self.assertEqual(
+            geo.gps_labels(GPS_INFO),
+            {"GPSLatitude": -33.85985, "GPSLongitude": 151.211111, "GPSAltitude": 58.0},
+        )
+        self.assertEqual(
+            geo.gps_labels({1: b"N\x00", 2: (Rational(37, 1), Rational(0, 1), 0.0), 3: "W", 4: 122.5, 6: 3, 5: 1}),
+            {"GPSLatitude": 37.0, "GPSLongitude": -122.5, "GPSAltitude": -3.0},
+        )
+        # Missing, out of range or undefined positions are left out
+        self.assertEqual(geo.gps_labels({1: "N", 2: (37.0, 0.0, 0.0)}), {})
+        self.assertEqual(geo.gps_labels({2: (95.0,), 4: (10.0,)}), {})
+        self.assertEqual(geo.gps_labels({2: (Rational(1, 0),), 4: (10.0,)}), {})
+        self.assertEqual(geo.gps_labels(1234), {})
+
+    def test_extracted_when_selected(self):
+        """GPSInfo is labeled as coordinates by both engines, and only when selected."""
+        tags = TagSet(["Make", "GPSInfo"])
+        for suffix in (".jpg", ".png"):
+            path = self.image_dir / f"a{suffix}"
+            save_with_gps(path, GPS_INFO)
+            for engine in ("fast", "pillow"):
+                labeled = tags.label(get_exif_data(str(path), engine=engine, tags=tags))
+                self.assertEqual(list(labeled), ["Make", "GPSLatitude", "GPSLongitude", "GPSAltitude"])
+                self.assertEqual(labeled["GPSLatitude"], -33.85985)
+
+            tags_without = TagSet(["Make"])
+            self.assertNotIn("GPSLatitude", tags_without.label(get_exif_data(str(path), tags=tags_without)))
+
+    def test_geohash(self):
+        self.assertEqual(geo.geohash(57.64911, 10.40744, 11), "u4pruydqqvj")
+        self.assertEqual(geo.geohash(-90, -180, 3), "000")
+
+    def test_covering_prefixes(self):
+        """The cells of the prefixes cover the box, across the antimeridian too."""
+        for box in ((37.7, -122.5, 37.8, -122.4), (-1.0, 179.5, 1.0, -179.5), (-90, -180, 90, 180)):
+            prefixes = geo.covering_prefixes(*box)
+            self.assertLessEqual(len(prefixes), 2 * geo.MAX_QUERY_CELLS)
+            south, west, north, east = box
+            for lat in (south, (south + north) / 2, north):
+                for lon in (west, east):
+                    cell = geo.geohash(lat, lon)
+                    self.assertTrue(any(cell.startswith(prefix) for prefix in prefixes), (box, lat, lon))
+
+    def test_queries_match_brute_force(self):
+        """Index queries find exactly the images a full scan would."""
+        rng = random.Random(7)
+        points = {f"{i}.jpg": (rng.uniform(-60, 60), rng.uniform(-180, 180)) for i in range(2000)}
+        for i in range(200):
+            points[f"sf{i}.jpg"] = (37.77 + rng.uniform(-0.05, 0.05), -122.42 + rng.uniform(-0.05, 0.05))
+        points["dateline.jpg"] = (0.1, 179.95)
+
+        with Manifest(self.md_dir) as manifest:
+            for path, (lat, lon) in points.items():
+                manifest.record(path, Fingerprint(1, 1, "x"), {"GPSLatitude": lat, "GPSLongitude": lon})
+            manifest.record("nowhere.jpg", Fingerprint(1, 1, "x"), {"Make": "NIKON"})
+
+            for lat, lon, radius in ((37.77, -122.42, 2.0), (0.0, -179.95, 50.0), (10.0, 20.0, 1500.0)):
+                expected = sorted(
+                    path for path, point in points.items() if geo.distance_km(lat, lon, *point) <= radius
+                )
+                matches = geo.near(manifest, lat, lon, radius)
+                self.assertEqual(sorted(match.path for match in matches), expected)
+                self.assertEqual(matches, sorted(matches, key=lambda match: match.distance))
+
+            expected = sorted(
+                path for path, (lat, lon) in points.items() if -10 <= lat <= 10 and (lon >= 170 or lon <= -170)
+            )
+            self.assertEqual([match.path for match in geo.within(manifest, -10, 170, 10, -170)], expected)
+
+            self.assertIn("dateline.jpg", [match.path for match in geo.near(manifest, 0.1, -179.95, 15)])
+
+    def test_old_manifest_is_migrated(self):
+        """Manifests created before the location columns gain them."""
+        import sqlite3
+
+        conn = sqlite3.connect(str(self.md_dir / ".photo_info.db"))
+        conn.execute("CREATE TABLE images (path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                     "mtime_ns INTEGER NOT NULL, hash TEXT NOT NULL, exif TEXT NOT NULL)")
+        conn.execute("INSERT INTO images VALUES ('old.jpg', 1, 1, 'x', '{}')")
+        conn.commit()
+        conn.close()
+
+        with Manifest(self.md_dir) as manifest:
+            self.assertEqual(list(manifest.entries()), ["old.jpg"])
+            manifest.record("new.jpg", Fingerprint(1, 1, "x"), {"GPSLatitude": 1.0, "GPSLongitude": 2.0})
+            self.assertEqual([match.path for match in geo.near(manifest, 1.0, 2.0, 1)], ["new.jpg"])
+
+    def test_near_command(self):
+        """Coordinates are written to the front-matter and found by near and within."""
+        save_with_gps(self.image_dir / "opera.jpg", GPS_INFO)
+        save_with_gps(self.image_dir / "harbour.jpg", {**GPS_INFO, 2: (33.0, 51.0, 10.0), 4: (151.0, 12.0, 30.0)})
+        save_with_gps(self.image_dir / "nogps.jpg", {})
+        config_path = self.temp_dir / DEFAULT_CONFIG_NAME
+        config_path.write_text('[tags]\nnames = ["Make", "GPSInfo"]\n')
+
+        with patch("pathlib.Path.cwd", return_value=self.temp_dir):
+            result = self.runner.invoke(app, ["process", str(self.image_dir), str(self.md_dir), "--jobs", "1"])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn("GPSLatitude: -33.85985", (self.md_dir / "opera.md").read_text())
+
+            result = self.runner.invoke(app, ["near", "-33.8598", "151.2111", "--radius", "2", "-m", str(self.md_dir)])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertLess(result.output.index("opera.jpg"), result.output.index("harbour.jpg"))
+            self.assertNotIn("nogps.jpg", result.output)
+            self.assertIn("2 images found", result.output)
+
+            result = self.runner.invoke(app, ["near", "-33.8598", "151.2111", "-r", "0.05", "-m", str(self.md_dir)])
+            self.assertNotIn("harbour.jpg", result.output)
+
+            result = self.runner.invoke(app, ["within", "-34", "151", "-33", "152", "-m", str(self.md_dir)])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn("2 images found", result.output)
+
+            result = self.runner.invoke(app, ["within", "10", "0", "20", "10", "-m", str(self.md_dir)])
+            self.assertIn("No images found", result.output)
+
+        result = self.runner.invoke(app, ["near", "1", "2", "-m", str(self.image_dir)])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("No manifest found", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
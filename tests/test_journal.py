@@ -0,0 +1,147 @@
+"""Tests for the journal, quarantine and retries of failed images."""
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from PIL import Image
+from typer.testing import CliRunner
+
+from photo_info import photo_info
+from photo_info.cli import app
+from photo_info.journal import Journal, journal_path
+from photo_info.manifest import MANIFEST_NAME, Failure, Fingerprint, Manifest, fingerprint
+from photo_info.scanner import scan_images
+
+
+class TestJournal(unittest.TestCase):
+    """Test cases for the journal module and quarantine."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.image_dir = self.temp_dir / "images"
+        self.md_dir = self.temp_dir / "markdown"
+        self.image_dir.mkdir()
+        self.md_dir.mkdir()
+        self.journal_file = journal_path(self.md_dir / MANIFEST_NAME)
+        self.runner = CliRunner()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def process(self, *args):
+        return self.runner.invoke(app, ["process", str(self.image_dir), str(self.md_dir), "--jobs", "1", *args])
+
+    def test_replay(self):
+        """Entries of an interrupted run are applied to the manifest, ignoring a cut-off line."""
+        with Manifest(self.md_dir) as manifest:
+            journal = Journal(self.journal_file, manifest)
+            journal.done("a.jpg", Fingerprint(1, 2, "x"), {"Make": "NIKON\x00"})
+            journal.failed("b.jpg", Failure(3, 4, 2, "OSError: broken"))
+            journal.close()
+        with open(self.journal_file, "a") as f:
+            f.write('{"path":"c.jpg","do')
+
+        with Manifest(self.md_dir) as manifest:
+            replayed = Journal(self.journal_file, manifest).replay()
+            self.assertEqual(replayed, {"a.jpg": {"Make": "NIKON"}})
+            self.assertEqual(manifest.entries(), {"a.jpg": Fingerprint(1, 2, "x")})
+            self.assertEqual(manifest.failures(), {"b.jpg": Failure(3, 4, 2, "OSError: broken")})
+        self.assertFalse(self.journal_file.exists())
+
+    def test_scan_skips_quarantined(self):
+        """Quarantined images are skipped until they change, and forgotten once removed."""
+        Image.new("RGB", (8, 8)).save(self.image_dir / "a.jpg", "JPEG")
+        Image.new("RGB", (8, 8)).save(self.image_dir / "b.jpg", "JPEG")
+        st = (self.image_dir / "a.jpg").stat()
+        image_dir, md_dir = str(self.image_dir) + "/", str(self.md_dir) + "/"
+
+        with Manifest(self.md_dir) as manifest:
+            manifest.record_failure("a.jpg", Failure(st.st_size, st.st_mtime_ns, 1, "error"))
+            manifest.record_failure("gone.jpg", Failure(1, 1, 1, "error"))
+            skipped = []
+            items = scan_images(
+                image_dir, md_dir, manifest, on_skip=lambda item, failure: skipped.append(item.rel_path)
+            )
+            self.assertEqual([item.rel_path for item in items], ["b.jpg"])
+            self.assertEqual(skipped, ["a.jpg"])
+            self.assertEqual(list(manifest.failures()), ["a.jpg"])
+
+            items = scan_images(image_dir, md_dir, manifest, retry_failed=True)
+            self.assertEqual([item.rel_path for item in items], ["a.jpg", "b.jpg"])
+
+    def test_corrupt_image_is_quarantined(self):
+        """A corrupt image fails alone, is quarantined, and is skipped on the next run."""
+        Image.new("RGB", (8, 8)).save(self.image_dir / "DSC_0001.jpg", "JPEG")
+        (self.image_dir / "DSC_0002.jpg").write_bytes(b"\xff\xd8 not really a jpeg")
+
+        result = self.process()
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("Processed DSC_0001.jpg", result.output)
+        self.assertIn("1 of 2 images failed", result.output)
+
+        result = self.process()
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Skipped 1 quarantined", result.output)
+        self.assertIn("No new images", result.output)
+
+        result = self.runner.invoke(app, ["quarantine", str(self.image_dir), str(self.md_dir)])
+        self.assertIn("DSC_0002.jpg", result.output)
+        self.assertIn("1 images are quarantined", result.output)
+
+        result = self.process("--retry-quarantined")
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("Failed DSC_0002.jpg", result.output)
+
+        Image.new("RGB", (8, 8)).save(self.image_dir / "DSC_0002.jpg", "JPEG")
+        result = self.process()
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Processed DSC_0002.jpg", result.output)
+        with Manifest(self.md_dir) as manifest:
+            self.assertEqual(manifest.failures(), {})
+
+    def test_retries(self):
+        """Images failing once succeed on a retry."""
+        for name in ("DSC_0001", "DSC_0002"):
+            Image.new("RGB", (8, 8)).save(self.image_dir / f"{name}.jpg", "JPEG")
+        real = photo_info.process_image
+        calls = []
+
+        def flaky(item, **kwargs):
+            calls.append(item.rel_path)
+            if calls.count(item.rel_path) == 1 and item.rel_path == "DSC_0002.jpg":
+                raise OSError("Input/output error")
+            return real(item, **kwargs)
+
+        with patch("photo_info.photo_info.process_image", side_effect=flaky):
+            with patch("photo_info.cli.time.sleep") as sleep:
+                result = self.process("--retries", "2")
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("Retrying 1 failed images", result.output)
+        sleep.assert_called_once_with(1.0)
+        self.assertEqual(calls, ["DSC_0001.jpg", "DSC_0002.jpg", "DSC_0002.jpg"])
+
+    def test_resumes_interrupted_run(self):
+        """Images journaled by an interrupted run are not processed again."""
+        for name in ("DSC_0001", "DSC_0002"):
+            Image.new("RGB", (8, 8)).save(self.image_dir / f"{name}.jpg", "JPEG")
+        image_file = str(self.image_dir / "DSC_0001.jpg")
+        with Manifest(self.md_dir) as manifest:
+            journal = Journal(self.journal_file, manifest)
+            journal.done("DSC_0001.jpg", fingerprint(image_file), {})
+            journal.close()
+            # Killed before the manifest was committed
+            manifest.conn.rollback()
+
+        result = self.process()
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("1 images were already done", result.output)
+        self.assertNotIn("Processed DSC_0001.jpg", result.output)
+        self.assertIn("Processed DSC_0002.jpg", result.output)
+        self.assertFalse(self.journal_file.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
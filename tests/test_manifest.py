@@ -0,0 +1,90 @@
+"""Tests for the incremental manifest."""
+
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from photo_info.manifest import HASH_SAMPLE_SIZE, MANIFEST_NAME, Manifest, fingerprint, hash_file
+from photo_info.scanner import scan_images
+
+
+class TestManifest(unittest.TestCase):
+    """Test cases for the manifest module."""
+
+    def setUp(self):
+        """Set up an image directory and an empty manifest."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.image_dir = Path(self.temp_dir) / "images"
+        self.md_dir = Path(self.temp_dir) / "markdown"
+        self.image_dir.mkdir()
+        self.md_dir.mkdir()
+        for name in ("a.jpg", "b.jpg"):
+            (self.image_dir / name).write_bytes(name.encode() * 100)
+        self.manifest = Manifest(self.md_dir)
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        self.manifest.close()
+        shutil.rmtree(self.temp_dir)
+
+    def record_all(self):
+        """Record every image as processed."""
+        for name in os.listdir(self.image_dir):
+            self.manifest.record(name, fingerprint(str(self.image_dir / name)), {"Make": "NIKON\x00"})
+        self.manifest.commit()
+
+    def changed(self):
+        """Return the images the scanner selects for processing."""
+        items = scan_images(str(self.image_dir), str(self.md_dir), manifest=self.manifest)
+        return [item.rel_path for item in items]
+
+    def test_manifest_is_stored_in_markdown_dir(self):
+        """The manifest file lives in the markdown directory."""
+        self.assertTrue((self.md_dir / MANIFEST_NAME).exists())
+
+    def test_new_images_are_changed(self):
+        """Images missing from the manifest need processing."""
+        self.assertEqual(self.changed(), ["a.jpg", "b.jpg"])
+
+    def test_unchanged_images_are_skipped(self):
+        """Recorded images with the same stat are skipped."""
+        self.record_all()
+        self.assertEqual(self.changed(), [])
+        self.assertEqual(self.manifest.exif("a.jpg"), {"Make": "NIKON"})
+
+    def test_touched_image_is_skipped(self):
+        """An image with a new mtime but the same contents is skipped."""
+        self.record_all()
+        st = os.stat(self.image_dir / "a.jpg")
+        os.utime(self.image_dir / "a.jpg", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertEqual(self.changed(), [])
+        self.assertEqual(self.manifest.entries()["a.jpg"].mtime_ns, st.st_mtime_ns + 10**9)
+
+    def test_modified_image_is_changed(self):
+        """An image whose contents changed is processed again."""
+        self.record_all()
+        (self.image_dir / "b.jpg").write_bytes(b"re-exported")
+        self.assertEqual(self.changed(), ["b.jpg"])
+
+    def test_removed_image_is_forgotten(self):
+        """Images that no longer exist are dropped from the manifest."""
+        self.record_all()
+        (self.image_dir / "a.jpg").unlink()
+        self.changed()
+        self.assertEqual(list(self.manifest.entries()), ["b.jpg"])
+
+    def test_sampled_hash(self):
+        """Sampled hashing still notices changes at the start of large files."""
+        large = self.image_dir / "large.nef"
+        large.write_bytes(b"\x01" * (4 * HASH_SAMPLE_SIZE))
+        before = hash_file(str(large), "sampled")
+        self.assertNotEqual(before, hash_file(str(large)))
+        with open(large, "r+b") as f:
+            f.write(b"\x02")
+        self.assertNotEqual(before, hash_file(str(large), "sampled"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,59 @@
+"""Tests for run metrics."""
+
+import unittest
+
+from photo_info.metrics import Histogram, Metrics, timed
+
+
+class TestMetrics(unittest.TestCase):
+    """Test cases for the metrics module."""
+
+    def test_histogram_percentiles(self):
+        """Percentiles are upper bounds within one bucket of the true value."""
+        histogram = Histogram()
+        for ms in range(1, 101):
+            histogram.observe(ms / 1000)
+
+        self.assertEqual(histogram.count, 100)
+        self.assertAlmostEqual(histogram.total, 5.05)
+        self.assertEqual(histogram.max, 0.1)
+        for fraction in (0.5, 0.9, 0.99):
+            self.assertGreaterEqual(histogram.percentile(fraction), fraction / 10)
+            self.assertLessEqual(histogram.percentile(fraction), fraction / 10 * 1.2)
+        self.assertEqual(histogram.percentile(1.0), 0.1)
+
+    def test_timed(self):
+        """Time spent in a block is added to the stage."""
+        timings = {}
+        with timed(timings, "write"):
+            pass
+        with timed(timings, "write"):
+            pass
+        self.assertEqual(list(timings), ["write"])
+        with timed(None, "write"):
+            pass
+
+    def test_record_keeps_slowest_files(self):
+        """Only the slowest files are remembered, slowest first."""
+        metrics = Metrics(slowest=2)
+        metrics.record("a.jpg", {"extract": 0.1, "write": 0.1})
+        metrics.record("b.jpg", {"extract": 0.5})
+        metrics.record("c.jpg", {"extract": 0.3}, failed=True)
+        metrics.record("d.jpg", None, failed=True)
+
+        self.assertEqual([path for _, path, _ in metrics.slowest_files()], ["b.jpg", "c.jpg"])
+        data = metrics.to_dict()
+        self.assertEqual(data["counters"], {"processed": 2, "failed": 2})
+        self.assertEqual(list(data["stages"]), ["extract", "write"])
+        self.assertEqual(data["stages"]["extract"]["count"], 3)
+
+    def test_scanned(self):
+        """Items pass through while the scan is timed and counted."""
+        metrics = Metrics()
+        self.assertEqual(list(metrics.scanned(iter("abc"))), ["a", "b", "c"])
+        self.assertEqual(metrics.counters["scanned"], 3)
+        self.assertEqual(metrics.stages["scan"].count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
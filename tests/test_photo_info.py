@@ -1,8 +1,10 @@
 import unittest
-from unittest.mock import patch, mock_open, MagicMock
+from unittest.mock import patch, MagicMock
 from pathlib import Path
 import tempfile
+import json
 import os
+import shutil
 from typer.testing import CliRunner
 
 from photo_info.photo_info import (
@@ -11,8 +13,11 @@ from photo_info.photo_info import (
     write_to_markdown,
     MY_TAGS,
     identify_new_images,
+    process_images,
 )
 from photo_info.cli import app
+from photo_info.manifest import MANIFEST_NAME
+from photo_info.scanner import WorkItem
 from photo_info.config import Config
 
 
@@ -75,8 +80,7 @@ class TestPhotoInfo(unittest.TestCase):
             found_images = identify_new_images("test_files/", "test_files/")
             self.assertEqual(found_images, ["DSC_3021"])
 
-    @patch("builtins.open", new_callable=mock_open)
-    def test_write_to_markdown(self, mock_file):
+    def test_write_to_markdown(self):
         """Test writing EXIF data to markdown."""
         labeled_exif = {
             "Make": "NIKON CORPORATION",
@@ -85,19 +89,129 @@ class TestPhotoInfo(unittest.TestCase):
         }
         # Create a test image path that includes 'public'
         image_path = "test_files/public/images/DSC_3106.jpg"
-        write_to_markdown(image_path, labeled_exif, "test_files/")
-        mock_file.assert_called_once_with(
-            "test_files/DSC_3106.md", "w+", encoding="utf-8"
+        md_dir = str(self.md_dir) + "/"
+        written = write_to_markdown(image_path, labeled_exif, md_dir)
+
+        self.assertTrue(written)
+        md_file = self.md_dir / "DSC_3106.md"
+        self.assertEqual(
+            md_file.read_text(encoding="utf-8"),
+            "---\n"
+            "title: placeholder\n"
+            "description: placeholder\n"
+            "src: images/DSC_3106.jpg\n"
+            "details:\n"
+            "  Make: NIKON CORPORATION\n"
+            "  Model: NIKON D750\n"
+            "  DateTimeOriginal: 2021:09:01 12:00:00\n"
+            "---\n",
         )
-        mock_file().write.assert_any_call("---\n")
-        mock_file().write.assert_any_call("title: placeholder\n")
-        mock_file().write.assert_any_call("description: placeholder\n")
-        mock_file().write.assert_any_call("src: images/DSC_3106.jpg\n")
-        mock_file().write.assert_any_call("details:\n")
-        mock_file().write.assert_any_call("  Make: NIKON CORPORATION\n")
-        mock_file().write.assert_any_call("  Model: NIKON D750\n")
-        mock_file().write.assert_any_call("  DateTimeOriginal: 2021:09:01 12:00:00\n")
-        mock_file().write.assert_any_call("---\n")
+        md_file.unlink()
+
+    def test_write_to_markdown_skips_unchanged(self):
+        """Unchanged markdown files are not rewritten."""
+        md_dir = str(self.md_dir) + "/"
+        md_file = self.md_dir / "DSC_3106.md"
+        self.assertTrue(write_to_markdown("DSC_3106.jpg", {"Make": "NIKON"}, md_dir))
+        os.utime(md_file, ns=(0, 0))
+
+        self.assertFalse(write_to_markdown("DSC_3106.jpg", {"Make": "NIKON"}, md_dir))
+        self.assertEqual(md_file.stat().st_mtime_ns, 0)
+
+        self.assertTrue(write_to_markdown("DSC_3106.jpg", {"Make": "Canon"}, md_dir, fsync=True))
+        self.assertIn("Make: Canon", md_file.read_text())
+        self.assertEqual(os.listdir(self.md_dir), ["DSC_3106.md"])
+        md_file.unlink()
+
+    def test_write_to_markdown_keeps_edits(self):
+        """Edited fields and the body of an existing file survive a rewrite."""
+        md_dir = str(self.md_dir) + "/"
+        md_file = self.md_dir / "DSC_3106.md"
+        md_file.write_text(
+            "---\n"
+            "title: Sunset over the bay\n"
+            "description: >\n"
+            "  Taken from the pier.\n"
+            "src: DSC_3106.jpg\n"
+            "duplicate_of: DSC_3105.jpg\n"
+            "details:\n"
+            "  Make: NIKON\n"
+            "---\n"
+            "Notes\n"
+        )
+
+        self.assertTrue(write_to_markdown("DSC_3106.jpg", {"Make": "Canon"}, md_dir))
+        self.assertEqual(
+            md_file.read_text(),
+            "---\n"
+            "title: Sunset over the bay\n"
+            "description: >\n"
+            "  Taken from the pier.\n"
+            "src: DSC_3106.jpg\n"
+            "duplicate_of: DSC_3105.jpg\n"
+            "details:\n"
+            "  Make: Canon\n"
+            "---\n"
+            "Notes\n",
+        )
+        self.assertFalse(write_to_markdown("DSC_3106.jpg", {"Make": "Canon"}, md_dir))
+        md_file.unlink()
+
+    @patch("photo_info.photo_info.os.replace", side_effect=OSError("disk full"))
+    def test_write_to_markdown_is_atomic(self, mock_replace):
+        """A failed write leaves the previous file intact and no temp files."""
+        md_dir = str(self.md_dir) + "/"
+        md_file = self.md_dir / "DSC_3106.md"
+        md_file.write_text("previous")
+
+        with self.assertRaises(OSError):
+            write_to_markdown("DSC_3106.jpg", {"Make": "NIKON"}, md_dir)
+
+        self.assertEqual(md_file.read_text(), "previous")
+        self.assertEqual(os.listdir(self.md_dir), ["DSC_3106.md"])
+        md_file.unlink()
+
+
+class TestProcessImages(unittest.TestCase):
+    """Test cases for parallel image processing."""
+
+    @patch("photo_info.photo_info.write_to_markdown")
+    @patch("photo_info.photo_info.get_exif_data")
+    def test_results_keep_input_order(self, mock_get_exif, mock_write):
+        """Results are yielded in input order regardless of worker count."""
+        mock_get_exif.side_effect = lambda image_file, **kwargs: {271: image_file}
+        items = [
+            WorkItem(f"IMG_{i:03d}.jpg", f"images/IMG_{i:03d}.jpg", f"markdown/IMG_{i:03d}.md")
+            for i in range(20)
+        ]
+
+        results = list(process_images(iter(items), jobs=4))
+
+        self.assertEqual([r.item for r in results], items)
+        self.assertEqual(results[3].labeled_exif, {"Make": "images/IMG_003.jpg"})
+        self.assertEqual(mock_write.call_count, 20)
+
+    @patch("photo_info.photo_info.write_to_markdown")
+    @patch("photo_info.photo_info.get_exif_data")
+    def test_errors_are_collected_per_file(self, mock_get_exif, mock_write):
+        """A failing image is reported without stopping the others."""
+        def fake_exif(image_file, **kwargs):
+            if "bad" in image_file:
+                raise OSError("cannot identify image file")
+            return {271: "NIKON CORPORATION"}
+
+        mock_get_exif.side_effect = fake_exif
+        items = [WorkItem(name, name, "markdown/" + name[:-4] + ".md") for name in ("a.jpg", "bad.jpg", "c.jpg")]
+        results = list(process_images(items, jobs=2))
+
+        self.assertEqual([r.error is None for r in results], [True, False, True])
+        self.assertIn("cannot identify image file", results[1].error)
+        self.assertEqual(mock_write.call_count, 2)
+
+    def test_unknown_executor(self):
+        """An unknown executor name is rejected."""
+        with self.assertRaises(ValueError):
+            list(process_images([WorkItem("a.jpg", "a.jpg", "a.md")], executor="fibers"))
 
 
 class TestCLI(unittest.TestCase):
@@ -115,19 +229,108 @@ class TestCLI(unittest.TestCase):
             self.config_path.unlink()
         os.rmdir(self.temp_dir)
 
+    @patch("photo_info.cli.Manifest")
     @patch("photo_info.cli.Config")
-    def test_process_with_config(self, mock_config):
+    def test_process_with_config(self, mock_config, mock_manifest):
         """Test process command with config file."""
         mock_config_instance = mock_config.return_value
+        mock_config_instance.configure_mock(**vars(Config(self.config_path)))
         mock_config_instance.validate.return_value = True
         mock_config_instance.image_dir = Path("/test/images")
         mock_config_instance.markdown_dir = Path("/test/markdown")
 
-        with patch("photo_info.cli.photo_info.identify_new_images") as mock_identify:
-            mock_identify.return_value = []
+        with patch("photo_info.cli.scanner.scan_images") as mock_scan:
+            mock_scan.return_value = iter([])
             result = self.runner.invoke(app, ["process"])
             self.assertEqual(result.exit_code, 0)
 
+    def test_process_is_incremental(self):
+        """A second run only processes new or modified images."""
+        from PIL import Image
+
+        image_dir = Path(self.temp_dir) / "images"
+        md_dir = Path(self.temp_dir) / "markdown"
+        image_dir.mkdir()
+        md_dir.mkdir()
+        try:
+            for name in ("DSC_0001", "DSC_0002"):
+                Image.new("RGB", (8, 8)).save(image_dir / f"{name}.jpg", "JPEG")
+            args = ["process", str(image_dir), str(md_dir), "--jobs", "1"]
+
+            result = self.runner.invoke(app, args)
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertTrue((md_dir / "DSC_0001.md").exists())
+
+            result = self.runner.invoke(app, args)
+            self.assertIn("No new images", result.output)
+
+            Image.new("RGB", (16, 16)).save(image_dir / "DSC_0002.jpg", "JPEG")
+            result = self.runner.invoke(app, args)
+            self.assertIn("processed 1 new or changed", result.output)
+
+            result = self.runner.invoke(app, args + ["--full"])
+            self.assertIn("processed 2 new or changed", result.output)
+        finally:
+            shutil.rmtree(image_dir)
+            shutil.rmtree(md_dir)
+
+    def test_process_keeps_edited_titles(self):
+        """Adopting an existing site or rerunning with --full keeps edited titles."""
+        from PIL import Image
+
+        image_dir = Path(self.temp_dir) / "images"
+        md_dir = Path(self.temp_dir) / "markdown"
+        image_dir.mkdir()
+        md_dir.mkdir()
+        try:
+            Image.new("RGB", (8, 8)).save(image_dir / "DSC_0001.jpg", "JPEG")
+            args = ["process", str(image_dir), str(md_dir), "--jobs", "1"]
+            self.runner.invoke(app, args)
+            md_file = md_dir / "DSC_0001.md"
+            md_file.write_text(md_file.read_text().replace("title: placeholder", "title: Harbour"))
+            (md_dir / MANIFEST_NAME).unlink()
+            os.utime(md_file, ns=(0, 0))
+
+            result = self.runner.invoke(app, args)
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertEqual(md_file.stat().st_mtime_ns, 0)
+
+            result = self.runner.invoke(app, args + ["--full"])
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn("title: Harbour\n", md_file.read_text())
+        finally:
+            shutil.rmtree(image_dir)
+            shutil.rmtree(md_dir)
+
+    def test_process_metrics(self):
+        """Test that --stats and --metrics-json report per-stage timings."""
+        from PIL import Image
+
+        image_dir = Path(self.temp_dir) / "images"
+        md_dir = Path(self.temp_dir) / "markdown"
+        metrics_file = Path(self.temp_dir) / "metrics.json"
+        image_dir.mkdir()
+        md_dir.mkdir()
+        try:
+            for name in ("DSC_0001", "DSC_0002"):
+                Image.new("RGB", (8, 8)).save(image_dir / f"{name}.jpg", "JPEG")
+            result = self.runner.invoke(
+                app,
+                ["process", str(image_dir), str(md_dir), "--jobs", "1", "--stats", "--metrics-json", str(metrics_file)],
+            )
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertIn("Stage timings", result.output)
+
+            metrics = json.loads(metrics_file.read_text())
+            self.assertEqual(metrics["counters"], {"scanned": 2, "processed": 2})
+            for stage in ("scan", "hash", "extract", "label", "write"):
+                self.assertEqual(metrics["stages"][stage]["count"], 2)
+            self.assertEqual(len(metrics["slowest"]), 2)
+        finally:
+            shutil.rmtree(image_dir)
+            shutil.rmtree(md_dir)
+            metrics_file.unlink(missing_ok=True)
+
     @patch("photo_info.cli.Config")
     def test_process_with_invalid_config(self, mock_config):
         """Test process command with invalid config."""
@@ -0,0 +1,70 @@
+"""Tests for the staged processing pipeline."""
+
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from PIL import Image
+
+from photo_info.pipeline import PipelineLimits, process_pipeline
+from photo_info.scanner import WorkItem, scan_images
+from tests.test_exif_reader import make_exif, make_raw
+
+
+class TestPipeline(unittest.TestCase):
+    """Test cases for the pipeline module."""
+
+    def setUp(self):
+        """Create a mix of JPEG, RAW and broken images."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.image_dir = Path(self.temp_dir) / "images"
+        self.md_dir = Path(self.temp_dir) / "markdown"
+        (self.image_dir / "raw").mkdir(parents=True)
+        self.md_dir.mkdir()
+        exif = make_exif().tobytes()
+        for i in range(12):
+            Image.new("RGB", (16, 16)).save(self.image_dir / f"DSC_{i:04d}.jpg", "JPEG", exif=exif)
+        (self.image_dir / "raw" / "DSC_9999.nef").write_bytes(make_raw(sensor_bytes=4096))
+        (self.image_dir / "broken.jpg").write_bytes(b"not an image")
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.temp_dir)
+
+    def run_pipeline(self, **kwargs):
+        items = scan_images(str(self.image_dir), str(self.md_dir))
+        limits = PipelineLimits(readers=3, parsers=2, writers=2, queue_size=2)
+        return {r.item.rel_path: r for r in process_pipeline(items, limits, **kwargs)}
+
+    def test_processes_every_image(self):
+        """Every scanned image produces a result and a markdown file."""
+        results = self.run_pipeline(hash_mode="full")
+
+        self.assertEqual(len(results), 14)
+        self.assertIsNotNone(results["broken.jpg"].error)
+        self.assertEqual(results["DSC_0003.jpg"].labeled_exif["Model"], "NIKON D750")
+        self.assertIsNotNone(results["DSC_0003.jpg"].fingerprint)
+        self.assertTrue((self.md_dir / "DSC_0011.md").exists())
+        self.assertIn("ISOSpeedRatings: 6400", (self.md_dir / "raw" / "DSC_9999.md").read_text())
+
+    @patch("photo_info.pipeline.HEADER_BYTES", 64)
+    def test_metadata_past_header_prefix(self):
+        """Images whose metadata lies past the prefix are re-read in full."""
+        results = self.run_pipeline()
+        self.assertEqual(results["raw/DSC_9999.nef"].labeled_exif["Make"], "NIKON CORPORATION")
+        self.assertEqual(str(results["DSC_0000.jpg"].labeled_exif["ExposureTime"]), "0.008")
+
+    def test_scanner_errors_are_raised(self):
+        """An error while producing work items surfaces to the caller."""
+        def items():
+            yield WorkItem("a.jpg", str(self.image_dir / "DSC_0000.jpg"), str(self.md_dir / "a.md"))
+            raise OSError("image share went away")
+
+        with self.assertRaises(OSError):
+            list(process_pipeline(items()))
+
+
+if __name__ == "__main__":
+    unittest.main()
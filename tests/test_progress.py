@@ -0,0 +1,112 @@
+"""Tests for progress reporting."""
+
+import io
+import json
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from PIL import Image
+from rich.console import Console
+from typer.testing import CliRunner
+
+from photo_info.cli import app
+from photo_info.console import LazyConsole
+from photo_info.photo_info import ProcessResult
+from photo_info.progress import JsonReporter, ProgressReporter, QuietReporter, Reporter, make_reporter
+from photo_info.scanner import WorkItem
+
+
+class TestProgress(unittest.TestCase):
+    """Test cases for the progress module."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.image_dir = self.temp_dir / "images"
+        self.md_dir = self.temp_dir / "markdown"
+        self.image_dir.mkdir()
+        self.md_dir.mkdir()
+        for name in ("DSC_0001", "DSC_0002"):
+            Image.new("RGB", (8, 8)).save(self.image_dir / f"{name}.jpg", "JPEG")
+        (self.image_dir / "DSC_0003.jpg").write_bytes(b"\xff\xd8 not really a jpeg")
+        self.runner = CliRunner()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def process(self, *args):
+        return self.runner.invoke(app, ["process", str(self.image_dir), str(self.md_dir), "--jobs", "1", *args])
+
+    def test_make_reporter(self):
+        self.assertIs(type(make_reporter("text")), Reporter)
+        self.assertIs(type(make_reporter("auto", quiet=True)), QuietReporter)
+        self.assertIs(type(make_reporter("json", quiet=True)), JsonReporter)
+        with self.assertRaises(ValueError):
+            make_reporter("xml")
+
+        terminal = LazyConsole()
+        terminal._console = Console(file=io.StringIO(), force_terminal=True, width=120)
+        with patch("photo_info.progress.console", terminal):
+            reporter = make_reporter()
+            self.assertIsInstance(reporter, ProgressReporter)
+            with reporter:
+                list(reporter.track(range(3)))
+                for i in range(3):
+                    reporter.processed(ProcessResult(WorkItem(f"{i}.jpg", "", ""), {}))
+        output = terminal.file.getvalue()
+        self.assertIn("3/3", output)
+        self.assertIn("images/s", output)
+        self.assertNotIn("Processed", output)
+
+    def test_json_events_are_batched(self):
+        stream = io.StringIO()
+        reporter = JsonReporter(stream)
+        reporter.processed(ProcessResult(WorkItem("a.jpg", "", ""), {}, timings={"extract": 0.5, "write": 0.25}))
+        reporter.failed(ProcessResult(WorkItem("b.jpg", "", ""), {}, error="OSError: broken"))
+        self.assertEqual(stream.getvalue(), "")
+        reporter.close()
+        self.assertEqual(
+            [json.loads(line) for line in stream.getvalue().splitlines()],
+            [
+                {"event": "processed", "path": "a.jpg", "seconds": 0.75},
+                {"event": "failed", "path": "b.jpg", "error": "OSError: broken"},
+            ],
+        )
+
+    def test_process_json(self):
+        """With --log-format json, stdout holds only events and the summary."""
+        result = self.process("--log-format", "json")
+        self.assertEqual(result.exit_code, 1)
+        events = [json.loads(line) for line in result.stdout.splitlines()]
+        # The test images carry no EXIF data
+        self.assertEqual(
+            [event["event"] for event in events],
+            ["no_exif", "processed", "no_exif", "processed", "failed", "summary"],
+        )
+        self.assertEqual(events[0], {"event": "no_exif", "path": "DSC_0001.jpg"})
+        self.assertEqual(events[1]["path"], "DSC_0001.jpg")
+        self.assertNotIn("No EXIF", result.stderr)
+        self.assertEqual(events[-1], {"event": "summary", "processed": 2, "failed": 1, "skipped": 0})
+        self.assertIn("1 of 3 images failed", result.stderr)
+
+    def test_process_text(self):
+        result = self.process("--log-format", "text")
+        self.assertIn("No EXIF tags found in DSC_0001.jpg", result.output)
+        self.assertIn("Processed DSC_0001.jpg", result.output)
+
+    def test_process_quiet(self):
+        result = self.process("--quiet")
+        self.assertNotIn("Processed", result.output)
+        self.assertNotIn("No EXIF", result.output)
+        self.assertIn("Failed DSC_0003.jpg", result.output)
+        self.assertIn("1 of 3 images failed", result.output)
+
+        result = self.process("--log-format", "yaml")
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("--log-format must be one of", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
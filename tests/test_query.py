@@ -0,0 +1,110 @@
+"""Tests for metadata queries."""
+
+import json
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from PIL import Image
+from typer.testing import CliRunner
+
+from photo_info.cli import app
+from photo_info.manifest import MANIFEST_NAME, Fingerprint, Manifest
+from photo_info.query import find, parse_condition, parse_order
+from tests.test_exif_reader import make_exif
+
+IMAGES = {
+    "a.jpg": {"Make": "NIKON", "LensModel": "24-70mm f/2.8", "ISOSpeedRatings": 6400,
+              "DateTimeOriginal": "2024:03:01 10:00:00", "FNumber": 2.8, "Software": "Ver.1.10"},
+    "b.jpg": {"Make": "NIKON", "LensModel": "24-70mm f/2.8", "ISOSpeedRatings": "(1600, 0)",
+              "DateTimeOriginal": "2024:12:31 23:59:59", "FNumber": 4.0},
+    "c.jpg": {"Make": "Canon", "LensModel": "EF 50mm", "ISOSpeedRatings": 12800,
+              "DateTimeOriginal": "2023:12:31 23:59:59", "ExposureTime": 0.004},
+    "d.jpg": {"Make": "Canon"},
+}
+
+
+class TestQuery(unittest.TestCase):
+    """Test cases for the query module."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.manifest = Manifest(self.temp_dir)
+        for path, labeled_exif in IMAGES.items():
+            self.manifest.record(path, Fingerprint(1, 1, "hash"), labeled_exif)
+        self.manifest.commit()
+
+    def tearDown(self):
+        self.manifest.close()
+        shutil.rmtree(self.temp_dir)
+
+    def paths(self, *conditions, order=None):
+        results = find(self.manifest, [parse_condition(c) for c in conditions], order and parse_order(order))
+        return [result.path for result in results]
+
+    def test_typed_conditions(self):
+        self.assertEqual(self.paths("LensModel ~ 24-70", "ISOSpeedRatings > 3200", "DateTimeOriginal = 2024"),
+                         ["a.jpg"])
+        self.assertEqual(self.paths("iso >= 1600"), ["a.jpg", "b.jpg", "c.jpg"])
+        self.assertEqual(self.paths("DateTimeOriginal <= 2024-03"), ["a.jpg", "c.jpg"])
+        self.assertEqual(self.paths("DateTimeOriginal > 2024-12-31 23"), [])
+        self.assertEqual(self.paths("DateTimeOriginal != 2024"), ["c.jpg"])
+        self.assertEqual(self.paths("ExposureTime <= 1/250"), ["c.jpg"])
+        self.assertEqual(self.paths("make = Canon"), ["c.jpg", "d.jpg"])
+        self.assertEqual(self.paths("Software ~ ver"), ["a.jpg"])
+        self.assertEqual(self.paths(order="-DateTimeOriginal"), ["b.jpg", "a.jpg", "c.jpg"])
+        self.assertEqual(self.paths(order="f_number"), ["a.jpg", "b.jpg"])
+
+        for condition in ("Lens ~ 24", "FNumber ~ 2", "DateTimeOriginal = 2024-13", "ISOSpeedRatings > many", "ISO"):
+            with self.assertRaises(ValueError):
+                parse_condition(condition)
+
+    def test_index_is_used(self):
+        condition = parse_condition("DateTimeOriginal = 2024")
+        plan = self.manifest.conn.execute(
+            f"EXPLAIN QUERY PLAN SELECT path FROM images WHERE {condition.sql}", condition.params
+        ).fetchall()
+        self.assertIn("images_datetime_original", str(plan))
+
+    def test_migration_fills_columns(self):
+        """Manifests from before the typed columns are filled from their EXIF data."""
+        conn = sqlite3.connect(str(self.temp_dir / "old.db"))
+        conn.execute(
+            "CREATE TABLE images (path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "hash TEXT NOT NULL, exif TEXT NOT NULL)"
+        )
+        conn.execute("INSERT INTO images VALUES ('a.jpg', 1, 1, 'hash', ?)", (json.dumps({"ISOSpeedRatings": "800"}),))
+        conn.commit()
+        conn.close()
+
+        with Manifest(self.temp_dir, name="old.db") as manifest:
+            self.assertEqual([result.path for result in find(manifest, [parse_condition("iso = 800")])], ["a.jpg"])
+
+    def test_query_command(self):
+        image_dir = self.temp_dir / "images"
+        md_dir = self.temp_dir / "markdown"
+        image_dir.mkdir()
+        md_dir.mkdir()
+        Image.new("RGB", (8, 8)).save(image_dir / "DSC_0001.jpg", "JPEG", exif=make_exif())
+        Image.new("RGB", (8, 8)).save(image_dir / "DSC_0002.jpg", "JPEG")
+        runner = CliRunner()
+        result = runner.invoke(app, ["process", str(image_dir), str(md_dir), "--jobs", "1"])
+        self.assertTrue((md_dir / MANIFEST_NAME).exists(), result.output)
+
+        result = runner.invoke(app, ["query", "-m", str(md_dir), "-w", "FNumber <= 2.8", "-w", "Make ~ nikon"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("DSC_0001.jpg", result.output)
+        self.assertIn("1 images found", result.output)
+
+        result = runner.invoke(app, ["query", "-m", str(md_dir), "--paths", "-w", "DateTimeOriginal = 2021-09"])
+        self.assertEqual(result.output.splitlines(), ["DSC_0001.jpg"])
+
+        result = runner.invoke(app, ["query", "-m", str(md_dir), "-w", "Lens = x"])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn("Unknown EXIF tags: Lens", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+"""Tests for batch extraction into records and columnar export."""
+
+import datetime
+import importlib.util
+import math
+import pickle
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from PIL import Image
+from PIL.TiffImagePlugin import IFDRational
+from typer.testing import CliRunner
+
+from photo_info.cli import app
+from photo_info.exif_reader import Rational
+from photo_info.records import ExifRecord, collect_columns, extract_many, make_record, to_arrow, to_numpy
+from tests.test_exif_reader import make_exif
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+class TestRecords(unittest.TestCase):
+    """Test cases for the records module."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.paths = []
+        for i in range(6):
+            path = self.temp_dir / f"DSC_{i:04d}.jpg"
+            Image.new("RGB", (8, 8)).save(path, "JPEG", exif=make_exif())
+            self.paths.append(str(path))
+        self.broken = self.temp_dir / "broken.jpg"
+        self.broken.write_bytes(b"\xff\xd8 not really a jpeg")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_make_record_normalizes_values(self):
+        """Rationals become floats, dates are parsed and strings stripped."""
+        record = make_record("a.jpg", {
+            271: "NIKON CORPORATION\x00\x00",
+            36867: "2021:09:01 12:30:05",
+            37386: IFDRational(50, 1),
+            33434: Rational(1, 125),
+            34855: (200, 0),
+            37380: Rational(1, 0),
+            42036: b"24-70mm f/2.8\x00",
+        })
+        self.assertEqual(record.make, "NIKON CORPORATION")
+        self.assertEqual(record.datetime_original, datetime.datetime(2021, 9, 1, 12, 30, 5))
+        self.assertEqual(record.focal_length, 50.0)
+        self.assertEqual(record.exposure_time, 0.008)
+        self.assertEqual(record.iso, 200)
+        self.assertIsNone(record.exposure_bias)
+        self.assertEqual(record.lens_model, "24-70mm f/2.8")
+        self.assertIsNone(record.model)
+
+        self.assertIsNone(make_record("b.jpg", {36867: "0000:00:00 00:00:00"}).datetime_original)
+
+    def test_records_are_compact(self):
+        record = ExifRecord("a.jpg", iso=100)
+        self.assertFalse(hasattr(record, "__dict__"))
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+        with self.assertRaises(TypeError):
+            ExifRecord("a.jpg", shutter=1)
+
+    def test_extract_many(self):
+        """Records come back in input order, with errors captured per image."""
+        paths = self.paths[:3] + [str(self.broken)] + self.paths[3:]
+        for jobs in (1, 4):
+            records = list(extract_many(iter(paths), jobs=jobs))
+            self.assertEqual([record.path for record in records], paths)
+            self.assertIsNotNone(records[3].error)
+            self.assertIsNone(records[3].make)
+
+            record = records[0]
+            self.assertIsNone(record.error)
+            self.assertEqual(record.model, "NIKON D750")
+            self.assertEqual(record.f_number, 2.8)
+            self.assertEqual(record.iso, 100)
+            self.assertAlmostEqual(record.exposure_bias, -1 / 3)
+            self.assertEqual(record.lens_make, "NIKON")
+
+    def test_collect_columns(self):
+        columns = collect_columns(extract_many(self.paths[:2], jobs=1))
+        self.assertEqual(columns["iso"], [100, 100])
+        self.assertEqual(columns["error"], [None, None])
+        self.assertEqual(list(columns)[0], "path")
+
+    @unittest.skipUnless(HAS_NUMPY, "numpy is not installed")
+    def test_to_numpy(self):
+        records = list(extract_many(self.paths + [str(self.broken)], jobs=1))
+        table = to_numpy(records)
+        self.assertEqual(len(table), 7)
+        self.assertEqual(table["iso"][:6].mean(), 100)
+        self.assertEqual(table["iso"][6], 0)
+        self.assertTrue(math.isnan(table["f_number"][6]))
+        self.assertEqual(str(table["lens_model"][0]), "24-70mm f/2.8")
+        self.assertEqual(str(table["datetime_original"][0]), "2021-09-01T12:00:00")
+
+    @unittest.skipUnless(HAS_PYARROW, "pyarrow is not installed")
+    def test_to_arrow(self):
+        table = to_arrow(extract_many(self.paths + [str(self.broken)], jobs=1))
+        self.assertEqual(table.num_rows, 7)
+        self.assertEqual(table.column("iso").null_count, 1)
+        self.assertEqual(table.column("model")[0].as_py(), "NIKON D750")
+
+    def test_missing_optional_dependency(self):
+        """Exports explain which package is missing."""
+        with patch("photo_info.records.import_module", side_effect=ImportError):
+            with self.assertRaisesRegex(ImportError, "pip install numpy"):
+                to_numpy([])
+            with self.assertRaisesRegex(ImportError, "pip install pyarrow"):
+                to_arrow([])
+
+            result = CliRunner().invoke(app, ["export", str(self.temp_dir / "out.parquet"), str(self.temp_dir)])
+            self.assertEqual(result.exit_code, 1)
+            self.assertIn("needs pyarrow", result.output)
+
+    def test_lazy_package_export(self):
+        import photo_info
+
+        self.assertIs(photo_info.extract_many, extract_many)
+
+
+if __name__ == "__main__":
+    unittest.main()
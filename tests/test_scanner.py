@@ -0,0 +1,89 @@
+"""Tests for the directory scanner."""
+
+import os
+import shutil
+import tempfile
+import types
+import unittest
+from pathlib import Path
+
+from photo_info.scanner import iter_image_files, markdown_path, scan_images
+
+
+class TestScanner(unittest.TestCase):
+    """Test cases for the scanner module."""
+
+    def setUp(self):
+        """Create a nested image tree."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.image_dir = Path(self.temp_dir) / "images"
+        self.md_dir = Path(self.temp_dir) / "markdown"
+        for rel_path in (
+            "DSC_0001.jpg",
+            "DSC_0002.JPG",
+            "notes.txt",
+            ".hidden.jpg",
+            "2024/trip/IMG_0001.jpeg",
+            "2024/trip/IMG_0002.tif",
+            "2024/trip/IMG_0002.jpg",
+            "2024/scan.png",
+        ):
+            path = self.image_dir / rel_path
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"")
+        self.md_dir.mkdir()
+
+    def tearDown(self):
+        """Clean up test fixtures."""
+        shutil.rmtree(self.temp_dir)
+
+    def rel_paths(self, **kwargs):
+        return [rel_path for rel_path, _ in iter_image_files(str(self.image_dir), **kwargs)]
+
+    def test_walks_subdirectories_in_stable_order(self):
+        """Files are found recursively, sorted within each directory."""
+        self.assertEqual(
+            self.rel_paths(),
+            [
+                "DSC_0001.jpg",
+                "DSC_0002.JPG",
+                "2024/scan.png",
+                "2024/trip/IMG_0001.jpeg",
+                "2024/trip/IMG_0002.jpg",
+            ],
+        )
+
+    def test_non_recursive(self):
+        """Subdirectories can be ignored."""
+        self.assertEqual(self.rel_paths(recursive=False), ["DSC_0001.jpg", "DSC_0002.JPG"])
+
+    def test_extension_preference(self):
+        """When files share a name, the first listed extension wins."""
+        paths = self.rel_paths(extensions=(".tif", ".jpg"))
+        self.assertIn("2024/trip/IMG_0002.tif", paths)
+        self.assertNotIn("2024/trip/IMG_0002.jpg", paths)
+
+    def test_markdown_mirrors_image_tree(self):
+        """Markdown paths mirror the image subdirectories."""
+        self.assertEqual(
+            markdown_path("markdown", "2024/trip/IMG_0001.jpeg"),
+            os.path.join("markdown", "2024/trip/IMG_0001.md"),
+        )
+
+    def test_scan_without_manifest_skips_existing_markdown(self):
+        """Without a manifest, images with a markdown file are skipped."""
+        (self.md_dir / "2024").mkdir()
+        (self.md_dir / "2024" / "scan.md").write_text("---\n---\n")
+        (self.md_dir / "DSC_0001.md").write_text("---\n---\n")
+
+        items = scan_images(str(self.image_dir), str(self.md_dir))
+
+        self.assertIsInstance(items, types.GeneratorType)
+        self.assertEqual(
+            [item.rel_path for item in items],
+            ["DSC_0002.JPG", "2024/trip/IMG_0001.jpeg", "2024/trip/IMG_0002.jpg"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+"""Tests for I/O scheduling."""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from PIL import Image
+from typer.testing import CliRunner
+
+from photo_info.cli import app
+from photo_info.config import DEFAULT_CONFIG_NAME, Config
+from photo_info.exif_reader import HEADER_BYTES
+from photo_info.scanner import WorkItem
+from photo_info.manifest import fingerprint as manifest_fingerprint
+from photo_info.scheduler import _device_slots, device_slot, fingerprint, locality_order, read_header
+from tests.test_exif_reader import make_exif
+
+
+class TestScheduler(unittest.TestCase):
+    """Test cases for the scheduler module."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.image_dir = self.temp_dir / "images"
+        self.md_dir = self.temp_dir / "markdown"
+        self.image_dir.mkdir()
+        self.md_dir.mkdir()
+        for name in ("DSC_0003", "DSC_0001", "DSC_0002"):
+            Image.new("RGB", (8, 8)).save(self.image_dir / f"{name}.jpg", "JPEG", exif=make_exif())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_locality_order(self):
+        items = [WorkItem(name, str(self.image_dir / name), "") for name in sorted(os.listdir(self.image_dir))]
+        items.append(WorkItem("gone.jpg", str(self.image_dir / "gone.jpg"), ""))
+        ordered = list(locality_order(items))
+        self.assertEqual(
+            [item.rel_path for item in ordered[:-1]],
+            sorted(os.listdir(self.image_dir), key=lambda name: os.stat(self.image_dir / name).st_ino),
+        )
+        self.assertEqual(ordered[-1].rel_path, "gone.jpg")
+        # Only images within the same window are reordered
+        self.assertEqual(list(locality_order(items, window=1)), items)
+
+    def test_read_header(self):
+        image_file = str(self.image_dir / "DSC_0001.jpg")
+        timings = {}
+        header, complete = read_header(image_file, reads_per_device=1, timings=timings)
+        self.assertEqual(header, Path(image_file).read_bytes())
+        self.assertTrue(complete)
+        self.assertEqual(set(timings), {"wait", "read"})
+
+        large = self.image_dir / "large.jpg"
+        large.write_bytes(b"\xff" * (HEADER_BYTES + 10))
+        header, complete = read_header(str(large), reads_per_device=0)
+        self.assertEqual(len(header), HEADER_BYTES)
+        self.assertFalse(complete)
+
+        # The slot is released after each read
+        slots = _device_slots(os.stat(image_file).st_dev, 1)
+        self.assertTrue(slots.acquire(blocking=False))
+        slots.release()
+
+    def test_fingerprint(self):
+        """Hashing under a slot gives the manifest's fingerprint."""
+        image_file = str(self.image_dir / "DSC_0001.jpg")
+        for hash_mode in ("full", "sampled"):
+            timings = {}
+            self.assertEqual(
+                fingerprint(image_file, hash_mode, reads_per_device=1, timings=timings),
+                manifest_fingerprint(image_file, hash_mode),
+            )
+            self.assertEqual(set(timings), {"wait", "hash"})
+
+        slots = _device_slots(os.stat(image_file).st_dev, 1)
+        self.assertTrue(slots.acquire(blocking=False))
+        slots.release()
+
+    def test_fallback_reads_hold_a_slot(self):
+        """Images the header is not enough for are read again under a slot, in the pool and the pipeline."""
+        from photo_info import photo_info, pipeline
+
+        for module, args in ((photo_info, ["--jobs", "1"]), (pipeline, ["--pipeline"])):
+            with patch("photo_info.exif_reader.read_exif_bytes", side_effect=ValueError("short header")), \
+                    patch.object(module, "device_slot", wraps=device_slot) as slot:
+                result = CliRunner().invoke(
+                    app, ["process", str(self.image_dir), str(self.md_dir), "--full", "--io-schedule", "locality", *args]
+                )
+            self.assertEqual(result.exit_code, 0, result.output)
+            self.assertEqual(slot.call_count, 3)
+            self.assertIn("Make: NIKON CORPORATION", (self.md_dir / "DSC_0001.md").read_text())
+
+    def test_process_locality(self):
+        """The locality schedule writes the same markdown and reports its wait and read stages."""
+        runner = CliRunner()
+        metrics_file = self.temp_dir / "metrics.json"
+        result = runner.invoke(
+            app,
+            [
+                "process", str(self.image_dir), str(self.md_dir), "--jobs", "2",
+                "--io-schedule", "locality", "--metrics-json", str(metrics_file),
+            ],
+        )
+        self.assertEqual(result.exit_code, 0, result.output)
+        metrics = json.loads(metrics_file.read_text())
+        self.assertEqual(metrics["settings"], {"io_schedule": "locality", "reads_per_device": 4})
+        self.assertEqual(metrics["stages"]["read"]["count"], 3)
+        self.assertEqual(metrics["stages"]["hash"]["count"], 3)
+        self.assertIn("wait", metrics["stages"])
+
+        scheduled = (self.md_dir / "DSC_0001.md").read_text()
+        self.assertIn("Make: NIKON CORPORATION", scheduled)
+        result = runner.invoke(app, ["process", str(self.image_dir), str(self.md_dir), "--full", "--jobs", "1"])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertEqual((self.md_dir / "DSC_0001.md").read_text(), scheduled)
+
+    def test_config(self):
+        config_path = self.temp_dir / DEFAULT_CONFIG_NAME
+        config_path.write_text(
+            f'[paths]\nimages = "{self.image_dir}"\nmarkdown = "{self.md_dir}"\n\n'
+            '[io]\nschedule = "locality"\nreads_per_device = 2\n'
+        )
+        with patch("pathlib.Path.cwd", return_value=self.temp_dir):
+            config = Config()
+        self.assertTrue(config.validate())
+        self.assertEqual(config.io_settings().reads_per_device, 2)
+
+        config.io_schedule = "elevator"
+        self.assertFalse(config.validate())
+        config.io_schedule = "off"
+        self.assertIsNone(config.io_settings())
+
+
+if __name__ == "__main__":
+    unittest.main()
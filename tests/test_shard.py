@@ -0,0 +1,105 @@
+"""Tests for sharded processing."""
+
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from PIL import Image
+from typer.testing import CliRunner
+
+from photo_info.cli import app
+from photo_info.manifest import Failure, Fingerprint, Manifest
+from photo_info.shard import Shard, find_shard_manifests, merge_shards, shard_of
+
+
+class TestShard(unittest.TestCase):
+    """Test cases for the shard module."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        self.image_dir = self.temp_dir / "images"
+        self.md_dir = self.temp_dir / "markdown"
+        self.md_dir.mkdir()
+        for i in range(12):
+            directory = self.image_dir / f"2024-{i % 3:02d}"
+            directory.mkdir(parents=True, exist_ok=True)
+            Image.new("RGB", (8, 8)).save(directory / f"DSC_{i:04d}.jpg", "JPEG")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_shard_of(self):
+        """Assignment is stable and covers every shard."""
+        paths = [f"2024/DSC_{i:04d}.jpg" for i in range(200)]
+        self.assertEqual([shard_of(p, 4) for p in paths], [shard_of(p, 4) for p in paths])
+        self.assertEqual({shard_of(p, 4) for p in paths}, {1, 2, 3, 4})
+        self.assertEqual(shard_of("2024/DSC_0001.jpg", 1), 1)
+
+    def test_parse(self):
+        self.assertEqual(Shard.parse("2/8"), Shard(2, 8))
+        for spec in ("0/8", "9/8", "2", "a/b"):
+            with self.assertRaises(ValueError):
+                Shard.parse(spec)
+
+    def test_merge_replaces_shard_records(self):
+        """Merged shards replace their records; other shards' records are kept."""
+        shard = Shard(1, 2)
+        ours, broken, fixed = [p for p in (f"{i}.jpg" for i in range(100)) if shard.contains(p)][:3]
+        theirs = next(p for p in (f"{i}.jpg" for i in range(100)) if not shard.contains(p))
+        with Manifest(self.md_dir) as manifest:
+            manifest.record(ours, Fingerprint(1, 1, "old"), {})
+            manifest.record(theirs, Fingerprint(1, 1, "other"), {})
+            manifest.record_failure(fixed, Failure(1, 1, 2, "OSError: old"))
+            manifest.record_failure(theirs, Failure(1, 1, 2, "OSError: other"))
+            manifest.commit()
+        with Manifest(self.md_dir, name=shard.manifest_name) as shard_manifest:
+            shard_manifest.record(ours, Fingerprint(2, 2, "new"), {"Make": "NIKON"})
+            shard_manifest.record_failure(broken, Failure(3, 3, 2, "OSError: broken"))
+
+        with Manifest(self.md_dir) as manifest:
+            with self.assertRaises(ValueError):
+                merge_shards(manifest, self.md_dir)
+            result = merge_shards(manifest, self.md_dir, partial=True)
+            self.assertEqual(result.missing, [2])
+            self.assertEqual(manifest.entries(), {ours: Fingerprint(2, 2, "new"), theirs: Fingerprint(1, 1, "other")})
+            # Quarantined images are merged the same way
+            self.assertEqual(
+                manifest.failures(),
+                {broken: Failure(3, 3, 2, "OSError: broken"), theirs: Failure(1, 1, 2, "OSError: other")},
+            )
+
+    def test_processes_as_nodes(self):
+        """Shards run as separate processes split the work without overlap, and merge combines them."""
+        workers = [
+            subprocess.Popen(
+                [sys.executable, "-m", "photo_info", "process", str(self.image_dir), str(self.md_dir),
+                 "--jobs", "1", "--shard", f"{i}/3"],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+            )
+            for i in range(1, 4)
+        ]
+        outputs = [worker.communicate()[0] for worker in workers]
+        self.assertEqual([worker.returncode for worker in workers], [0, 0, 0], outputs)
+
+        processed = [line.split()[1] for output in outputs for line in output.splitlines() if line.startswith("Processed ")]
+        self.assertEqual(len(processed), 12)
+        self.assertEqual(len(set(processed)), 12)
+        self.assertEqual(len(find_shard_manifests(self.md_dir)), 3)
+        self.assertEqual(len(list(self.md_dir.rglob("*.md"))), 12)
+
+        runner = CliRunner()
+        result = runner.invoke(app, ["merge", str(self.image_dir), str(self.md_dir)])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn("lists 12 images", result.output)
+
+        result = runner.invoke(app, ["process", str(self.image_dir), str(self.md_dir), "--jobs", "1"])
+        self.assertIn("No new images", result.output)
+
+
+if __name__ == "__main__":
+    unittest.main()
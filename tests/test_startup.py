@@ -0,0 +1,59 @@
+"""Tests for the cold-start cost of importing the package and CLI."""
+
+import re
+import subprocess
+import sys
+import unittest
+
+# Cumulative import time allowed for photo_info.cli in a fresh interpreter.
+# It takes around 100 ms; pulling Pillow, asyncio and rich back in at import
+# time roughly doubles that.
+IMPORT_BUDGET_MS = 200
+
+# Modules only the commands that need them may import
+HEAVY_MODULES = ("PIL", "asyncio", "rich", "tomli", "sqlite3", "ctypes", "cProfile", "concurrent.futures.process")
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], capture_output=True, text=True, check=True)
+
+
+class TestStartup(unittest.TestCase):
+    """Test cases for lazy imports."""
+
+    def test_heavy_modules_are_not_imported(self):
+        """Importing the package or the CLI does not load heavy dependencies."""
+        for module in ("photo_info", "photo_info.cli"):
+            result = run_python(
+                "-c",
+                f"import sys, {module}; "
+                f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+            )
+            self.assertEqual(result.stdout.strip(), "", f"{module} imported heavy modules")
+
+    def test_lazy_exports(self):
+        """The public helpers are still available from the package."""
+        import photo_info
+
+        self.assertIn("Make", photo_info.MY_TAGS)
+        self.assertTrue(callable(photo_info.get_exif_data))
+        with self.assertRaises(AttributeError):
+            photo_info.not_an_export
+
+    def test_import_time_budget(self):
+        """Importing the CLI stays within the cold-start budget."""
+        timings = []
+        for _ in range(3):
+            result = run_python("-X", "importtime", "-c", "import photo_info.cli")
+            match = re.search(r"\|\s*(\d+) \| photo_info\.cli$", result.stderr, re.MULTILINE)
+            timings.append(int(match.group(1)) / 1000)
+        self.assertLess(min(timings), IMPORT_BUDGET_MS, f"photo_info.cli imported in {min(timings):.0f} ms")
+
+    def test_python_m(self):
+        """The package can be run with `python -m photo_info`."""
+        result = run_python("-m", "photo_info", "--version")
+        self.assertIn("Photo Info v", result.stdout)
+
+
+if __name__ == "__main__":
+    unittest.main()
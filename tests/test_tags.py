@@ -0,0 +1,73 @@
+"""Tests for EXIF tag selection."""
+
+import pickle
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+from PIL import Image
+
+from photo_info.photo_info import get_exif_data, process_image
+from photo_info.scanner import WorkItem
+from photo_info.tags import DEFAULT_TAGS, TagSet, compile_tags
+from tests.test_exif_reader import make_exif
+
+
+class TestTags(unittest.TestCase):
+    """Test cases for the tags module."""
+
+    def test_tag_set(self):
+        """Names compile to tag IDs and label EXIF data in configured order."""
+        tags = TagSet(["Model", "Make", "Model"])
+        self.assertEqual(tags.names, ("Model", "Make"))
+        self.assertEqual(tags.ids, frozenset({271, 272}))
+        self.assertEqual(
+            list(tags.label({271: "NIKON CORPORATION", 272: "NIKON D750", 305: "Ver.1.10"}).items()),
+            [("Model", "NIKON D750"), ("Make", "NIKON CORPORATION")],
+        )
+        self.assertEqual(pickle.loads(pickle.dumps(tags)), tags)
+
+    def test_unknown_tag(self):
+        """Unknown tag names are rejected."""
+        with self.assertRaises(ValueError):
+            TagSet(["Make", "Shoesize"])
+
+    def test_overrides(self):
+        """The deepest matching directory decides an image's tags."""
+        rules = compile_tags(None, {"scans": ["Make"], "scans/film/": ["Model"]})
+        self.assertEqual(rules.for_path("a.jpg").names, tuple(DEFAULT_TAGS))
+        self.assertEqual(rules.for_path("scans/a.jpg").names, ("Make",))
+        self.assertEqual(rules.for_path("scans/film/a.jpg").names, ("Model",))
+        self.assertEqual(rules.for_path("scansets/a.jpg").names, tuple(DEFAULT_TAGS))
+
+
+class TestTagExtraction(unittest.TestCase):
+    """Test cases for extracting configured tags."""
+
+    def setUp(self):
+        self.temp_dir = Path(tempfile.mkdtemp())
+        (self.temp_dir / "scans").mkdir()
+        for rel_path in ("a.jpg", "scans/b.jpg"):
+            Image.new("RGB", (8, 8)).save(self.temp_dir / rel_path, "JPEG", exif=make_exif().tobytes())
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_engines_extract_only_selected_tags(self):
+        """Both engines return only the selected tags."""
+        tags = TagSet(["Model", "Software"])
+        for engine in ("fast", "pillow"):
+            exif = get_exif_data(str(self.temp_dir / "a.jpg"), engine=engine, tags=tags)
+            self.assertEqual(exif, {272: "NIKON D750", 305: "Ver.1.10"})
+
+    def test_process_image_uses_overrides(self):
+        """Images in an overridden directory get that directory's tags."""
+        rules = compile_tags(["Make", "Model"], {"scans": ["DateTimeOriginal"]})
+        for rel_path, expected in (("a.jpg", ["Make", "Model"]), ("scans/b.jpg", ["DateTimeOriginal"])):
+            item = WorkItem(rel_path, str(self.temp_dir / rel_path), str(self.temp_dir / (rel_path + ".md")))
+            self.assertEqual(list(process_image(item, tags=rules)), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+"""Tests for filesystem watching."""
+
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from photo_info.manifest import Manifest, fingerprint
+from photo_info.watch import Change, Debouncer, InotifyWatcher, watch_batches
+
+
+def inotify_available() -> bool:
+    """Return True if the inotify backend can be used here."""
+    try:
+        InotifyWatcher(tempfile.gettempdir(), recursive=False).close()
+        return True
+    except (OSError, AttributeError):
+        return False
+
+
+class TestDebouncer(unittest.TestCase):
+    """Test cases for the Debouncer class."""
+
+    def test_complete_files_wait_for_batch_window(self):
+        """Complete files are released after the batch window."""
+        debouncer = Debouncer(settle=1.0, batch_window=0.1)
+        debouncer.add(Change("b.jpg", True), now=0.0)
+        debouncer.add(Change("a.jpg", True), now=0.05)
+        self.assertEqual(debouncer.pop_ready(0.1), ["b.jpg"])
+        self.assertEqual(debouncer.pop_ready(0.2), ["a.jpg"])
+        self.assertIsNone(debouncer.timeout(0.2))
+
+    def test_partial_writes_wait_until_quiet(self):
+        """Files still being written are held until they settle."""
+        debouncer = Debouncer(settle=1.0, batch_window=0.1)
+        debouncer.add(Change("a.jpg", False), now=0.0)
+        debouncer.add(Change("a.jpg", False), now=0.8)
+        self.assertEqual(debouncer.pop_ready(1.5), [])
+        self.assertAlmostEqual(debouncer.timeout(1.5), 0.3)
+        self.assertEqual(debouncer.pop_ready(1.8), ["a.jpg"])
+
+
+class TestWatchBatches(unittest.TestCase):
+    """Test cases for watch_batches."""
+
+    def setUp(self):
+        """Set up directories and a manifest."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.image_dir = Path(self.temp_dir) / "images"
+        self.md_dir = Path(self.temp_dir) / "markdown"
+        self.image_dir.mkdir()
+        self.md_dir.mkdir()
+        self.manifest = Manifest(self.md_dir)
+        self.stop = threading.Event()
+        self.batches: queue.Queue = queue.Queue()
+
+    def tearDown(self):
+        """Stop watching and clean up."""
+        self.stop.set()
+        self.thread.join(timeout=5)
+        self.manifest.close()
+        shutil.rmtree(self.temp_dir)
+
+    def start(self, backend: str) -> None:
+        def run():
+            for batch in watch_batches(
+                str(self.image_dir),
+                str(self.md_dir),
+                self.manifest,
+                backend=backend,
+                settle=0.2,
+                batch_window=0.05,
+                poll_interval=0.1,
+                stop=self.stop,
+            ):
+                self.batches.put([item.rel_path for item in batch])
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        time.sleep(0.2)
+
+    def check_backend(self, backend: str) -> None:
+        self.start(backend)
+        (self.image_dir / "2024").mkdir()
+        (self.image_dir / "2024" / "DSC_0001.jpg").write_bytes(b"jpeg")
+        (self.image_dir / "notes.txt").write_text("ignored")
+        self.assertEqual(self.batches.get(timeout=3), ["2024/DSC_0001.jpg"])
+
+        # Unchanged contents recorded in the manifest are not reprocessed
+        image_file = self.image_dir / "2024" / "DSC_0001.jpg"
+        self.manifest.record("2024/DSC_0001.jpg", fingerprint(str(image_file)), {})
+        image_file.write_bytes(b"jpeg")
+        (self.image_dir / "DSC_0002.jpg").write_bytes(b"jpeg")
+        self.assertEqual(self.batches.get(timeout=3), ["DSC_0002.jpg"])
+
+    @unittest.skipUnless(inotify_available(), "inotify is not available")
+    def test_inotify_backend(self):
+        """New files are picked up through inotify."""
+        self.check_backend("inotify")
+
+    def test_polling_backend(self):
+        """New files are picked up by polling."""
+        self.check_backend("polling")
+
+
+if __name__ == "__main__":
+    unittest.main()